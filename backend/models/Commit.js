@@ -134,6 +134,11 @@ const Commit = sequelize.define('Commit', {
     defaultValue: false,
     field: 'is_behavior_preserving_refactor'
   },
+  contentFingerprint: {
+    type: DataTypes.CHAR(32),
+    allowNull: true,
+    field: 'content_fingerprint'
+  },
   // Status tracking
   isUnsuitable: {
     type: DataTypes.BOOLEAN,
@@ -47,6 +47,11 @@ const GitRepo = sequelize.define('GitRepo', {
     allowNull: true,
     field: 'last_fetched_at'
   },
+  lastFetchedSha: {
+    type: DataTypes.STRING(40),
+    allowNull: true,
+    field: 'last_fetched_sha'
+  },
   fetchStatus: {
     type: DataTypes.ENUM('idle', 'fetching', 'error'),
     defaultValue: 'idle',
@@ -67,8 +72,8 @@ const GitRepo = sequelize.define('GitRepo', {
   timestamps: true,
   underscored: true,
   indexes: [
-    { unique: true, fields: ['repo_name'] },
-    { fields: ['full_name'] },
+    { fields: ['repo_name'] },
+    { unique: true, fields: ['full_name'] },
     { fields: ['is_active'] },
     { fields: ['habitat_repo_id'] },
     { fields: ['fetch_status'] }
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+On-disk cache of commit analyses, keyed by commit SHA and rules version.
+
+A commit's analysis (numstat, classifications, dependency/test analysis,
+scores) only depends on the commit itself and on the rules it was made
+with, so it can be reused by every later fetch of the same commit: full
+re-walks, rebuilding or seeding another database, and forks or mirrors that
+share history with a repo fetched before. Entries live in one SQLite file
+(ANALYSIS_CACHE_FILE) shared by all repos and processes.
+
+Values are zlib-compressed pickles of plain Python values. When the used
+size of the file passes ANALYSIS_CACHE_MAX_MB, the least recently used
+entries are dropped until it is back under ANALYSIS_CACHE_EVICT_TO of it.
+"""
+
+import os
+import pickle
+import sqlite3
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+ANALYSIS_CACHE_FILE = Path(os.getenv('ANALYSIS_CACHE_FILE', Path(__file__).parent / 'analysis_cache.sqlite3'))
+ANALYSIS_CACHE_MAX_MB = int(os.getenv('ANALYSIS_CACHE_MAX_MB', 4096))
+# Fraction of the maximum size left after an eviction, so it doesn't run on every close
+ANALYSIS_CACHE_EVICT_TO = 0.9
+
+# Bump when the layout of cached values changes; older entries are then never read again
+CACHE_FORMAT_VERSION = 1
+
+# Entries per lookup query and per write transaction
+CACHE_QUERY_SIZE = 500
+CACHE_WRITE_BATCH = 500
+EVICT_BATCH = 1000
+
+
+class AnalysisCache:
+    """SQLite-backed (sha, version) -> value cache with size-based LRU eviction."""
+
+    def __init__(self, path: Path = ANALYSIS_CACHE_FILE, max_bytes: int = ANALYSIS_CACHE_MAX_MB * 2 ** 20):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(self.path, timeout=60)
+        # WAL lets parallel fetch processes read while one of them writes
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS analyses (
+                sha TEXT NOT NULL,
+                version TEXT NOT NULL,
+                last_used INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (sha, version)
+            )
+        """)
+        self.conn.execute('CREATE INDEX IF NOT EXISTS analyses_last_used ON analyses (last_used)')
+        self.conn.commit()
+        self.pending: List[Tuple[str, str, int, bytes]] = []
+
+    @staticmethod
+    def _version(version: str) -> str:
+        return f'{CACHE_FORMAT_VERSION}:{version}'
+
+    def _chunks(self, shas: List[str]) -> Iterable[List[str]]:
+        for start in range(0, len(shas), CACHE_QUERY_SIZE):
+            yield shas[start:start + CACHE_QUERY_SIZE]
+
+    def contains(self, shas: Iterable[str], version: str) -> Set[str]:
+        """The subset of `shas` that has an entry for `version`."""
+        shas = list(shas)
+        version = self._version(version)
+        found = set()
+        for chunk in self._chunks(shas):
+            placeholders = ', '.join(['?'] * len(chunk))
+            found.update(sha for sha, in self.conn.execute(
+                f'SELECT sha FROM analyses WHERE version = ? AND sha IN ({placeholders})',
+                (version, *chunk)
+            ))
+        return found
+
+    def get_many(self, shas: Iterable[str], version: str) -> Dict[str, Any]:
+        """sha -> cached value for the entries of `shas` that exist, marking them as used."""
+        shas = list(shas)
+        version = self._version(version)
+        values = {}
+        for chunk in self._chunks(shas):
+            placeholders = ', '.join(['?'] * len(chunk))
+            for sha, data in self.conn.execute(
+                    f'SELECT sha, data FROM analyses WHERE version = ? AND sha IN ({placeholders})',
+                    (version, *chunk)):
+                values[sha] = pickle.loads(zlib.decompress(data))
+        if values:
+            now = int(time.time())
+            self.conn.executemany('UPDATE analyses SET last_used = ? WHERE sha = ? AND version = ?',
+                                  [(now, sha, version) for sha in values])
+            self.conn.commit()
+        return values
+
+    def put(self, sha: str, version: str, value: Any):
+        """Queue an entry; written with the next CACHE_WRITE_BATCH entries or on flush()."""
+        data = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        self.pending.append((sha, self._version(version), int(time.time()), data))
+        if len(self.pending) >= CACHE_WRITE_BATCH:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, []
+        self.conn.executemany('INSERT OR REPLACE INTO analyses (sha, version, last_used, data) '
+                              'VALUES (?, ?, ?, ?)', pending)
+        self.conn.commit()
+
+    def used_bytes(self) -> int:
+        """Size of the pages in use; pages freed by deletes are reused before the file grows."""
+        page_size, = self.conn.execute('PRAGMA page_size').fetchone()
+        page_count, = self.conn.execute('PRAGMA page_count').fetchone()
+        free_pages, = self.conn.execute('PRAGMA freelist_count').fetchone()
+        return (page_count - free_pages) * page_size
+
+    def evict(self) -> int:
+        """Drop least recently used entries while over the size limit; returns how many."""
+        evicted = 0
+        target = self.max_bytes * ANALYSIS_CACHE_EVICT_TO
+        if self.used_bytes() <= self.max_bytes:
+            return 0
+        while self.used_bytes() > target:
+            deleted = self.conn.execute("""
+                DELETE FROM analyses WHERE rowid IN (
+                    SELECT rowid FROM analyses ORDER BY last_used LIMIT ?
+                )
+            """, (EVICT_BATCH,)).rowcount
+            self.conn.commit()
+            if not deleted:
+                break
+            evicted += deleted
+        return evicted
+
+    def close(self):
+        try:
+            self.flush()
+            evicted = self.evict()
+            if evicted:
+                print(f"    Evicted {evicted} entries from the analysis cache")
+        finally:
+            self.conn.close()
+
+
+def open_analysis_cache(path: Path = ANALYSIS_CACHE_FILE) -> Optional[AnalysisCache]:
+    """The cache at `path`, or None (the fetch goes on without it) if it can't be opened."""
+    try:
+        return AnalysisCache(path)
+    except sqlite3.Error as e:
+        print(f"    Analysis cache unavailable ({path}): {e}")
+        return None
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Fill in commit_file_stats_cache for commits that have no row yet.
+
+fetch_commits.py writes the cache row of every commit it saves; this covers
+commits saved before it did, so the commit list filters never have to fall
+back to scanning commit_files. Rows are computed by MySQL from commit_files
+with one INSERT ... SELECT per range of STATS_BACKFILL_CHUNK commit ids, so
+nothing is read into Python and every chunk is a short transaction. An
+interrupted backfill can be resumed from the last id it reported.
+"""
+
+import os
+from typing import Optional
+
+from mysql.connector import Error
+
+from db_pool import is_connection_error, run_in_transaction
+from fetch_commits import get_db_connection
+
+STATS_BACKFILL_CHUNK = int(os.getenv('STATS_BACKFILL_CHUNK', 5000))
+
+# Same values as fetch_commits.calculate_file_stats_cache(). Rows written in the
+# meantime by a running fetch are left as they are.
+STATS_CACHE_BACKFILL_SQL = """
+    INSERT INTO commit_file_stats_cache (
+        commit_id, non_test_file_count, test_file_count, total_file_count,
+        min_non_test_additions, max_non_test_additions, avg_non_test_additions,
+        total_non_test_additions, single_file_200plus, single_file_500plus,
+        multi_file_300plus, all_files_200plus
+    )
+    SELECT
+        s.commit_id, s.non_test_files, s.total_files - s.non_test_files, s.total_files,
+        COALESCE(s.min_additions, 0), COALESCE(s.max_additions, 0),
+        COALESCE(ROUND(s.total_additions / s.non_test_files, 2), 0),
+        COALESCE(s.total_additions, 0),
+        s.non_test_files = 1 AND s.max_additions >= 200,
+        s.non_test_files = 1 AND s.max_additions >= 500,
+        s.non_test_files BETWEEN 3 AND 6 AND s.min_additions >= 300,
+        s.non_test_files > 0 AND s.min_additions >= 200
+    FROM (
+        SELECT
+            cf.commit_id,
+            COUNT(*) AS total_files,
+            SUM(cf.is_test_file = FALSE) AS non_test_files,
+            MIN(CASE WHEN cf.is_test_file = FALSE THEN cf.additions END) AS min_additions,
+            MAX(CASE WHEN cf.is_test_file = FALSE THEN cf.additions END) AS max_additions,
+            SUM(CASE WHEN cf.is_test_file = FALSE THEN cf.additions END) AS total_additions
+        FROM commit_files cf
+        WHERE cf.commit_id BETWEEN %s AND %s
+          AND NOT EXISTS (
+              SELECT 1 FROM commit_file_stats_cache c WHERE c.commit_id = cf.commit_id
+          )
+        GROUP BY cf.commit_id
+    ) AS s
+    ON DUPLICATE KEY UPDATE commit_id = commit_file_stats_cache.commit_id
+"""
+
+
+def backfill_chunk(conn, first_id: int, last_id: int) -> int:
+    """Insert the missing cache rows for commit ids first_id..last_id in one transaction."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(STATS_CACHE_BACKFILL_SQL, (first_id, last_id))
+        inserted = cursor.rowcount
+        conn.commit()
+        return inserted
+    finally:
+        cursor.close()
+
+
+def backfill_stats_cache(from_id: int = 0, to_id: Optional[int] = None,
+                         chunk_size: int = STATS_BACKFILL_CHUNK) -> int:
+    """
+    Add the missing commit_file_stats_cache rows for commits with from_id <= id <= to_id.
+    Returns the number of rows added.
+    """
+    chunk_size = max(1, chunk_size)
+    conn = get_db_connection()
+
+    filled_count = 0
+    failed_ranges = []
+    try:
+        cursor = conn.cursor()
+        if to_id is None:
+            cursor.execute("SELECT MIN(id), MAX(id) FROM commits WHERE id >= %s", (from_id,))
+        else:
+            cursor.execute("SELECT MIN(id), MAX(id) FROM commits WHERE id BETWEEN %s AND %s",
+                           (from_id, to_id))
+        first_id, last_id = cursor.fetchone()
+        cursor.close()
+        if first_id is None:
+            return 0
+
+        for start in range(first_id, last_id + 1, chunk_size):
+            end = min(start + chunk_size - 1, last_id)
+            try:
+                filled_count += run_in_transaction(conn, lambda: backfill_chunk(conn, start, end))
+            except Error as e:
+                if is_connection_error(e):
+                    print(f"  ❌ Lost the MySQL connection; rerun with --from-id {start}")
+                    raise
+                conn.rollback()
+                failed_ranges.append((start, end))
+                print(f"  ❌ Error backfilling commits {start}-{end}: {e}")
+                continue
+            print(f"  Backfilled {filled_count} cache rows (through commit id {end})")
+    finally:
+        conn.close()
+
+    if failed_ranges:
+        ranges = ', '.join(f"{start}-{end}" for start, end in failed_ranges)
+        print(f"  ❌ Commit ids {ranges} could not be backfilled; rerun their id ranges")
+    return filled_count
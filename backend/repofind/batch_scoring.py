@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Vectorised scoring for many commits at once.
+
+Computes the same results as the scalar functions in fetch_commits.py
+(calculate_habitate_score, calculate_difficulty_score,
+calculate_suitability_score, analyze_tests and calculate_complexity_indicators)
+over a columnar representation of all files of a batch of commits, so that
+rescoring large numbers of commits doesn't loop over per-file dicts
+five times per commit.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from fetch_commits import (
+    CORE_PATH_PATTERNS, INTEGRATION_TEST_MARKERS, FileStat,
+    analyze_tests, calculate_complexity_indicators, calculate_difficulty_score,
+    calculate_habitate_score, calculate_suitability_score
+)
+
+
+class CommitColumns:
+    """
+    File-level data of many commits stored as flat NumPy arrays.
+    Files of commit i are rows offsets[i]:offsets[i + 1]; `commit_index`
+    maps every file row back to its commit.
+    """
+
+    def __init__(self, offsets: np.ndarray, additions: np.ndarray, deletions: np.ndarray,
+                 is_test: np.ndarray, is_dependency: np.ndarray, is_core: np.ndarray,
+                 is_integration: np.ndarray, top_dir: np.ndarray, is_refactor: np.ndarray):
+        self.offsets = offsets
+        self.additions = additions
+        self.deletions = deletions
+        self.is_test = is_test
+        self.is_dependency = is_dependency
+        self.is_core = is_core
+        self.is_integration = is_integration
+        self.top_dir = top_dir          # top-level directory id, -1 for files at the root
+        self.is_refactor = is_refactor  # per commit
+        self.commit_count = len(offsets) - 1
+        self.commit_index = np.repeat(np.arange(self.commit_count), np.diff(offsets))
+
+    @classmethod
+    def from_file_stats(cls, file_stats_lists: Iterable[List[FileStat]],
+                        refactor_flags: Iterable[bool]) -> 'CommitColumns':
+        """Build columns from per-commit lists of FileStat records."""
+        builder = ColumnBuilder()
+        for file_stats, is_refactor in zip(file_stats_lists, refactor_flags):
+            builder.add_commit(
+                ((f.file_path, f.file_directory, f.additions, f.deletions,
+                  f.is_test_file, f.is_dependency_file) for f in file_stats),
+                is_refactor
+            )
+        return builder.build()
+
+
+class ColumnBuilder:
+    """Accumulates commits file by file and produces a CommitColumns."""
+
+    def __init__(self):
+        self.offsets = [0]
+        self.additions = []
+        self.deletions = []
+        self.is_test = []
+        self.is_dependency = []
+        self.is_core = []
+        self.is_integration = []
+        self.top_dir = []
+        self.is_refactor = []
+        self._top_dir_ids: Dict[str, int] = {}
+
+    def add_commit(self, files: Iterable[Tuple[str, Optional[str], int, int, bool, bool]],
+                   is_refactor: bool):
+        """
+        Add one commit. `files` yields (file_path, file_directory, additions,
+        deletions, is_test_file, is_dependency_file) per changed file.
+        """
+        for file_path, file_directory, additions, deletions, is_test, is_dependency in files:
+            file_path = file_path or ''
+            self.additions.append(additions or 0)
+            self.deletions.append(deletions or 0)
+            self.is_test.append(bool(is_test))
+            self.is_dependency.append(bool(is_dependency))
+            self.is_core.append(any(pattern in file_path for pattern in CORE_PATH_PATTERNS))
+            path_lower = file_path.lower()
+            self.is_integration.append(any(marker in path_lower for marker in INTEGRATION_TEST_MARKERS))
+            if file_directory:
+                top_dir = file_directory.split('/')[0]
+                self.top_dir.append(self._top_dir_ids.setdefault(top_dir, len(self._top_dir_ids)))
+            else:
+                self.top_dir.append(-1)
+        self.offsets.append(len(self.additions))
+        self.is_refactor.append(bool(is_refactor))
+
+    def build(self) -> CommitColumns:
+        return CommitColumns(
+            offsets=np.array(self.offsets, dtype=np.int64),
+            additions=np.array(self.additions, dtype=np.int64),
+            deletions=np.array(self.deletions, dtype=np.int64),
+            is_test=np.array(self.is_test, dtype=bool),
+            is_dependency=np.array(self.is_dependency, dtype=bool),
+            is_core=np.array(self.is_core, dtype=bool),
+            is_integration=np.array(self.is_integration, dtype=bool),
+            top_dir=np.array(self.top_dir, dtype=np.int64),
+            is_refactor=np.array(self.is_refactor, dtype=bool)
+        )
+
+
+def _per_commit_sum(columns: CommitColumns, values: np.ndarray) -> np.ndarray:
+    """Sum a per-file column for every commit (exact for counts and line totals)."""
+    return np.bincount(columns.commit_index, weights=values,
+                       minlength=columns.commit_count).astype(np.int64)
+
+
+def _safe_ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """numerator / denominator, 0.0 where the denominator is 0."""
+    result = np.zeros(len(numerator), dtype=np.float64)
+    np.divide(numerator, denominator, out=result, where=denominator > 0)
+    return result
+
+
+def score_columns(columns: CommitColumns) -> Dict[str, np.ndarray]:
+    """
+    Compute every per-commit aggregate, score, test analysis field and
+    complexity indicator for `columns`. Returns a dict of per-commit arrays.
+    """
+    non_test = ~columns.is_test
+    additions = columns.additions
+    deletions = columns.deletions
+
+    file_count = np.diff(columns.offsets)
+    non_test_count = _per_commit_sum(columns, non_test)
+    test_count = file_count - non_test_count
+    total_additions = _per_commit_sum(columns, additions)
+    total_deletions = _per_commit_sum(columns, deletions)
+    non_test_additions = _per_commit_sum(columns, additions * non_test)
+    non_test_deletions = _per_commit_sum(columns, deletions * non_test)
+    test_additions = total_additions - non_test_additions
+    has_tests = test_count > 0
+    has_dependencies = _per_commit_sum(columns, columns.is_dependency) > 0
+    has_core_files = _per_commit_sum(columns, columns.is_core & non_test) > 0
+    has_integration_tests = _per_commit_sum(columns, columns.is_integration & columns.is_test) > 0
+    is_refactor = columns.is_refactor
+
+    # Distinct top-level directories of non-test files
+    with_dir = non_test & (columns.top_dir >= 0)
+    dir_span = int(columns.top_dir.max()) + 1 if len(columns.top_dir) else 1
+    pair_keys = np.unique(columns.commit_index[with_dir] * dir_span + columns.top_dir[with_dir])
+    directory_count = np.bincount(pair_keys // dir_span, minlength=columns.commit_count)
+
+    # "Every non-test file has 300+ additions" == no non-test file below 300
+    all_non_test_300plus = _per_commit_sum(columns, non_test & (additions < 300)) == 0
+    single_file = non_test_count == 1
+    single_200plus = single_file & (non_test_additions >= 200)
+    single_500plus = single_file & (non_test_additions >= 500)
+    few_files = (non_test_count >= 3) & (non_test_count <= 6)
+    avg_non_test = _safe_ratio(non_test_additions, non_test_count)
+    pattern_high = few_files & all_non_test_300plus & (avg_non_test >= 400)
+    pattern_mid = few_files & ~pattern_high & (avg_non_test >= 300)
+    test_ratio = _safe_ratio(test_additions, total_additions)
+    net_non_test = non_test_additions - non_test_deletions
+
+    # habitate_score (calculate_habitate_score)
+    habitate = (
+        30 * single_200plus + 15 * single_500plus
+        + 35 * pattern_high + 25 * pattern_mid
+        + 25 * ((non_test_count >= 4) & (non_test_count <= 50))
+        + 20 * (non_test_additions + non_test_deletions >= 20)
+        + 18 * has_tests
+        + 8 * (non_test_count >= 6) + 8 * (non_test_count >= 10) + 12 * (non_test_count >= 20)
+        + 4 * (net_non_test >= 100) + 8 * (net_non_test >= 200) + 12 * (net_non_test >= 500)
+        + 8 * (non_test_additions >= 500) + 12 * (non_test_additions >= 1000)
+        - 10 * (non_test_deletions > non_test_additions * 0.5)
+        - np.where(test_ratio > 0.4, np.trunc(30 * test_ratio), 0).astype(np.int64)
+        - 40 * is_refactor
+    )
+    habitate = np.clip(habitate, 0, 150).astype(np.int64)
+
+    # difficulty_score (calculate_difficulty_score)
+    refactor_ratio = _safe_ratio(non_test_deletions, non_test_additions)
+    difficulty = (
+        15 * (non_test_count >= 10) + 10 * (non_test_count >= 20) + 5 * (non_test_count >= 30)
+        + 10 * (directory_count >= 3) + 5 * (directory_count >= 5)
+        + 15 * single_200plus + 10 * single_500plus
+        + 20 * pattern_high + 15 * pattern_mid
+        + 5 * (non_test_additions >= 1000)
+        + 10 * has_tests
+        + 10 * has_core_files
+        + 10 * ((non_test_additions > 0) & (refactor_ratio >= 0.3) & (refactor_ratio <= 0.7))
+        - 30 * is_refactor
+    ).astype(np.float64)
+    difficulty = np.clip(difficulty, 0.0, 100.0)
+
+    # suitability_score (calculate_suitability_score)
+    suitability = (
+        50.0
+        - 35 * is_refactor
+        + 20 * (difficulty >= 60) + 10 * (difficulty >= 80)
+        + 15 * (test_ratio >= 0.5)
+        + 10 * (habitate >= 80)
+        - 15 * (non_test_count < 4) - 10 * (non_test_count > 100)
+        - 10 * (non_test_additions < 200)
+    )
+    suitability = np.where(has_dependencies, 0.0, np.clip(suitability, 0.0, 100.0))
+
+    # analyze_tests
+    test_additions_per_file = columns.is_test & (additions > 0)
+    test_files_added = _per_commit_sum(columns, test_additions_per_file & (deletions == 0))
+    test_files_modified = _per_commit_sum(columns, test_additions_per_file & (deletions > 0))
+    test_files_removed = _per_commit_sum(columns, columns.is_test & (additions == 0) & (deletions > 0))
+    coverage = np.minimum(1.0, test_ratio)
+    test_quality = np.minimum(100, (
+        30 * (coverage >= 0.3) + 20 * (coverage >= 0.5) + 20 * (coverage >= 0.7)
+        + 20 * has_integration_tests + 10 * (test_count >= 3)
+    ))
+
+    return {
+        'file_changes': file_count,
+        'total_additions': total_additions,
+        'total_deletions': total_deletions,
+        'test_additions': test_additions,
+        'non_test_additions': non_test_additions,
+        'non_test_count': non_test_count,
+        'has_dependency_changes': has_dependencies,
+        'has_test_files': has_tests,
+        'habitate_score': habitate,
+        'difficulty_score': difficulty,
+        'suitability_score': suitability,
+        'test_coverage': test_ratio,
+        'test_files_added': test_files_added,
+        'test_files_modified': test_files_modified,
+        'test_files_removed': test_files_removed,
+        'test_coverage_estimate': coverage,
+        'test_quality_score': test_quality,
+        'has_integration_tests': has_integration_tests,
+        'directory_count': directory_count,
+        'has_core_files': has_core_files,
+        'large_single_file': single_200plus,
+        'multiple_high_additions': few_files & all_non_test_300plus
+    }
+
+
+def score_commit_batch(columns: CommitColumns) -> List[Dict]:
+    """
+    Per-commit results of score_columns() as plain Python values, shaped like
+    the outputs of the scalar functions: scores, the analyze_tests() dict and
+    the complexity_indicators dict.
+    """
+    scores = {name: values.tolist() for name, values in score_columns(columns).items()}
+    results = []
+    for i in range(columns.commit_count):
+        non_test_count = scores['non_test_count'][i]
+        file_changes = scores['file_changes'][i]
+        directory_count = scores['directory_count'][i]
+        results.append({
+            'file_changes': file_changes,
+            'total_additions': scores['total_additions'][i],
+            'total_deletions': scores['total_deletions'][i],
+            'test_additions': scores['test_additions'][i],
+            'non_test_additions': scores['non_test_additions'][i],
+            'has_dependency_changes': scores['has_dependency_changes'][i],
+            'has_test_files': scores['has_test_files'][i],
+            'habitate_score': scores['habitate_score'][i],
+            'difficulty_score': scores['difficulty_score'][i],
+            'suitability_score': scores['suitability_score'][i],
+            'test_coverage_score': scores['test_coverage'][i],
+            'test_analysis': {
+                'test_files_added': scores['test_files_added'][i],
+                'test_files_modified': scores['test_files_modified'][i],
+                'test_files_removed': scores['test_files_removed'][i],
+                # Python's round() so values match analyze_tests() exactly
+                'test_coverage_estimate': round(scores['test_coverage_estimate'][i], 2),
+                'test_quality_score': scores['test_quality_score'][i],
+                'has_integration_tests': scores['has_integration_tests'][i],
+                'has_unit_tests': scores['has_test_files'][i]
+            },
+            'complexity_indicators': {
+                'multi_file': 4 <= file_changes <= 50,
+                'cross_directory': directory_count >= 3,
+                'many_directories': directory_count >= 5,
+                'directory_count': directory_count,
+                'has_core_files': scores['has_core_files'][i],
+                # The scalar code yields an empty list here when there are no non-test files
+                'large_single_file': scores['large_single_file'][i] if non_test_count else [],
+                'multiple_high_additions': scores['multiple_high_additions'][i]
+            }
+        })
+    return results
+
+
+def find_parity_mismatches(file_stats_lists: List[List[FileStat]],
+                           refactor_flags: List[bool]) -> List[Tuple[int, str]]:
+    """
+    Compare score_commit_batch() with the scalar functions for the given
+    commits. Returns (commit index, field) for every value that differs.
+    """
+    columns = CommitColumns.from_file_stats(file_stats_lists, refactor_flags)
+    mismatches = []
+    for i, (batch, file_stats, is_refactor) in enumerate(
+            zip(score_commit_batch(columns), file_stats_lists, refactor_flags)):
+        habitate = calculate_habitate_score(file_stats, is_refactor)
+        difficulty = calculate_difficulty_score(file_stats, is_refactor)
+        expected = {
+            'habitate_score': habitate,
+            'difficulty_score': difficulty,
+            'suitability_score': calculate_suitability_score(
+                {}, file_stats, habitate, difficulty, is_refactor
+            ),
+            'test_analysis': analyze_tests(file_stats),
+            'complexity_indicators': calculate_complexity_indicators(file_stats)
+        }
+        for field, value in expected.items():
+            if batch[field] != value or type(batch[field]) is not type(value):
+                mismatches.append((i, field))
+    return mismatches
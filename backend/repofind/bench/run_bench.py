@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Benchmark the commit fetcher on a synthetic repository.
+
+Builds (or reuses) a repo of the requested shape (see synthetic_repo.py) and
+measures:
+    pipeline         fetch_commits_for_repo end to end, with its stage times
+                     (see fetch_metrics), commits/sec and peak RSS
+    file_statistics  the per-commit `git show --numstat` path, on a sample
+    classification   path classification of every changed path, with and
+                     without the classifier's memo cache
+    scoring          the scalar scoring functions and batch_scoring, plus the
+                     number of commits where the two disagree
+
+Writes go to a SQLite stand-in (sqlite_standin.py) unless --mysql points at
+a repo of a scratch MySQL database. Results can be saved as a baseline and
+later runs compared against it; the exit status is 1 when a metric regressed
+by more than --tolerance, so the benchmark can gate a CI job.
+
+    python bench/run_bench.py --commits 5000 --save-baseline bench/baseline.json
+    python bench/run_bench.py --commits 5000 --compare bench/baseline.json
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+import fetch_commits  # noqa: E402
+from batch_scoring import CommitColumns, find_parity_mismatches, score_commit_batch  # noqa: E402
+from fetch_metrics import StageTimer  # noqa: E402
+from message_rules import BEHAVIOR_PRESERVING_REFACTOR, MESSAGE_CLASSIFIER  # noqa: E402
+from path_classifier import PATH_CACHE_SIZE, PathClassifier  # noqa: E402
+from sqlite_standin import SQLiteStandIn  # noqa: E402
+from synthetic_repo import add_shape_arguments, get_repo, shape_from_args  # noqa: E402
+
+BENCH_REPOS_DIR = BENCH_DIR / 'repos'
+DEFAULT_TOLERANCE = 0.2
+# Timings that moved by less than this are noise, whatever the relative change
+MIN_SECONDS_DELTA = 0.01
+DEFAULT_FILE_STATISTICS_SAMPLE = 200
+
+
+def _metric(value: float, unit: str, better: str = 'lower') -> Dict:
+    return {'value': round(value, 6), 'unit': unit, 'better': better}
+
+
+def _peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10)
+
+
+def bench_pipeline(repo_path: Path, args) -> Dict[str, Dict]:
+    """Run fetch_commits_for_repo over the whole repo into a fresh database."""
+    timer = StageTimer(repo_path.name)
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.mysql:
+            conn = fetch_commits.get_db_connection()
+            repo_id = args.mysql
+            cursor = conn.cursor()
+            # Start from nothing so every commit is written (fingerprints would skip them)
+            cursor.execute("DELETE FROM commits WHERE repo_id = %s", (repo_id,))
+            cursor.execute("DELETE FROM fetch_checkpoints WHERE repo_id = %s", (repo_id,))
+            conn.commit()
+            cursor.close()
+        else:
+            conn = SQLiteStandIn(Path(tmp) / 'bench.sqlite3')
+            repo_id = 1
+
+        started = time.perf_counter()
+        output = io.StringIO()
+        try:
+            with redirect_stdout(output):
+                saved = fetch_commits.fetch_commits_for_repo(
+                    repo_id, 'bench', repo_path.name, datetime(2000, 1, 1), 'main',
+                    batch_size=args.batch_size, full=True, conn=conn,
+                    analysis_workers=args.analysis_workers, repo_path=repo_path,
+                    timer=timer, use_cache=False, bulk_load=bool(args.mysql)
+                )
+        finally:
+            conn.close()
+        elapsed = time.perf_counter() - started
+
+    if not saved:
+        print(output.getvalue())
+        raise SystemExit("❌ The pipeline saved no commits")
+
+    metrics = {
+        'pipeline_seconds': _metric(elapsed, 's'),
+        'pipeline_commits_per_sec': _metric(saved / elapsed, 'commits/s', 'higher'),
+        'pipeline_peak_rss_mb': _metric(_peak_rss_mb(), 'MB'),
+        'git_peak_rss_mb': _metric(_peak_rss_mb(resource.RUSAGE_CHILDREN), 'MB'),
+    }
+    for stage, seconds in timer.seconds.items():
+        if timer.calls.get(stage):
+            metrics[f'stage_{stage}_seconds'] = _metric(seconds, 's')
+    return metrics
+
+
+def get_file_statistics(repo_path: Path, commit_hash: str) -> List:
+    """
+    Per-file statistics of one commit from `git show --numstat`: how
+    fetch_commits read them before iter_commit_records, kept as a reference point.
+    """
+    result = subprocess.run(['git', 'show', '--numstat', '--format=', commit_hash],
+                            cwd=repo_path, capture_output=True, text=True, check=True)
+    file_stats = []
+    for line in result.stdout.strip().split('\n'):
+        parts = line.split('\t')
+        if len(parts) >= 3:
+            additions = int(parts[0]) if parts[0] != '-' else 0
+            deletions = int(parts[1]) if parts[1] != '-' else 0
+            file_stats.append(fetch_commits.build_file_stat('\t'.join(parts[2:]), additions, deletions))
+    return file_stats
+
+
+def bench_file_statistics(repo_path: Path, records: List, sample: int) -> Dict[str, Dict]:
+    """The one-`git show`-per-commit path that iter_commit_records replaced."""
+    shas = [commit['hexsha'] for commit, _ in records[:sample]]
+    started = time.perf_counter()
+    for sha in shas:
+        get_file_statistics(repo_path, sha)
+    elapsed = time.perf_counter() - started
+    return {'file_statistics_ms_per_commit': _metric(elapsed * 1000 / max(1, len(shas)), 'ms')}
+
+
+def bench_classification(records: List) -> Dict[str, Dict]:
+    paths = [file_stat.file_path for _, file_stats in records for file_stat in file_stats]
+    metrics = {}
+    for name, cache_size in (('uncached', 0), ('cached', PATH_CACHE_SIZE)):
+        classifier = PathClassifier(cache_size=cache_size)
+        started = time.perf_counter()
+        for path in paths:
+            classifier.classify(path)
+        metrics[f'classification_{name}_seconds'] = _metric(time.perf_counter() - started, 's')
+    metrics['classification_paths'] = _metric(len(paths), 'paths', 'same')
+    return metrics
+
+
+def bench_scoring(records: List) -> Dict[str, Dict]:
+    file_stats_lists = [file_stats for _, file_stats in records if file_stats]
+    refactor_flags = [BEHAVIOR_PRESERVING_REFACTOR in MESSAGE_CLASSIFIER.classify(commit['message'])
+                      for commit, file_stats in records if file_stats]
+
+    started = time.perf_counter()
+    for file_stats, is_refactor in zip(file_stats_lists, refactor_flags):
+        habitate = fetch_commits.calculate_habitate_score(file_stats, is_refactor)
+        difficulty = fetch_commits.calculate_difficulty_score(file_stats, is_refactor)
+        fetch_commits.calculate_suitability_score({}, file_stats, habitate, difficulty, is_refactor)
+        fetch_commits.calculate_complexity_indicators(file_stats)
+        fetch_commits.analyze_tests(file_stats)
+    scalar = time.perf_counter() - started
+
+    started = time.perf_counter()
+    score_commit_batch(CommitColumns.from_file_stats(file_stats_lists, refactor_flags))
+    batch = time.perf_counter() - started
+
+    mismatches = find_parity_mismatches(file_stats_lists, refactor_flags)
+    return {
+        'scoring_scalar_seconds': _metric(scalar, 's'),
+        'scoring_batch_seconds': _metric(batch, 's'),
+        'scoring_parity_mismatches': _metric(len({index for index, _ in mismatches}), 'commits'),
+    }
+
+
+def run_once(repo_path: Path, args) -> Dict[str, Dict]:
+    # First, so its peak RSS isn't inflated by the records held for the other stages
+    metrics = bench_pipeline(repo_path, args)
+    records = list(fetch_commits.iter_commit_records(repo_path, 'main'))
+    metrics.update(bench_file_statistics(repo_path, records, args.file_statistics_sample))
+    metrics.update(bench_classification(records))
+    metrics.update(bench_scoring(records))
+    return metrics
+
+
+def best_of(runs: List[Dict[str, Dict]]) -> Dict[str, Dict]:
+    """Per metric, the best value over the runs (timings are noisy upwards only)."""
+    best = {}
+    for name, metric in runs[0].items():
+        values = [run[name]['value'] for run in runs]
+        value = max(values) if metric['better'] == 'higher' else min(values)
+        best[name] = dict(metric, value=value)
+    return best
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Print each metric against the baseline; returns the names of regressed metrics."""
+    if results['shape'] != baseline.get('shape'):
+        print("⚠️  The baseline was made with a different repo shape; differences are not comparable")
+    regressions = []
+    print(f"\n{'metric':<36} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, metric in results['metrics'].items():
+        base = baseline['metrics'].get(name)
+        if not base:
+            print(f"{name:<36} {'-':>12} {metric['value']:>12.4g}")
+            continue
+        old, new = base['value'], metric['value']
+        change = (new - old) / old if old else 0.0
+        if metric['better'] == 'same':
+            regressed = new != old
+        elif metric['better'] == 'higher':
+            regressed = change < -tolerance
+        else:
+            regressed = change > tolerance
+        if metric['unit'] == 's' and abs(new - old) < MIN_SECONDS_DELTA:
+            regressed = False
+        if name == 'scoring_parity_mismatches':
+            regressed = new > 0
+        flag = ' ❌' if regressed else ''
+        print(f"{name:<36} {old:>12.4g} {new:>12.4g} {change:>+7.0%}{flag}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fetch_commits.py on a synthetic repo.")
+    add_shape_arguments(parser)
+    parser.add_argument('--rebuild-repo', action='store_true',
+                        help="Build the synthetic repo again even if it exists")
+    parser.add_argument('--repeat', type=int, default=1,
+                        help="Runs to take the best value of per metric (default: 1)")
+    parser.add_argument('--batch-size', type=int, default=fetch_commits.DEFAULT_BATCH_SIZE,
+                        help=f"Commits per insert batch (default: {fetch_commits.DEFAULT_BATCH_SIZE})")
+    parser.add_argument('--analysis-workers', type=int, default=1,
+                        help="Processes used to analyse commits in the pipeline run (default: 1)")
+    parser.add_argument('--file-statistics-sample', type=int, default=DEFAULT_FILE_STATISTICS_SAMPLE,
+                        help=f"Commits run through get_file_statistics (default: {DEFAULT_FILE_STATISTICS_SAMPLE})")
+    parser.add_argument('--mysql', type=int, metavar='REPO_ID',
+                        help="Write to MySQL (DB_* settings) as this git_repos id instead of SQLite. "
+                             "Its commits are deleted first: use a scratch database")
+    parser.add_argument('--output', type=Path, help="Write the results JSON here")
+    parser.add_argument('--save-baseline', type=Path, help="Write the results JSON as a baseline")
+    parser.add_argument('--compare', type=Path, help="Compare against a baseline JSON")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f"Allowed relative regression per metric (default: {DEFAULT_TOLERANCE})")
+    args = parser.parse_args()
+
+    shape = shape_from_args(args)
+    started = time.perf_counter()
+    repo_path = get_repo(BENCH_REPOS_DIR, shape, args.rebuild_repo)
+    print(f"📦 Synthetic repo {repo_path.name} ({shape.commits} commits, "
+          f"ready in {time.perf_counter() - started:.1f}s)")
+
+    runs = []
+    for i in range(max(1, args.repeat)):
+        print(f"  Run {i + 1}/{max(1, args.repeat)}...")
+        runs.append(run_once(repo_path, args))
+
+    results = {
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'host': platform.node(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'database': 'mysql' if args.mysql else 'sqlite',
+        'shape': vars(shape),
+        'metrics': best_of(runs)
+    }
+
+    for name, metric in results['metrics'].items():
+        print(f"  {name:<36} {metric['value']:>12.4g} {metric['unit']}")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            path.write_text(json.dumps(results, indent=2) + '\n', encoding='utf-8')
+            print(f"✅ Results written to {path}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding='utf-8'))
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} metrics regressed by more than {args.tolerance:.0%}: "
+                  + ', '.join(regressions))
+            sys.exit(1)
+        print(f"\n✅ No regressions beyond {args.tolerance:.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+SQLite stand-in for the MySQL connection used by fetch_commits.py.
+
+Lets the benchmark run the real write path (CommitBatchWriter, checkpoints,
+watermarks) without a MySQL server. Statements are translated on the fly
+(%s placeholders, ON DUPLICATE KEY UPDATE / VALUES(col), NOW()), and the
+tables are created from the INSERT statements in fetch_commits.py, so the
+stand-in follows the columns the fetcher actually writes. Absolute write
+times differ from MySQL; compare runs against a baseline made the same way.
+"""
+
+import re
+import sqlite3
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Tuple, Union
+
+import fetch_commits
+
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+
+# Unique keys the upserts rely on, as in the MySQL schema
+UNIQUE_KEYS: Dict[str, Tuple[str, ...]] = {
+    'commits': ('repo_id', 'base_commit'),
+    'commit_files': ('commit_id', 'file_path'),
+    'commit_dependency_analysis': ('commit_id',),
+    'commit_test_analysis': ('commit_id',),
+    'commit_file_stats_cache': ('commit_id',),
+    'fetch_checkpoints': ('repo_id',),
+}
+
+# Columns set only by ON DUPLICATE KEY UPDATE clauses or other statements
+EXTRA_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    'commits': ('created_at', 'updated_at'),
+    'commit_dependency_analysis': ('analysis_date',),
+    'commit_test_analysis': ('analysis_date',),
+    'commit_file_stats_cache': ('created_at', 'updated_at'),
+    'fetch_checkpoints': ('created_at', 'updated_at'),
+}
+
+_INSERT_RE = re.compile(r'INSERT INTO (\w+)\s*\((.*?)\)\s*VALUES', re.S)
+
+
+@lru_cache(maxsize=None)
+def translate(sql: str) -> str:
+    """MySQL statement as used by fetch_commits.py -> SQLite statement."""
+    sql = sql.replace('%s', '?')
+    sql = re.sub(r'\bNOW\(\)', 'CURRENT_TIMESTAMP', sql)
+    sql = sql.replace('ON DUPLICATE KEY UPDATE', 'ON CONFLICT DO UPDATE SET')
+    return re.sub(r'\bVALUES\((\w+)\)', r'excluded.\1', sql)
+
+
+def _schema() -> str:
+    statements = [
+        'CREATE TABLE git_repos (id INTEGER PRIMARY KEY, last_fetched_sha TEXT, last_fetched_at TEXT)'
+    ]
+    for value in vars(fetch_commits).values():
+        if not isinstance(value, str):
+            continue
+        match = _INSERT_RE.search(value)
+        if not match or match.group(1) not in UNIQUE_KEYS:
+            continue
+        table = match.group(1)
+        columns = [column.strip() for column in match.group(2).split(',')]
+        columns += EXTRA_COLUMNS.get(table, ())
+        id_column = [] if table == 'fetch_checkpoints' else ['id INTEGER PRIMARY KEY']
+        statements.append(
+            f"CREATE TABLE {table} ({', '.join(id_column + columns)}, "
+            f"UNIQUE ({', '.join(UNIQUE_KEYS[table])}))"
+        )
+    return ';\n'.join(statements)
+
+
+class _Cursor:
+    def __init__(self, cursor: sqlite3.Cursor):
+        self._cursor = cursor
+
+    def execute(self, sql: str, params=()):
+        self._cursor.execute(translate(sql), tuple(params))
+
+    def executemany(self, sql: str, rows):
+        self._cursor.executemany(translate(sql), [tuple(row) for row in rows])
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def rowcount(self) -> int:
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteStandIn:
+    """The parts of a mysql.connector connection that fetch_commits_for_repo uses."""
+
+    def __init__(self, path: Union[str, Path] = ':memory:', repo_id: int = 1):
+        self._conn = sqlite3.connect(str(path))
+        self._conn.executescript(_schema())
+        self._conn.execute('INSERT INTO git_repos (id) VALUES (?)', (repo_id,))
+        self._conn.commit()
+
+    def cursor(self, *args, **kwargs) -> _Cursor:
+        return _Cursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+    def count(self, table: str) -> int:
+        return self._conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
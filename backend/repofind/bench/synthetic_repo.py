@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Build synthetic git repositories for benchmarking fetch_commits.py.
+
+The history is generated in one `git fast-import` stream, so even repos with
+tens of thousands of commits take seconds to build. The shape is controlled
+by RepoShape: commit count, files per commit, share of test files, and how
+often vendored-directory dumps, merges, renames, dependency manifest changes
+and huge single commits occur. The same shape and seed always give the same
+repo, so benchmark runs are comparable.
+
+    python bench/synthetic_repo.py /tmp/bench-repo --commits 5000 --merge-every 20
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import subprocess
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# 2020-01-01T00:00:00Z; commits are an hour apart
+START_TIMESTAMP = 1577836800
+
+COMPONENTS = ('api', 'core', 'db', 'ui', 'utils', 'workers', 'auth', 'billing')
+MESSAGES = (
+    'Add {name} handling',
+    'Fix edge case in {name} (#{pr})',
+    'Refactor {name} without behavior change',
+    'Update {name} docs',
+    'Improve {name} performance',
+    'Merge pull request #{pr} from dev/{name}',
+)
+
+
+@dataclass
+class RepoShape:
+    """What the generated history looks like; 0 disables an `*_every` feature."""
+    commits: int = 2000
+    files_per_commit: int = 4
+    lines_per_change: int = 40
+    test_ratio: float = 0.3
+    merge_every: int = 25
+    rename_every: int = 40
+    vendor_every: int = 200
+    vendor_files: int = 300
+    manifest_every: int = 30
+    huge_every: int = 500
+    huge_lines: int = 20000
+    seed: int = 1
+
+    def key(self) -> str:
+        """Stable id of the shape, used to reuse an already built repo."""
+        return hashlib.sha256(json.dumps(asdict(self), sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+
+class _File:
+    """A file whose content is the window [start, start + lines) of numbered lines."""
+
+    __slots__ = ('start', 'lines')
+
+    def __init__(self, lines: int):
+        self.start = 0
+        self.lines = lines
+
+    def change(self, additions: int, deletions: int):
+        deletions = min(deletions, self.lines)
+        self.start += deletions
+        self.lines += additions - deletions
+
+    def content(self, path: str) -> bytes:
+        return ''.join(f'{path}:{i}\n' for i in range(self.start, self.start + self.lines)).encode('utf-8')
+
+
+def _data(payload: bytes) -> bytes:
+    return b'data %d\n%s\n' % (len(payload), payload)
+
+
+def _modify(path: str, payload: bytes) -> bytes:
+    return b'M 100644 inline %s\n%s' % (path.encode('utf-8'), _data(payload))
+
+
+def _manifest(dependencies: int) -> bytes:
+    return json.dumps({
+        'name': 'synthetic',
+        'dependencies': {f'dep-{i}': f'^1.{i}.0' for i in range(dependencies)}
+    }, indent=2).encode('utf-8')
+
+
+class _History:
+    """Generates the fast-import commands for a RepoShape."""
+
+    def __init__(self, shape: RepoShape):
+        self.shape = shape
+        self.rng = random.Random(shape.seed)
+        self.files: Dict[str, _File] = {}
+        self.mark = 0
+        self.commit_count = 0
+        self.manifest_dependencies = 1
+
+    def _new_path(self) -> str:
+        component = self.rng.choice(COMPONENTS)
+        name = f'module_{len(self.files)}'
+        if self.rng.random() < self.shape.test_ratio:
+            return f'tests/{component}/test_{name}.py'
+        return f'src/{component}/{name}.py'
+
+    def _message(self) -> bytes:
+        template = self.rng.choice(MESSAGES)
+        return template.format(name=self.rng.choice(COMPONENTS), pr=self.rng.randint(1, 9999)).encode('utf-8')
+
+    def _commit(self, ref: str, parent: int, operations: List[bytes], merge: int = 0) -> Tuple[bytes, int]:
+        self.mark += 1
+        self.commit_count += 1
+        when = START_TIMESTAMP + self.commit_count * 3600
+        ident = b'Bench Author <bench@example.com> %d +0000' % when
+        parts = [
+            b'commit %s\n' % ref.encode('utf-8'),
+            b'mark :%d\n' % self.mark,
+            b'author %s\n' % ident,
+            b'committer %s\n' % ident,
+            _data(self._message())
+        ]
+        if parent:
+            parts.append(b'from :%d\n' % parent)
+        if merge:
+            parts.append(b'merge :%d\n' % merge)
+        parts.extend(operations)
+        parts.append(b'\n')
+        return b''.join(parts), self.mark
+
+    def _change_files(self, count: int, lines: int) -> List[bytes]:
+        operations = []
+        existing = list(self.files)
+        for _ in range(count):
+            if existing and self.rng.random() < 0.7:
+                path = self.rng.choice(existing)
+                self.files[path].change(self.rng.randint(1, lines), self.rng.randint(0, lines // 2))
+            else:
+                path = self._new_path()
+                self.files[path] = _File(self.rng.randint(1, lines))
+            operations.append(_modify(path, self.files[path].content(path)))
+        return operations
+
+    def _is_dump(self, n: int) -> bool:
+        """Whether step `n` is a huge single-file commit or a vendored-directory dump."""
+        shape = self.shape
+        return bool((shape.huge_every and n % shape.huge_every == 0)
+                    or (shape.vendor_every and n % shape.vendor_every == 0))
+
+    def _regular_operations(self, n: int) -> List[bytes]:
+        shape = self.shape
+        if shape.huge_every and n % shape.huge_every == 0:
+            path = f'src/generated/huge_{n}.py'
+            self.files[path] = _File(shape.huge_lines)
+            return [_modify(path, self.files[path].content(path))]
+        if shape.vendor_every and n % shape.vendor_every == 0:
+            operations = []
+            for i in range(shape.vendor_files):
+                path = f'vendor/lib_{n}/file_{i}.js'
+                operations.append(_modify(path, _File(self.rng.randint(20, 200)).content(path)))
+            return operations
+
+        operations = self._change_files(self.rng.randint(1, max(1, shape.files_per_commit * 2 - 1)),
+                                        shape.lines_per_change)
+        if shape.rename_every and n % shape.rename_every == 0 and self.files:
+            old_path = self.rng.choice(list(self.files))
+            new_path = old_path.replace('.py', f'_renamed_{n}.py')
+            self.files[new_path] = self.files.pop(old_path)
+            operations.append(b'R %s %s\n' % (old_path.encode('utf-8'), new_path.encode('utf-8')))
+        if shape.manifest_every and n % shape.manifest_every == 0:
+            self.manifest_dependencies += 1
+            operations.append(_modify('package.json', _manifest(self.manifest_dependencies)))
+        return operations
+
+    def stream(self) -> bytes:
+        shape = self.shape
+        commands = []
+        head = 0
+        n = 0
+        while self.commit_count < shape.commits:
+            n += 1
+            if (shape.merge_every and n % shape.merge_every == 0 and not self._is_dump(n)
+                    and head and self.commit_count + 2 <= shape.commits):
+                # A side-branch commit merged back; main hasn't moved, so the merge
+                # tree is the side commit's and its first-parent diff is that change
+                side_operations = self._change_files(2, shape.lines_per_change)
+                command, side = self._commit('refs/heads/side', head, side_operations)
+                commands.append(command)
+                command, head = self._commit('refs/heads/main', head, side_operations, merge=side)
+                commands.append(command)
+                continue
+            command, head = self._commit('refs/heads/main', head, self._regular_operations(n))
+            commands.append(command)
+        return b''.join(commands)
+
+
+def build_repo(path: Path, shape: RepoShape) -> Path:
+    """Create a bare repo with `shape`'s history at `path` (which must not exist)."""
+    path = Path(path)
+    subprocess.run(['git', 'init', '--quiet', '--bare', str(path)], check=True)
+    subprocess.run(['git', 'symbolic-ref', 'HEAD', 'refs/heads/main'], cwd=path, check=True)
+    subprocess.run(['git', 'fast-import', '--quiet'], cwd=path, input=_History(shape).stream(), check=True)
+    return path
+
+
+def get_repo(repos_dir: Path, shape: RepoShape, rebuild: bool = False) -> Path:
+    """The repo for `shape` under `repos_dir`, built on first use."""
+    path = Path(repos_dir) / f'synthetic-{shape.key()}.git'
+    if path.exists() and not rebuild:
+        return path
+    if path.exists():
+        subprocess.run(['rm', '-rf', str(path)], check=True)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return build_repo(path, shape)
+
+
+def add_shape_arguments(parser: argparse.ArgumentParser):
+    """One --option per RepoShape field, defaulting to the RepoShape defaults."""
+    for field in fields(RepoShape):
+        parser.add_argument(f"--{field.name.replace('_', '-')}", type=field.type, default=field.default,
+                            dest=field.name, help=f"(default: {field.default})")
+
+
+def shape_from_args(args: argparse.Namespace) -> RepoShape:
+    return RepoShape(**{field.name: getattr(args, field.name) for field in fields(RepoShape)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a synthetic git repository for benchmarks.")
+    parser.add_argument('path', type=Path, help="Where to create the bare repo")
+    add_shape_arguments(parser)
+    args = parser.parse_args()
+    shape = shape_from_args(args)
+    build_repo(args.path, shape)
+    print(f"✅ Built {args.path} ({shape.commits} commits, shape {shape.key()})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+LOAD DATA LOCAL INFILE helpers for the initial load of a repo.
+
+Rows are written to TSV files in BULK_LOAD_DIR, in the format LOAD DATA
+reads by default (tab-separated, backslash escapes, \\N for NULL), and
+loaded into temporary staging tables. The staging tables take their column
+types from the live tables, so they follow schema changes by themselves;
+being TEMPORARY, they are private to the connection and go away with it.
+
+The MySQL server needs `local_infile=ON`. On the client side, LOAD DATA
+LOCAL is only allowed for files inside BULK_LOAD_DIR (see
+allow_local_infile_in_path in fetch_commits.DB_CONFIG).
+"""
+
+import os
+import tempfile
+from datetime import date, datetime
+from decimal import ROUND_HALF_UP, Decimal
+from pathlib import Path
+from typing import Any, Iterable, Sequence
+
+BULK_LOAD_DIR = Path(os.getenv('BULK_LOAD_DIR', Path(tempfile.gettempdir()) / 'repofind-bulk-load')).absolute()
+# Only repos with at least this many commits to save are worth staging
+BULK_LOAD_MIN_COMMITS = int(os.getenv('BULK_LOAD_MIN_COMMITS', 5000))
+# Commits per load; each one is merged (and checkpointed) in one transaction
+BULK_LOAD_BATCH_SIZE = int(os.getenv('BULK_LOAD_BATCH_SIZE', 20000))
+
+# Must exist before connecting, or the client won't allow LOAD DATA LOCAL from it
+BULK_LOAD_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+
+# Every float column loaded here is DECIMAL(n,2); floats are rounded to that
+# scale before loading, as MySQL would, so the load raises no Notes for them
+DECIMAL_SCALE = Decimal('0.01')
+
+_TSV_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r', '\0': '\\0'})
+
+
+class BulkLoadError(Exception):
+    """A load didn't store every row as written, e.g. values MySQL had to convert."""
+
+
+def tsv_field(value: Any) -> str:
+    """`value` as LOAD DATA reads it back, converted like mysql.connector converts parameters."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, datetime):
+        # Like mysql.connector, drop the timezone and keep the wall-clock time
+        return value.strftime('%Y-%m-%d %H:%M:%S.%f' if value.microsecond else '%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float):
+        # mysql.connector sends repr(); MySQL rounds that half away from zero
+        return str(Decimal(repr(value)).quantize(DECIMAL_SCALE, ROUND_HALF_UP))
+    if isinstance(value, str):
+        return value.translate(_TSV_ESCAPES)
+    return str(value)
+
+
+class TsvFile:
+    """A temporary TSV file in BULK_LOAD_DIR whose rows are numbered in a leading `seq` field."""
+
+    def __init__(self, name: str):
+        fd, path = tempfile.mkstemp(prefix=f'{name}-', suffix='.tsv', dir=BULK_LOAD_DIR)
+        self.path = Path(path)
+        self.file = os.fdopen(fd, 'w', encoding='utf-8', newline='\n')
+        self.rows = 0
+
+    def write(self, values: Iterable[Any]):
+        self.file.write('\t'.join(map(tsv_field, (self.rows, *values))) + '\n')
+        self.rows += 1
+
+    def close(self):
+        self.file.close()
+
+    def remove(self):
+        self.file.close()
+        self.path.unlink(missing_ok=True)
+
+
+def create_staging_table(cursor, name: str, select_sql: str):
+    """
+    Create (if needed) and empty the temporary table `name`: a `seq` primary
+    key, which keeps rows in load order, plus the columns of `select_sql`,
+    a query over the live tables that returns no rows.
+    """
+    cursor.execute(f"""
+        CREATE TEMPORARY TABLE IF NOT EXISTS {name} (seq INT UNSIGNED NOT NULL PRIMARY KEY)
+        {select_sql}
+    """)
+    # Not TRUNCATE, which would commit the transaction
+    cursor.execute(f"DELETE FROM {name}")
+
+
+def drop_staging_table(cursor, name: str):
+    cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {name}")
+
+
+def load_tsv(cursor, tsv: TsvFile, table: str, columns: Sequence[str]):
+    """
+    LOAD DATA LOCAL INFILE `tsv` into `table`. Its rows are `seq` followed
+    by `columns`. With LOCAL, bad values only give warnings, so any warning
+    or missing row raises BulkLoadError instead. Notes (e.g. a DECIMAL
+    rounded) are allowed, but as MySQL lists at most max_error_count
+    conditions, a load with more Notes than that is refused too: the
+    Warnings could be among those left out.
+    """
+    tsv.close()
+    cursor.execute(f"""
+        LOAD DATA LOCAL INFILE %s INTO TABLE {table}
+        CHARACTER SET utf8mb4
+        FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+        LINES TERMINATED BY '\\n'
+        (seq, {', '.join(columns)})
+    """, (str(tsv.path),))
+    loaded = cursor.rowcount
+    cursor.execute("SELECT @@warning_count")
+    warning_count = cursor.fetchone()[0]
+    if warning_count:
+        cursor.execute("SHOW WARNINGS")
+        conditions = cursor.fetchall()
+        warnings = [message for level, code, message in conditions if level != 'Note']
+        if warnings:
+            raise BulkLoadError(f"Loading {table}: {'; '.join(warnings[:3])}")
+        if len(conditions) < warning_count:
+            raise BulkLoadError(f"Loading {table}: {warning_count} warnings, only {len(conditions)} listed")
+    if loaded != tsv.rows:
+        raise BulkLoadError(f"Loaded {loaded} of {tsv.rows} rows into {table}")
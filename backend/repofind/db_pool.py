@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Pooled MySQL connections with retry on connection loss.
+
+Every process gets its own mysql.connector pool, created on first use: the
+sockets of a parent's pool must not be used by forked workers, so pools are
+looked up by pid. Threads of a process share its pool, each taking its own
+connection. A connection is pinged when it is taken from the pool and
+reconnected if the server dropped it while idle; close() hands it back.
+
+run_in_transaction() retries a whole transaction after the connection is
+lost or InnoDB rolls it back (deadlock, lock wait timeout), so long runs
+survive a MySQL restart or an idle timeout without losing the batch.
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, TypeVar
+
+from mysql.connector import Error, InterfaceError, OperationalError, errorcode, pooling
+
+DB_POOL_SIZE = min(int(os.getenv('DB_POOL_SIZE', 4)), pooling.CNX_POOL_MAXSIZE)
+DB_CONNECT_RETRIES = int(os.getenv('DB_CONNECT_RETRIES', 5))
+DB_RETRY_DELAY = float(os.getenv('DB_RETRY_DELAY', 2))
+
+# The connection is gone, and the uncommitted transaction with it
+CONNECTION_ERRORS = frozenset({
+    errorcode.CR_CONNECTION_ERROR, errorcode.CR_CONN_HOST_ERROR,
+    errorcode.CR_SERVER_GONE_ERROR, errorcode.CR_SERVER_LOST,
+    errorcode.CR_SERVER_LOST_EXTENDED
+})
+
+# InnoDB rolled the transaction back; running it again is expected to work
+TRANSACTION_RETRY_ERRORS = frozenset({errorcode.ER_LOCK_DEADLOCK, errorcode.ER_LOCK_WAIT_TIMEOUT})
+
+T = TypeVar('T')
+
+_pools: Dict[int, pooling.MySQLConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _reset_lock_after_fork():
+    # Another thread may have held the lock at fork time; the child starts with a fresh one
+    global _pools_lock
+    _pools_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_lock_after_fork)
+
+
+def is_connection_error(error: Error) -> bool:
+    # Errors raised by the connector itself, e.g. "MySQL Connection not available",
+    # carry no errno (mysql.connector stores it as -1)
+    return error.errno in CONNECTION_ERRORS or (
+        error.errno in (None, -1) and isinstance(error, (InterfaceError, OperationalError))
+    )
+
+
+def _retry_delay(attempt: int) -> float:
+    return DB_RETRY_DELAY * 2 ** attempt
+
+
+def _get_pool(config: Dict) -> pooling.MySQLConnectionPool:
+    pid = os.getpid()
+    with _pools_lock:
+        pool = _pools.get(pid)
+        if pool is None:
+            # Opens DB_POOL_SIZE connections; not stored if that fails, so the next call tries again
+            pool = pooling.MySQLConnectionPool(pool_name=f'repofind-{pid}', pool_size=DB_POOL_SIZE,
+                                               **config)
+            _pools[pid] = pool
+        return pool
+
+
+def get_pooled_connection(config: Dict):
+    """
+    A connection from this process's pool (created from `config` on first use),
+    checked and reconnected if needed. Connect errors and an exhausted pool are retried
+    DB_CONNECT_RETRIES times with a doubling delay before the last error is raised.
+    """
+    for attempt in range(DB_CONNECT_RETRIES + 1):
+        try:
+            return _get_pool(config).get_connection()
+        except Error as e:
+            if attempt == DB_CONNECT_RETRIES:
+                raise
+            delay = _retry_delay(attempt)
+            print(f"Error connecting to MySQL: {e} (retry {attempt + 1}/{DB_CONNECT_RETRIES} in {delay:g}s)")
+            time.sleep(delay)
+
+
+def reconnect(conn):
+    """Re-open a dropped connection in place, retrying like get_pooled_connection()."""
+    conn.reconnect(attempts=DB_CONNECT_RETRIES + 1, delay=int(DB_RETRY_DELAY))
+
+
+def run_in_transaction(conn, work: Callable[[], T], retries: int = DB_CONNECT_RETRIES) -> T:
+    """
+    Run `work()`, which executes and commits one transaction on `conn`.
+    When the connection drops (it is reconnected first) or InnoDB rolls the
+    transaction back, the whole transaction is run again, up to `retries`
+    times. `work` must therefore not keep state from a failed attempt.
+    Other errors are raised as they are, with the transaction still open.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return work()
+        except Error as e:
+            lost = is_connection_error(e)
+            if attempt == retries or not (lost or e.errno in TRANSACTION_RETRY_ERRORS):
+                raise
+            print(f"    MySQL error, retrying the transaction ({attempt + 1}/{retries}): {e}")
+            if lost:
+                reconnect(conn)
+            else:
+                conn.rollback()
+                time.sleep(_retry_delay(attempt))
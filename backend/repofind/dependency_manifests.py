@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Parse dependency manifests and lockfiles into {dependency name: version}.
+
+Manifests are read from git at both sides of a change (see
+fetch_commits.analyze_dependencies) and parsed results are cached by blob
+SHA, so a lockfile that stays the same across thousands of commits is
+parsed once per process.
+"""
+
+import json
+import os
+import re
+import tomllib
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple, Union
+
+MANIFEST_CACHE_SIZE = int(os.getenv('MANIFEST_CACHE_SIZE', 4096))
+
+Dependencies = Dict[str, str]
+
+_REQUIREMENT_RE = re.compile(r'^([A-Za-z0-9][A-Za-z0-9._-]*)\s*(?:\[[^\]]*\])?\s*(.*)$')
+_GO_REQUIRE_RE = re.compile(r'^(\S+)\s+(v\S+)')
+_GRADLE_RE = re.compile(r'''['"]([\w.\-]+):([\w.\-]+):([^'"@:\s]+)['"]''')
+_GEM_RE = re.compile(r'''^\s*gem\s+['"]([^'"]+)['"](?:\s*,\s*['"]([^'"]+)['"])?''', re.MULTILINE)
+_GEMFILE_LOCK_SPEC_RE = re.compile(r'^    (\S+) \(([^)]+)\)$', re.MULTILINE)
+_YARN_VERSION_RE = re.compile(r'^\s+version:?\s+"?([^"\s]+)"?')
+
+
+def _package_json(text: str) -> Dependencies:
+    data = json.loads(text)
+    dependencies = {}
+    for section in ('dependencies', 'devDependencies', 'peerDependencies', 'optionalDependencies'):
+        dependencies.update(data.get(section) or {})
+    return dependencies
+
+
+def _package_lock(text: str) -> Dependencies:
+    data = json.loads(text)
+    packages = data.get('packages')
+    if packages:
+        # lockfileVersion 2+: keys are install paths, "" is the root project
+        return {path.rsplit('node_modules/', 1)[-1]: info.get('version', '')
+                for path, info in packages.items() if path}
+    return {name: info.get('version', '') for name, info in (data.get('dependencies') or {}).items()}
+
+
+def _yarn_lock(text: str) -> Dependencies:
+    dependencies = {}
+    names = []
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        if not line[0].isspace():
+            # `"a@^1.0", a@^1.1:` (v1) or `"a@npm:^1.0":` (berry)
+            names = []
+            for spec in line.rstrip(':').split(','):
+                spec = spec.strip().strip('"')
+                name = spec[:spec.index('@', 1)] if '@' in spec[1:] else spec
+                if name and name != '__metadata':
+                    names.append(name)
+            continue
+        match = _YARN_VERSION_RE.match(line)
+        if match and names:
+            for name in names:
+                dependencies[name] = match.group(1)
+            names = []
+    return dependencies
+
+
+def _go_mod(text: str) -> Dependencies:
+    dependencies = {}
+    in_block = False
+    for line in text.splitlines():
+        line = line.split('//', 1)[0].strip()
+        if in_block:
+            if line == ')':
+                in_block = False
+                continue
+        elif line.startswith('require ('):
+            in_block = True
+            continue
+        elif line.startswith('require '):
+            line = line[len('require '):]
+        else:
+            continue
+        match = _GO_REQUIRE_RE.match(line)
+        if match:
+            dependencies[match.group(1)] = match.group(2)
+    return dependencies
+
+
+def _go_sum(text: str) -> Dependencies:
+    versions: Dict[str, set] = {}
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) >= 2:
+            versions.setdefault(parts[0], set()).add(parts[1].split('/', 1)[0])
+    return {module: ','.join(sorted(module_versions)) for module, module_versions in versions.items()}
+
+
+def _requirements_txt(text: str) -> Dependencies:
+    dependencies = {}
+    for line in text.splitlines():
+        line = line.split(' #', 1)[0].strip()
+        if not line or line.startswith(('#', '-')):
+            continue
+        match = _REQUIREMENT_RE.match(line)
+        if match:
+            name = re.sub(r'[-_.]+', '-', match.group(1)).lower()
+            dependencies[name] = match.group(2).strip()
+    return dependencies
+
+
+def _pipfile(text: str) -> Dependencies:
+    data = tomllib.loads(text)
+    dependencies = {}
+    for section in ('packages', 'dev-packages'):
+        for name, spec in (data.get(section) or {}).items():
+            dependencies[name.lower()] = spec if isinstance(spec, str) else json.dumps(spec, sort_keys=True)
+    return dependencies
+
+
+def _toml_lock(text: str) -> Dependencies:
+    """poetry.lock / Cargo.lock: [[package]] tables with name and version."""
+    return {package['name']: package.get('version', '')
+            for package in tomllib.loads(text).get('package', [])}
+
+
+def _cargo_toml(text: str) -> Dependencies:
+    data = tomllib.loads(text)
+    dependencies = {}
+    for section in ('dependencies', 'dev-dependencies', 'build-dependencies'):
+        for name, spec in (data.get(section) or {}).items():
+            if isinstance(spec, dict):
+                spec = spec.get('version') or json.dumps(spec, sort_keys=True)
+            dependencies[name] = spec
+    return dependencies
+
+
+def _pom_xml(text: str) -> Dependencies:
+    root = ET.fromstring(text)
+    namespace = root.tag[:root.tag.index('}') + 1] if root.tag.startswith('{') else ''
+    dependencies = {}
+    for dependency in root.iter(f'{namespace}dependency'):
+        group_id = dependency.findtext(f'{namespace}groupId', '')
+        artifact_id = dependency.findtext(f'{namespace}artifactId', '')
+        dependencies[f'{group_id}:{artifact_id}'] = dependency.findtext(f'{namespace}version', '')
+    return dependencies
+
+
+def _build_gradle(text: str) -> Dependencies:
+    return {f'{group}:{artifact}': version for group, artifact, version in _GRADLE_RE.findall(text)}
+
+
+def _gemfile(text: str) -> Dependencies:
+    return {name: version or '' for name, version in _GEM_RE.findall(text)}
+
+
+def _gemfile_lock(text: str) -> Dependencies:
+    return dict(_GEMFILE_LOCK_SPEC_RE.findall(text))
+
+
+def _composer_json(text: str) -> Dependencies:
+    data = json.loads(text)
+    dependencies = {}
+    for section in ('require', 'require-dev'):
+        dependencies.update(data.get(section) or {})
+    return dependencies
+
+
+def _composer_lock(text: str) -> Dependencies:
+    data = json.loads(text)
+    return {package['name']: package.get('version', '')
+            for section in ('packages', 'packages-dev')
+            for package in data.get(section) or []}
+
+
+MANIFEST_PARSERS: Dict[str, Callable[[str], Dependencies]] = {
+    'package.json': _package_json,
+    'package-lock.json': _package_lock,
+    'yarn.lock': _yarn_lock,
+    'go.mod': _go_mod,
+    'go.sum': _go_sum,
+    'requirements.txt': _requirements_txt,
+    'Pipfile': _pipfile,
+    'poetry.lock': _toml_lock,
+    'pom.xml': _pom_xml,
+    'build.gradle': _build_gradle,
+    'Cargo.toml': _cargo_toml,
+    'Cargo.lock': _toml_lock,
+    'Gemfile': _gemfile,
+    'Gemfile.lock': _gemfile_lock,
+    'composer.json': _composer_json,
+    'composer.lock': _composer_lock
+}
+
+# (file name, blob sha) -> parsed dependencies, None when the blob couldn't be parsed
+_parsed_manifests: 'OrderedDict[Tuple[str, str], Optional[Dependencies]]' = OrderedDict()
+
+
+def parse_manifest(file_name: str, data: Union[bytes, memoryview]) -> Optional[Dependencies]:
+    """Dependencies declared by manifest `file_name` with contents `data`, None if it can't be parsed."""
+    parser = MANIFEST_PARSERS.get(file_name)
+    if parser is None:
+        return None
+    try:
+        return parser(str(data, 'utf-8', errors='replace'))
+    except (ValueError, KeyError, TypeError, AttributeError, ET.ParseError):
+        # json/toml decode errors are ValueErrors; the rest is unexpected structure
+        return None
+
+
+def get_manifest_dependencies(file_name: str, blob_sha: str,
+                              read_blob: Callable[[], Optional[memoryview]]) -> Optional[Dependencies]:
+    """
+    parse_manifest() for the blob `blob_sha`, cached by SHA.
+    `read_blob` is only called when the blob hasn't been parsed yet; if it
+    returns None (blob unreadable) nothing is cached.
+    """
+    key = (file_name, blob_sha)
+    if key in _parsed_manifests:
+        _parsed_manifests.move_to_end(key)
+        return _parsed_manifests[key]
+
+    data = read_blob()
+    if data is None:
+        return None
+    dependencies = parse_manifest(file_name, data)
+    _parsed_manifests[key] = dependencies
+    if len(_parsed_manifests) > MANIFEST_CACHE_SIZE:
+        _parsed_manifests.popitem(last=False)
+    return dependencies
+
+
+def compare_dependencies(before: Dependencies, after: Dependencies) -> Tuple[bool, bool]:
+    """(has_new_dependencies, has_version_updates) going from `before` to `after`."""
+    has_new = any(name not in before for name in after)
+    has_updates = any(name in before and before[name] != version for name, version in after.items())
+    return has_new, has_updates
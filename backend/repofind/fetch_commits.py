@@ -7,20 +7,43 @@ Python script to:
 4. Calculate scores and save to database
 """
 
+import argparse
+import hashlib
 import json
+import multiprocessing
 import os
-import sys
-import re
-from datetime import datetime
+import signal
+import shutil
+import threading
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from itertools import islice
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 import subprocess
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
-import mysql.connector
 from mysql.connector import Error
 from git import Repo, GitCommandError
 from dotenv import load_dotenv
 
+from analysis_cache import AnalysisCache, open_analysis_cache
+from bulk_load import (
+    BULK_LOAD_BATCH_SIZE, BULK_LOAD_DIR, BULK_LOAD_MIN_COMMITS, BulkLoadError, TsvFile,
+    create_staging_table, drop_staging_table, load_tsv
+)
+from db_pool import get_pooled_connection, is_connection_error, run_in_transaction
+from dependency_manifests import MANIFEST_PARSERS, compare_dependencies, get_manifest_dependencies
+from fetch_metrics import StageTimer, run_profiled, write_metrics
+from git_objects import close_cat_file, get_cat_file
+from json_stream import iter_json_records
+from message_rules import BEHAVIOR_PRESERVING_REFACTOR, MESSAGE_CLASSIFIER
+from path_classifier import DEPENDENCY_FILE_NAMES, PathClassifier, get_path_classifier
+
 # Load environment variables
 load_dotenv()
 
@@ -32,99 +55,199 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASSWORD', 'University12345*'),
     'database': os.getenv('DB_NAME', 'habitate_db'),
     'charset': 'utf8mb4',
-    'collation': 'utf8mb4_unicode_ci'
+    'collation': 'utf8mb4_unicode_ci',
+    # LOAD DATA LOCAL INFILE for initial loads, restricted to bulk_load's TSV files
+    'allow_local_infile_in_path': str(BULK_LOAD_DIR)
 }
 
 REPOS_DIR = Path(__file__).parent / 'repos'
 DEFAULT_CUTOFF_DATE = '2015-01-01'
 DEFAULT_BRANCH = 'main'
+# Commits buffered per multi-row INSERT batch / transaction
+DEFAULT_BATCH_SIZE = int(os.getenv('FETCH_BATCH_SIZE', 500))
+# Upper bound on rows per multi-row statement (keeps packets small)
+ROWS_PER_STATEMENT = 1000
+# Commits handed to each analysis worker at a time (--analysis-workers)
+ANALYSIS_CHUNK_SIZE = int(os.getenv('ANALYSIS_CHUNK_SIZE', 500))
+# Clone/fetch settings; GIT_CLONE_URL_TEMPLATE (e.g. file:///srv/mirrors/{org}/{repo}.git)
+# replaces GitHub as the remote, which is handy for local testing
+CLONE_URL_TEMPLATE = os.getenv('GIT_CLONE_URL_TEMPLATE')
+GIT_NETWORK_TIMEOUT = int(os.getenv('GIT_NETWORK_TIMEOUT', 1800))
+GIT_NETWORK_RETRIES = int(os.getenv('GIT_NETWORK_RETRIES', 2))
+DEFAULT_PREFETCH_DEPTH = 2
+# How new clones are made: full history with blobs, blobless partial clone,
+# shallow clone back to the repo's cutoff date, or a bare mirror
+CLONE_STRATEGIES = ('full', 'blobless', 'shallow', 'mirror')
+DEFAULT_CLONE_STRATEGY = os.getenv('GIT_CLONE_STRATEGY', 'full')
+
+# Path fragments that mark core/domain code (difficulty score, complexity indicators)
+CORE_PATH_PATTERNS = ('core/', 'domain/', 'engine/', 'kernel/', 'src/')
+# Lowercased path fragments that mark a test file as an integration test
+INTEGRATION_TEST_MARKERS = ('integration', 'e2e', 'end-to-end', 'integration_test')
+
+# Bump when the scoring/analysis code changes, so rows written by older code
+# stop matching their fingerprint and get rewritten on the next fetch
+SCORING_RULES_VERSION = 1
+RULES_VERSION = hashlib.sha256(
+    f'{SCORING_RULES_VERSION}:{MESSAGE_CLASSIFIER.version}'.encode('utf-8')
+).hexdigest()[:12]
 
 # Ensure repos directory exists
 REPOS_DIR.mkdir(parents=True, exist_ok=True)
 
 
 def get_db_connection():
-    """Get MySQL database connection."""
-    try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        return conn
-    except Error as e:
-        print(f"Error connecting to MySQL: {e}")
-        sys.exit(1)
-
-
-def save_repos_from_json(json_file: str):
     """
-    Step 1: Save repos from JSON file to git_repos table.
+    Get a MySQL connection from this process's pool (see db_pool).
+    close() hands it back to the pool.
     """
-    print(f"Reading repos from {json_file}...")
+    return get_pooled_connection(DB_CONFIG)
+
+
+REPO_INSERT_SQL = """
+    INSERT INTO git_repos
+    (repo_name, full_name, habitat_repo_id, default_branch, cutoff_date, is_active)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+# Keyed on the primary key; rows carry the id of the repo they update
+REPO_UPDATE_SQL = """
+    INSERT INTO git_repos
+    (id, repo_name, full_name, habitat_repo_id, cutoff_date, is_active)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        repo_name = VALUES(repo_name),
+        full_name = VALUES(full_name),
+        habitat_repo_id = VALUES(habitat_repo_id),
+        cutoff_date = VALUES(cutoff_date),
+        is_active = VALUES(is_active),
+        updated_at = NOW()
+"""
+
+
+def parse_repo_entry(repo_data: Dict) -> Tuple[Optional[str], str, str, date, bool]:
+    """(habitat_repo_id, repo_name, full_name, cutoff_date, is_active) for one repos.json entry."""
+    habitat_repo_id = repo_data.get('id')
+    repo_org = repo_data.get('repo_org', '')
+    repo_name = repo_data.get('repo_name', '')
+    full_name = f"{repo_org}/{repo_name}" if repo_org else repo_name
+    
+    # Parse cutoff date
+    cutoff_date_str = repo_data.get('commit_cutoff_date')
+    if cutoff_date_str:
+        # Parse ISO format: "2020-12-01T00:00:00Z"
+        cutoff_date = datetime.fromisoformat(cutoff_date_str.replace('Z', '+00:00')).date()
+    else:
+        # Use default cutoff date
+        cutoff_date = datetime.strptime(DEFAULT_CUTOFF_DATE, '%Y-%m-%d').date()
     
-    with open(json_file, 'r', encoding='utf-8') as f:
-        repos_data = json.load(f)
+    is_active = repo_data.get('is_active', False)
+    # Override: set all to active as requested
+    is_active = True
     
-    conn = get_db_connection()
+    return habitat_repo_id, repo_name, full_name, cutoff_date, is_active
+
+
+def upsert_repos(conn, repo_entries: Iterable[Dict]) -> Tuple[int, int, int]:
+    """
+    Import repos.json entries into git_repos as one transaction.
+    Existing repos are loaded in one query and matched by habitat_repo_id, then
+    by full_name; only new and changed repos are written, with multi-row
+    statements. Returns (new, updated, unchanged) counts.
+    """
     cursor = conn.cursor()
-    
-    saved_count = 0
-    updated_count = 0
-    
-    for repo_data in repos_data:
-        habitat_repo_id = repo_data.get('id')
-        repo_org = repo_data.get('repo_org', '')
-        repo_name = repo_data.get('repo_name', '')
-        full_name = f"{repo_org}/{repo_name}" if repo_org else repo_name
+    try:
+        cursor.execute("""
+            SELECT id, repo_name, full_name, habitat_repo_id, cutoff_date, is_active
+            FROM git_repos
+        """)
+        existing_repos = cursor.fetchall()
+        by_habitat_id = {repo[3]: repo for repo in existing_repos if repo[3]}
+        by_full_name = {repo[2]: repo for repo in existing_repos}
         
-        # Parse cutoff date
-        cutoff_date_str = repo_data.get('commit_cutoff_date')
-        if cutoff_date_str:
-            # Parse ISO format: "2020-12-01T00:00:00Z"
-            cutoff_date = datetime.fromisoformat(cutoff_date_str.replace('Z', '+00:00')).date()
-        else:
-            # Use default cutoff date
-            cutoff_date = datetime.strptime(DEFAULT_CUTOFF_DATE, '%Y-%m-%d').date()
+        new_rows = []
+        update_rows = []
+        new_count = updated_count = unchanged_count = 0
+        seen = set()
         
-        is_active = repo_data.get('is_active', False)
-        # Override: set all to active as requested
-        is_active = True
+        def write_pending():
+            if new_rows:
+                cursor.executemany(REPO_INSERT_SQL, new_rows)
+                new_rows.clear()
+            if update_rows:
+                cursor.executemany(REPO_UPDATE_SQL, update_rows)
+                update_rows.clear()
         
-        try:
-            # Check if repo exists
-            cursor.execute(
-                "SELECT id FROM git_repos WHERE repo_name = %s",
-                (repo_name,)
-            )
-            existing = cursor.fetchone()
+        for repo_data in repo_entries:
+            if not isinstance(repo_data, dict):
+                print(f"  Skipped entry that is not an object: {str(repo_data)[:80]}")
+                continue
+            habitat_repo_id, repo_name, full_name, cutoff_date, is_active = parse_repo_entry(repo_data)
+            if not repo_name:
+                print(f"  Skipped entry without repo_name (id {habitat_repo_id})")
+                continue
+            key = habitat_repo_id or full_name
+            if key in seen or full_name in seen:
+                print(f"  Skipped duplicate entry: {full_name}")
+                continue
+            seen.update((key, full_name))
             
-            if existing:
-                # Update existing repo
-                cursor.execute("""
-                    UPDATE git_repos 
-                    SET full_name = %s, habitat_repo_id = %s, cutoff_date = %s, 
-                        is_active = %s, updated_at = NOW()
-                    WHERE id = %s
-                """, (full_name, habitat_repo_id, cutoff_date, is_active, existing[0]))
+            existing = by_habitat_id.get(habitat_repo_id) or by_full_name.get(full_name)
+            if existing is None:
+                new_rows.append((repo_name, full_name, habitat_repo_id, DEFAULT_BRANCH, cutoff_date, is_active))
+                new_count += 1
+                print(f"  Saved: {full_name}")
+            else:
+                owner = by_full_name.get(full_name)
+                if owner is not None and owner[0] != existing[0]:
+                    print(f"  Skipped: {full_name} belongs to repo {owner[0]}, not {existing[2]}")
+                    continue
+                row = (existing[0], repo_name, full_name, habitat_repo_id, cutoff_date, is_active)
+                if row[1:] == (existing[1], existing[2], existing[3], existing[4], bool(existing[5])):
+                    unchanged_count += 1
+                    continue
+                update_rows.append(row)
                 updated_count += 1
                 print(f"  Updated: {full_name}")
-            else:
-                # Insert new repo
-                cursor.execute("""
-                    INSERT INTO git_repos 
-                    (repo_name, full_name, habitat_repo_id, default_branch, cutoff_date, is_active)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                """, (repo_name, full_name, habitat_repo_id, DEFAULT_BRANCH, cutoff_date, is_active))
-                saved_count += 1
-                print(f"  Saved: {full_name}")
+            
+            if len(new_rows) + len(update_rows) >= ROWS_PER_STATEMENT:
+                write_pending()
         
-        except Error as e:
-            print(f"  Error processing {full_name}: {e}")
-            continue
+        write_pending()
+        conn.commit()
+        return new_count, updated_count, unchanged_count
+    finally:
+        cursor.close()
+
+
+def save_repos_from_json(json_file: str):
+    """
+    Step 1: Save repos from JSON file to git_repos table.
+    The file (a JSON array or JSON Lines) is streamed entry by entry, so its
+    size doesn't matter.
+    """
+    print(f"Reading repos from {json_file}...")
     
-    conn.commit()
-    cursor.close()
-    conn.close()
+    conn = get_db_connection()
+    try:
+        # A retried transaction reads the file again from the start
+        new_count, updated_count, unchanged_count = run_in_transaction(
+            conn, lambda: upsert_repos(conn, iter_json_records(json_file))
+        )
+    except json.JSONDecodeError as e:
+        conn.rollback()
+        print(f"  ❌ Invalid JSON in {json_file}: {e}")
+        return 0
+    except Error as e:
+        if not is_connection_error(e):
+            conn.rollback()
+        print(f"  ❌ Error saving repos: {e}")
+        return 0
+    finally:
+        conn.close()
     
-    print(f"\n✅ Repos saved: {saved_count} new, {updated_count} updated")
-    return saved_count + updated_count
+    print(f"\n✅ Repos saved: {new_count} new, {updated_count} updated, {unchanged_count} unchanged")
+    return new_count + updated_count
 
 
 def is_test_file(file_path: str) -> bool:
@@ -154,28 +277,90 @@ def is_test_file(file_path: str) -> bool:
 
 def is_dependency_file(file_path: str) -> bool:
     """Detect if a file is a dependency file."""
-    dependency_files = [
-        'package.json', 'package-lock.json', 'yarn.lock',
-        'go.mod', 'go.sum',
-        'requirements.txt', 'Pipfile', 'poetry.lock',
-        'pom.xml', 'build.gradle',
-        'Cargo.toml', 'Cargo.lock',
-        'Gemfile', 'Gemfile.lock',
-        'composer.json', 'composer.lock'
-    ]
-    
     file_name = os.path.basename(file_path)
-    return (file_name in dependency_files or 
+    return (file_name in DEPENDENCY_FILE_NAMES or 
             'node_modules/' in file_path or 
             'vendor/' in file_path)
 
 
-def analyze_dependencies(file_stats: List[Dict], repo_path: Path, commit_hash: str) -> Dict:
+class FileStat(NamedTuple):
+    """
+    Statistics for one changed file. The test/dependency flags are computed
+    once in build_file_stat(); name, directory and extension are derived from
+    the path only when needed (when the row is written).
+    """
+    file_path: str
+    additions: int
+    deletions: int
+    is_test_file: bool
+    is_dependency_file: bool
+    
+    @property
+    def file_name(self) -> str:
+        return os.path.basename(self.file_path)
+    
+    @property
+    def file_directory(self) -> Optional[str]:
+        return os.path.dirname(self.file_path) or None
+    
+    @property
+    def file_extension(self) -> Optional[str]:
+        file_name = self.file_name
+        return os.path.splitext(file_name)[1][1:] if '.' in file_name else None
+
+
+def get_manifest_change(repo_path: Path, commit_hash: str, parent_hash: Optional[str],
+                        file_path: str) -> Optional[Tuple[bool, bool]]:
+    """
+    (has_new_dependencies, has_version_updates) from parsing the manifest at
+    `file_path` in the parent and in the commit. None when that isn't possible
+    (unknown format, unparseable content, parent missing from a shallow clone).
+    """
+    file_name = os.path.basename(file_path)
+    if file_name not in MANIFEST_PARSERS:
+        return None
+    
+    cat_file = get_cat_file(repo_path)
+    
+    def read_blob(sha: str) -> Optional[memoryview]:
+        blob = cat_file.read(sha)
+        return blob.data if blob else None
+    
+    try:
+        # Blob SHAs first (one pipelined --batch-check round trip); contents
+        # are only read for blobs that haven't been parsed before
+        if parent_hash:
+            after, before, parent = cat_file.info_many([
+                f'{commit_hash}:{file_path}', f'{parent_hash}:{file_path}', parent_hash
+            ])
+            if parent is None:
+                return None
+        else:
+            after, before = cat_file.info(f'{commit_hash}:{file_path}'), None
+        
+        dependencies = []
+        for blob in (before, after):
+            if blob is None:
+                # File added or removed by this commit
+                dependencies.append({})
+                continue
+            parsed = get_manifest_dependencies(file_name, blob.sha, lambda: read_blob(blob.sha))
+            if parsed is None:
+                return None
+            dependencies.append(parsed)
+    except (OSError, ValueError, GitCommandError):
+        return None
+    return compare_dependencies(*dependencies)
+
+
+def analyze_dependencies(file_stats: List[FileStat], repo_path: Path, commit_hash: str,
+                         parent_hash: Optional[str] = None) -> Dict:
     """
     Analyze dependency changes in detail.
     Returns dict with dependency_files, dependency_type, has_new_dependencies, has_version_updates.
+    Manifests are compared against `parent_hash` (None for root commits).
     """
-    dependency_files = [f for f in file_stats if f.get('is_dependency_file', False)]
+    dependency_files = [f for f in file_stats if f.is_dependency_file]
     
     if not dependency_files:
         return {
@@ -185,7 +370,7 @@ def analyze_dependencies(file_stats: List[Dict], repo_path: Path, commit_hash: s
             'has_version_updates': False
         }
     
-    dependency_file_paths = [f.get('file_path') for f in dependency_files]
+    dependency_file_paths = [f.file_path for f in dependency_files]
     
     # Determine dependency type
     dependency_type = None
@@ -209,7 +394,7 @@ def analyze_dependencies(file_stats: List[Dict], repo_path: Path, commit_hash: s
     }
     
     for dep_file in dependency_files:
-        file_name = os.path.basename(dep_file.get('file_path', ''))
+        file_name = dep_file.file_name
         if file_name in type_mapping:
             dependency_type = type_mapping[file_name]
             break
@@ -217,15 +402,20 @@ def analyze_dependencies(file_stats: List[Dict], repo_path: Path, commit_hash: s
     if not dependency_type:
         dependency_type = 'other'
     
-    # Check for new dependencies and version updates
-    # This requires reading file content, which is more complex
-    # For now, we'll use heuristics based on additions
+    # Check for new dependencies and version updates by comparing the parsed
+    # manifests; fall back to heuristics based on additions when they can't be
     has_new_dependencies = False
     has_version_updates = False
     
     for dep_file in dependency_files:
-        additions = dep_file.get('additions', 0)
-        deletions = dep_file.get('deletions', 0)
+        change = get_manifest_change(repo_path, commit_hash, parent_hash, dep_file.file_path)
+        if change is not None:
+            has_new_dependencies = has_new_dependencies or change[0]
+            has_version_updates = has_version_updates or change[1]
+            continue
+        
+        additions = dep_file.additions
+        deletions = dep_file.deletions
         
         # If significant additions without deletions, likely new dependencies
         if additions > 10 and deletions < additions * 0.3:
@@ -243,13 +433,13 @@ def analyze_dependencies(file_stats: List[Dict], repo_path: Path, commit_hash: s
     }
 
 
-def analyze_tests(file_stats: List[Dict]) -> Dict:
+def analyze_tests(file_stats: List[FileStat]) -> Dict:
     """
     Analyze test files in detail.
     Returns dict with test analysis data.
     """
-    test_files = [f for f in file_stats if f.get('is_test_file', False)]
-    non_test_files = [f for f in file_stats if not f.get('is_test_file', False)]
+    test_files = [f for f in file_stats if f.is_test_file]
+    non_test_files = [f for f in file_stats if not f.is_test_file]
     
     # Count test files by change type
     test_files_added = 0
@@ -257,8 +447,8 @@ def analyze_tests(file_stats: List[Dict]) -> Dict:
     test_files_removed = 0
     
     for test_file in test_files:
-        additions = test_file.get('additions', 0)
-        deletions = test_file.get('deletions', 0)
+        additions = test_file.additions
+        deletions = test_file.deletions
         
         if additions > 0 and deletions == 0:
             test_files_added += 1
@@ -268,17 +458,14 @@ def analyze_tests(file_stats: List[Dict]) -> Dict:
             test_files_removed += 1
     
     # Calculate test coverage estimate
-    test_additions = sum(f.get('additions', 0) for f in test_files)
-    total_additions = sum(f.get('additions', 0) for f in file_stats)
+    test_additions = sum(f.additions for f in test_files)
+    total_additions = sum(f.additions for f in file_stats)
     test_coverage_estimate = test_additions / total_additions if total_additions > 0 else 0.0
     test_coverage_estimate = min(1.0, test_coverage_estimate)
     
     # Check for integration tests and unit tests
     has_integration_tests = any(
-        'integration' in f.get('file_path', '').lower() or
-        'e2e' in f.get('file_path', '').lower() or
-        'end-to-end' in f.get('file_path', '').lower() or
-        'integration_test' in f.get('file_path', '').lower()
+        any(marker in f.file_path.lower() for marker in INTEGRATION_TEST_MARKERS)
         for f in test_files
     )
     
@@ -317,106 +504,154 @@ def analyze_tests(file_stats: List[Dict]) -> Dict:
 def detect_behavior_preserving_refactor(commit_message: str) -> bool:
     """
     Detect if commit is a behavior-preserving refactor or performance optimization.
+    The rules live in message_rules.json (see message_rules.py).
     """
-    if not commit_message:
-        return False
-    
-    # Extract title (first line) and body (rest)
-    lines = commit_message.split('\n', 1)
-    title = lines[0].strip()
-    body = lines[1] if len(lines) > 1 else ""
-    
-    # Check if title matches performance/refactor patterns
-    title_pattern = re.compile(r'perf|performance|refactor|optimiz', re.IGNORECASE)
-    if not title_pattern.search(title):
-        return False
-    
-    # Check if body matches behavior-preserving patterns
-    body_pattern = re.compile(
-        r'preserve|same output|behavior|no functional|internal only|no behavior change',
-        re.IGNORECASE
-    )
-    
-    if body_pattern.search(body):
-        return True
-    
-    # Additional check: if title explicitly says "refactor" or "optimize"
-    if re.search(r'refactor|optimize|optimise', title, re.IGNORECASE):
-        behavior_change_pattern = re.compile(
-            r'add|new feature|change behavior|modify behavior|fix behavior',
-            re.IGNORECASE
-        )
-        if not behavior_change_pattern.search(body):
-            return True
-    
-    return False
+    return BEHAVIOR_PRESERVING_REFACTOR in MESSAGE_CLASSIFIER.classify(commit_message)
+
+
+def build_file_stat(file_path: str, additions: int, deletions: int,
+                    classifier: Optional[PathClassifier] = None) -> FileStat:
+    """
+    Build the per-file statistics record used by the analyzers and scorers.
+    Paths are classified by `classifier` (the repo's rules), default rules otherwise.
+    """
+    is_test, is_dependency = (classifier or get_path_classifier()).classify(file_path)
+    return FileStat(file_path, additions, deletions, is_test, is_dependency)
+
 
+# Header emitted by `git log` for every commit: record separator, then
+# unit-separated fields. The raw message goes last so that it may contain
+# anything except NUL (which git never stores in messages).
+LOG_RECORD_SEP = '\x1e'
+LOG_FIELD_SEP = '\x1f'
+LOG_FORMAT = '%x1e%H%x1f%P%x1f%an%x1f%ae%x1f%cI%x1f%B%x1f'
+LOG_READ_SIZE = 1 << 16
 
-def get_file_statistics(repo_path: Path, commit_hash: str) -> List[Dict]:
+
+def iter_commit_records(repo_path: Path, rev: Optional[str] = None,
+                        since: Optional[datetime] = None,
+                        shas: Optional[List[str]] = None,
+                        classifier: Optional[PathClassifier] = None) -> Iterator[Tuple[Dict, List[FileStat]]]:
     """
-    Get per-file additions/deletions using git show --numstat.
-    Returns list of file statistics.
+    Stream (commit metadata, file_stats) records for `rev` from a single
+    `git log --numstat -z` process, newest commit first. When `shas` is
+    given, exactly those commits are read instead, in the order given.
+    File paths are classified with `classifier` (see build_file_stat).
+
+    Replaces one `git show --numstat` per commit. Merge commits are diffed
+    against their first parent, which is what `git show --numstat` reports.
+    Output is parsed incrementally, so memory stays flat regardless of the
+    size of the history.
     """
+    if shas is not None and not shas:
+        # git would fall back to HEAD without any revisions on stdin
+        return
+    cmd = ['git', 'log', '-z', '--numstat', '--diff-merges=first-parent',
+           f'--format={LOG_FORMAT}']
+    if since:
+        cmd.append(f'--since={since.isoformat()}')
+    if shas is not None:
+        cmd += ['--no-walk=unsorted', '--stdin']
+    else:
+        cmd.append(rev)
+    cmd.append('--')
+    
+    # stderr goes to a temp file so a chatty git can never block on a full pipe
+    stderr_file = tempfile.TemporaryFile()
+    proc = subprocess.Popen(cmd, cwd=repo_path, stdin=subprocess.PIPE if shas is not None else None,
+                            stdout=subprocess.PIPE, stderr=stderr_file)
     try:
-        result = subprocess.run(
-            ['git', 'show', '--numstat', '--format=', commit_hash],
-            cwd=repo_path,
-            capture_output=True,
-            text=True,
-            check=True
-        )
+        if shas is not None:
+            # git reads all of stdin before it starts writing, so this can't deadlock
+            proc.stdin.write(''.join(f'{sha}\n' for sha in shas).encode())
+            proc.stdin.close()
         
+        commit = None
         file_stats = []
-        for line in result.stdout.strip().split('\n'):
-            if not line:
-                continue
+        pending = None      # numstat entry waiting for its rename paths
+        rename_paths = []
+        buffer = b''
+        
+        for chunk in iter(lambda: proc.stdout.read(LOG_READ_SIZE), b''):
+            buffer += chunk
+            tokens = buffer.split(b'\0')
+            buffer = tokens.pop()
             
-            parts = line.split('\t')
-            if len(parts) >= 3:
-                additions = int(parts[0]) if parts[0] != '-' else 0
-                deletions = int(parts[1]) if parts[1] != '-' else 0
-                file_path = '\t'.join(parts[2:])  # Handle filenames with tabs
+            for raw in tokens:
+                token = raw.decode('utf-8', errors='replace')
+                
+                if pending is not None:
+                    # Rename/copy: `adds\tdels\t\0old\0new\0`, keep the new path
+                    rename_paths.append(token)
+                    if len(rename_paths) == 2:
+                        file_stats.append(build_file_stat(rename_paths[1], *pending, classifier))
+                        pending = None
+                        rename_paths = []
+                    continue
+                
+                token = token.lstrip('\n')
+                if not token:
+                    continue
                 
-                file_name = os.path.basename(file_path)
-                file_directory = os.path.dirname(file_path) if os.path.dirname(file_path) else None
-                file_extension = os.path.splitext(file_name)[1][1:] if '.' in file_name else None
+                if token.startswith(LOG_RECORD_SEP):
+                    if commit is not None:
+                        yield commit, file_stats
+                    
+                    sha, parents, name, email, date, message = token[1:].split(LOG_FIELD_SEP, 5)
+                    commit = {
+                        'hexsha': sha,
+                        'parents': parents.split() if parents else [],
+                        'author': f"{name} <{email}>",
+                        'committed_datetime': datetime.fromisoformat(date),
+                        'message': message[:-1] if message.endswith(LOG_FIELD_SEP) else message
+                    }
+                    file_stats = []
+                    continue
                 
-                file_stats.append({
-                    'file_path': file_path,
-                    'file_name': file_name,
-                    'file_directory': file_directory,
-                    'additions': additions,
-                    'deletions': deletions,
-                    'is_test_file': is_test_file(file_path),
-                    'is_dependency_file': is_dependency_file(file_path),
-                    'file_extension': file_extension
-                })
+                parts = token.split('\t', 2)
+                if len(parts) < 3:
+                    continue
+                additions = int(parts[0]) if parts[0] != '-' else 0
+                deletions = int(parts[1]) if parts[1] != '-' else 0
+                if parts[2]:
+                    file_stats.append(build_file_stat(parts[2], additions, deletions, classifier))
+                else:
+                    pending = (additions, deletions)
         
-        return file_stats
-    
-    except subprocess.CalledProcessError as e:
-        print(f"    Error getting file stats for {commit_hash}: {e}")
-        return []
+        if commit is not None:
+            yield commit, file_stats
+        
+        proc.wait()
+        if proc.returncode != 0:
+            stderr_file.seek(0)
+            stderr = stderr_file.read().decode('utf-8', errors='replace').strip()
+            raise GitCommandError(cmd, proc.returncode, stderr)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+        stderr_file.close()
 
 
-def calculate_habitate_score(file_stats: List[Dict], is_behavior_refactor: bool) -> int:
+def calculate_habitate_score(file_stats: List[FileStat], is_behavior_refactor: bool) -> int:
     """Calculate habitate_score based on file statistics."""
-    non_test_files = [f for f in file_stats if not f.get('is_test_file', False)]
-    non_test_additions = sum(f.get('additions', 0) for f in non_test_files)
-    non_test_deletions = sum(f.get('deletions', 0) for f in non_test_files)
+    non_test_files = [f for f in file_stats if not f.is_test_file]
+    non_test_additions = sum(f.additions for f in non_test_files)
+    non_test_deletions = sum(f.deletions for f in non_test_files)
     non_test_count = len(non_test_files)
     
     score = 0
     
     # Pattern 1: Single file with 200+ additions (non-test)
-    if non_test_count == 1 and non_test_files[0].get('additions', 0) >= 200:
+    if non_test_count == 1 and non_test_files[0].additions >= 200:
         score += 30
-        if non_test_files[0].get('additions', 0) >= 500:
+        if non_test_files[0].additions >= 500:
             score += 15
     
     # Pattern 2: 3-6 files with 300-500+ additions each (non-test)
     if 3 <= non_test_count <= 6:
-        all_high = all(f.get('additions', 0) >= 300 for f in non_test_files)
+        all_high = all(f.additions >= 300 for f in non_test_files)
         avg_additions = non_test_additions / non_test_count if non_test_count > 0 else 0
         
         if all_high and avg_additions >= 400:
@@ -434,7 +669,7 @@ def calculate_habitate_score(file_stats: List[Dict], is_behavior_refactor: bool)
         score += 20
     
     # Test files present
-    if any(f.get('is_test_file', False) for f in file_stats):
+    if any(f.is_test_file for f in file_stats):
         score += 18
     
     # File count bonuses
@@ -465,8 +700,8 @@ def calculate_habitate_score(file_stats: List[Dict], is_behavior_refactor: bool)
         score -= 10
     
     # Test percentage penalty
-    total_additions = sum(f.get('additions', 0) for f in file_stats)
-    test_additions = sum(f.get('additions', 0) for f in file_stats if f.get('is_test_file', False))
+    total_additions = sum(f.additions for f in file_stats)
+    test_additions = sum(f.additions for f in file_stats if f.is_test_file)
     test_percentage = test_additions / total_additions if total_additions > 0 else 0
     if test_percentage > 0.4:
         score -= int(30 * test_percentage)
@@ -478,11 +713,11 @@ def calculate_habitate_score(file_stats: List[Dict], is_behavior_refactor: bool)
     return max(0, min(150, score))
 
 
-def calculate_difficulty_score(file_stats: List[Dict], is_behavior_refactor: bool) -> float:
+def calculate_difficulty_score(file_stats: List[FileStat], is_behavior_refactor: bool) -> float:
     """Calculate difficulty_score using file-level statistics."""
     score = 0.0
     
-    non_test_files = [f for f in file_stats if not f.get('is_test_file', False)]
+    non_test_files = [f for f in file_stats if not f.is_test_file]
     non_test_count = len(non_test_files)
     
     # Codebase Understanding (0-30 points)
@@ -496,7 +731,7 @@ def calculate_difficulty_score(file_stats: List[Dict], is_behavior_refactor: boo
     # Cross-directory changes
     directories = set()
     for f in non_test_files:
-        dir_path = f.get('file_directory', '')
+        dir_path = f.file_directory
         if dir_path:
             top_dir = dir_path.split('/')[0]
             directories.add(top_dir)
@@ -507,41 +742,40 @@ def calculate_difficulty_score(file_stats: List[Dict], is_behavior_refactor: boo
         score += 5
     
     # Algorithmic Complexity (0-25 points)
-    if non_test_count == 1 and non_test_files[0].get('additions', 0) >= 200:
+    if non_test_count == 1 and non_test_files[0].additions >= 200:
         score += 15
-        if non_test_files[0].get('additions', 0) >= 500:
+        if non_test_files[0].additions >= 500:
             score += 10
     
     if 3 <= non_test_count <= 6:
-        all_high = all(f.get('additions', 0) >= 300 for f in non_test_files)
-        avg_additions = sum(f.get('additions', 0) for f in non_test_files) / non_test_count if non_test_count > 0 else 0
+        all_high = all(f.additions >= 300 for f in non_test_files)
+        avg_additions = sum(f.additions for f in non_test_files) / non_test_count if non_test_count > 0 else 0
         
         if all_high and avg_additions >= 400:
             score += 20
         elif avg_additions >= 300:
             score += 15
     
-    total_non_test = sum(f.get('additions', 0) for f in non_test_files)
+    total_non_test = sum(f.additions for f in non_test_files)
     if total_non_test >= 1000:
         score += 5
     
     # Test Coverage Quality (0-20 points)
-    test_files = [f for f in file_stats if f.get('is_test_file', False)]
+    test_files = [f for f in file_stats if f.is_test_file]
     if len(test_files) > 0:
         score += 10
     
     # Domain-Specific Knowledge (0-15 points)
-    core_patterns = ['core/', 'domain/', 'engine/', 'kernel/', 'src/']
     has_core_changes = any(
-        any(pattern in f.get('file_path', '') for pattern in core_patterns)
+        any(pattern in f.file_path for pattern in CORE_PATH_PATTERNS)
         for f in non_test_files
     )
     if has_core_changes:
         score += 10
     
     # Refactoring Complexity (0-10 points)
-    total_additions = sum(f.get('additions', 0) for f in non_test_files)
-    total_deletions = sum(f.get('deletions', 0) for f in non_test_files)
+    total_additions = sum(f.additions for f in non_test_files)
+    total_deletions = sum(f.deletions for f in non_test_files)
     if total_additions > 0:
         refactor_ratio = total_deletions / total_additions
         if 0.3 <= refactor_ratio <= 0.7:
@@ -554,14 +788,14 @@ def calculate_difficulty_score(file_stats: List[Dict], is_behavior_refactor: boo
     return min(100.0, max(0.0, score))
 
 
-def calculate_suitability_score(commit_data: Dict, file_stats: List[Dict], 
+def calculate_suitability_score(commit_data: Dict, file_stats: List[FileStat], 
                                 habitate_score: int, difficulty_score: float,
                                 is_behavior_refactor: bool) -> float:
     """Calculate overall suitability score (0-100)."""
     score = 50.0
     
     # Critical disqualifiers
-    has_deps = any(f.get('is_dependency_file', False) for f in file_stats)
+    has_deps = any(f.is_dependency_file for f in file_stats)
     if has_deps:
         return 0.0
     
@@ -575,9 +809,9 @@ def calculate_suitability_score(commit_data: Dict, file_stats: List[Dict],
     if difficulty_score >= 80:
         score += 10
     
-    test_files = [f for f in file_stats if f.get('is_test_file', False)]
-    test_additions = sum(f.get('additions', 0) for f in test_files)
-    total_additions = sum(f.get('additions', 0) for f in file_stats)
+    test_files = [f for f in file_stats if f.is_test_file]
+    test_additions = sum(f.additions for f in test_files)
+    total_additions = sum(f.additions for f in file_stats)
     test_coverage = test_additions / total_additions if total_additions > 0 else 0.0
     
     if test_coverage >= 0.5:
@@ -587,63 +821,1458 @@ def calculate_suitability_score(commit_data: Dict, file_stats: List[Dict],
         score += 10
     
     # Negative indicators
-    file_count = len([f for f in file_stats if not f.get('is_test_file', False)])
+    file_count = len([f for f in file_stats if not f.is_test_file])
     if file_count < 4:
         score -= 15
     if file_count > 100:
         score -= 10
     
-    non_test_additions = sum(f.get('additions', 0) for f in file_stats if not f.get('is_test_file', False))
+    non_test_additions = sum(f.additions for f in file_stats if not f.is_test_file)
     if non_test_additions < 200:
         score -= 10
     
     return max(0.0, min(100.0, score))
 
 
-def clone_or_update_repo(repo_org: str, repo_name: str, github_token: Optional[str] = None) -> Optional[Path]:
+def calculate_complexity_indicators(file_stats: List[FileStat]) -> Dict:
+    """Calculate the complexity_indicators stored with each commit."""
+    file_changes = len(file_stats)
+    non_test_files = [f for f in file_stats if not f.is_test_file]
+    directories = set()
+    for f in non_test_files:
+        dir_path = f.file_directory
+        if dir_path:
+            top_dir = dir_path.split('/')[0]
+            directories.add(top_dir)
+    
+    return {
+        'multi_file': 4 <= file_changes <= 50,
+        'cross_directory': len(directories) >= 3,
+        'many_directories': len(directories) >= 5,
+        'directory_count': len(directories),
+        'has_core_files': any(
+            any(pattern in f.file_path for pattern in CORE_PATH_PATTERNS)
+            for f in non_test_files
+        ),
+        'large_single_file': non_test_files and len(non_test_files) == 1 and non_test_files[0].additions >= 200,
+        'multiple_high_additions': 3 <= len(non_test_files) <= 6 and all(f.additions >= 300 for f in non_test_files)
+    }
+
+
+def calculate_file_stats_cache(file_stats: List[FileStat]) -> Tuple:
+    """
+    The commit_file_stats_cache row of a commit (without commit_id), matching
+    STATS_CACHE_BACKFILL_SQL in backfill_stats_cache.py.
+    """
+    non_test_additions = [f.additions for f in file_stats if not f.is_test_file]
+    non_test_count = len(non_test_additions)
+    total = sum(non_test_additions)
+    lowest = min(non_test_additions, default=0)
+    highest = max(non_test_additions, default=0)
+    # Rounded like MySQL's ROUND() on DECIMAL, not like float round()
+    average = (Decimal(total) / non_test_count).quantize(Decimal('0.01'), ROUND_HALF_UP) if non_test_count else 0
+    return (
+        non_test_count, len(file_stats) - non_test_count, len(file_stats),
+        lowest, highest, average, total,
+        non_test_count == 1 and highest >= 200,
+        non_test_count == 1 and highest >= 500,
+        3 <= non_test_count <= 6 and lowest >= 300,
+        non_test_count > 0 and lowest >= 200
+    )
+
+
+def get_clone_url(repo_org: str, repo_name: str, github_token: Optional[str] = None) -> str:
+    """Clone URL for a repo; GIT_CLONE_URL_TEMPLATE overrides GitHub (e.g. local mirrors)."""
+    if CLONE_URL_TEMPLATE:
+        return CLONE_URL_TEMPLATE.format(org=repo_org, repo=repo_name)
+    if github_token:
+        return f"https://{github_token}@github.com/{repo_org}/{repo_name}.git"
+    return f"https://github.com/{repo_org}/{repo_name}.git"
+
+
+def get_clone_options(strategy: str, cutoff_date: Optional[datetime]) -> List[str]:
+    """Extra `git clone` arguments for a clone strategy (see CLONE_STRATEGIES)."""
+    if strategy == 'blobless':
+        # Blobs are fetched on demand, only for the diffs we actually read
+        return ['--filter=blob:none']
+    if strategy == 'shallow' and cutoff_date:
+        return [f'--shallow-since={cutoff_date.isoformat()}']
+    if strategy == 'mirror':
+        return ['--mirror']
+    return []
+
+
+def can_read_numstat(repo_path: Path, timeout: int) -> bool:
+    """Check that the clone can produce numstat for its newest commit."""
+    try:
+        subprocess.run(
+            ['git', 'log', '-1', '--numstat', '--format=', 'HEAD', '--'],
+            cwd=repo_path,
+            capture_output=True,
+            check=True,
+            timeout=timeout,
+            env={**os.environ, 'GIT_TERMINAL_PROMPT': '0'}
+        )
+        return True
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+        return False
+
+
+def clone_or_update_repo(repo_org: str, repo_name: str, github_token: Optional[str] = None,
+                         timeout: int = GIT_NETWORK_TIMEOUT,
+                         retries: int = GIT_NETWORK_RETRIES,
+                         strategy: str = DEFAULT_CLONE_STRATEGY,
+                         cutoff_date: Optional[datetime] = None) -> Optional[Path]:
     """
     Clone repository or update if exists.
+    New clones use `strategy` (full, blobless, shallow since `cutoff_date`, or a bare
+    mirror) and fall back to a full clone when that strategy can't produce numstat.
+    Each attempt is limited to `timeout` seconds and failed attempts are retried `retries` times.
     Returns path to cloned repo or None on error.
     """
     repo_path = REPOS_DIR / repo_org / repo_name
     
-    if repo_path.exists():
-        print(f"    Updating existing repo: {repo_path}")
-        try:
-            repo = Repo(repo_path)
-            repo.remotes.origin.fetch()
-            repo.remotes.origin.pull()
-            return repo_path
-        except GitCommandError as e:
-            print(f"    Error updating repo: {e}")
-            return None
-    else:
-        print(f"    Cloning repo: {repo_path}")
-        repo_path.parent.mkdir(parents=True, exist_ok=True)
+    for attempt in range(retries + 1):
+        if attempt:
+            delay = 5 * attempt
+            print(f"    Retrying {repo_org}/{repo_name} in {delay}s (attempt {attempt + 1}/{retries + 1})")
+            time.sleep(delay)
         
-        # Build clone URL
-        if github_token:
-            clone_url = f"https://{github_token}@github.com/{repo_org}/{repo_name}.git"
+        if repo_path.exists():
+            print(f"    Updating existing repo: {repo_path}")
+            try:
+                repo = Repo(repo_path)
+                if repo.bare:
+                    # Mirrors have no working tree to pull into; fetch updates every ref
+                    repo.remotes.origin.fetch(prune=True, kill_after_timeout=timeout)
+                else:
+                    repo.remotes.origin.fetch(kill_after_timeout=timeout)
+                    repo.remotes.origin.pull(kill_after_timeout=timeout)
+                return repo_path
+            except GitCommandError as e:
+                print(f"    Error updating repo: {e}")
         else:
-            clone_url = f"https://github.com/{repo_org}/{repo_name}.git"
+            clone_options = get_clone_options(strategy, cutoff_date)
+            print(f"    Cloning repo: {repo_path}" + (f" ({strategy})" if clone_options else ""))
+            repo_path.parent.mkdir(parents=True, exist_ok=True)
+            
+            clone_url = get_clone_url(repo_org, repo_name, github_token)
+            git_env = {**os.environ, 'GIT_TERMINAL_PROMPT': '0'}
+            try:
+                subprocess.run(
+                    ['git', 'clone', *clone_options, '--', clone_url, str(repo_path)],
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                    timeout=timeout,
+                    env=git_env
+                )
+                if strategy == 'shallow' and clone_options:
+                    # Fetch the parents of the shallow boundary, otherwise the oldest
+                    # commits would diff against nothing and count every file as added
+                    subprocess.run(
+                        ['git', 'fetch', '--deepen=1', 'origin'],
+                        cwd=repo_path,
+                        capture_output=True,
+                        text=True,
+                        check=True,
+                        timeout=timeout,
+                        env=git_env
+                    )
+                if clone_options and not can_read_numstat(repo_path, timeout):
+                    print(f"    {strategy} clone can't produce numstat, falling back to a full clone")
+                    shutil.rmtree(repo_path, ignore_errors=True)
+                    strategy = 'full'
+                    continue
+                return repo_path
+            except subprocess.TimeoutExpired:
+                print(f"    Error cloning repo: timed out after {timeout}s")
+            except subprocess.CalledProcessError as e:
+                print(f"    Error cloning repo: {e.stderr.strip()}")
+                if clone_options:
+                    print(f"    Falling back to a full clone")
+                    strategy = 'full'
+            # Don't leave a half-finished clone behind to be "updated" next attempt
+            shutil.rmtree(repo_path, ignore_errors=True)
+    
+    return None
+
+
+def prefetch_repos(jobs: List[Dict], depth: int) -> Iterator[Tuple[Dict, Optional[Path]]]:
+    """
+    Yield (job, repo_path) in job order while cloning/updating up to `depth`
+    repos ahead in background threads, so the network work for the next repos
+    overlaps with the analysis of the current one. repo_path is None if the
+    clone/update failed.
+    """
+    github_token = os.getenv('GITHUB_TOKEN')
+    jobs = iter(jobs)
+    
+    def clone(job):
+        started = time.perf_counter()
+        repo_path = clone_or_update_repo(job['repo_org'], job['repo_name'], github_token,
+                                         strategy=job.get('clone_strategy', DEFAULT_CLONE_STRATEGY),
+                                         cutoff_date=job['cutoff_date'])
+        if job.get('timer') is not None:
+            job['timer'].add('clone', time.perf_counter() - started)
+        return repo_path
+    
+    with ThreadPoolExecutor(max_workers=depth) as executor:
+        def submit(job):
+            return job, executor.submit(clone, job)
+        
+        pending = deque(submit(job) for job in islice(jobs, depth))
+        while pending:
+            job, future = pending.popleft()
+            next_job = next(jobs, None)
+            if next_job:
+                pending.append(submit(next_job))
+            yield job, future.result()
+
+
+COMMIT_UPSERT_SQL = """
+    INSERT INTO commits (
+        repo_id, merged_commit, base_commit, source_sha, branch, message, author, commit_date,
+        file_changes, additions, deletions, net_change, test_additions, non_test_additions,
+        habitate_score, difficulty_score, suitability_score, pr_number, is_merge,
+        files, habitat_signals, has_dependency_changes, test_coverage_score,
+        complexity_indicators, is_unsuitable, unsuitable_reason, last_status_check,
+        is_behavior_preserving_refactor, content_fingerprint
+    ) VALUES (
+        %s, %s, %s, %s, %s, %s, %s, %s,
+        %s, %s, %s, %s, %s, %s,
+        %s, %s, %s, %s, %s,
+        %s, %s, %s, %s,
+        %s, %s, %s, %s,
+        %s, %s
+    )
+    ON DUPLICATE KEY UPDATE
+        file_changes = VALUES(file_changes),
+        additions = VALUES(additions),
+        deletions = VALUES(deletions),
+        net_change = VALUES(net_change),
+        test_additions = VALUES(test_additions),
+        non_test_additions = VALUES(non_test_additions),
+        habitate_score = VALUES(habitate_score),
+        difficulty_score = VALUES(difficulty_score),
+        suitability_score = VALUES(suitability_score),
+        complexity_indicators = VALUES(complexity_indicators),
+        content_fingerprint = VALUES(content_fingerprint),
+        updated_at = NOW()
+"""
+
+COMMIT_FILE_UPSERT_SQL = """
+    INSERT INTO commit_files (
+        commit_id, file_path, file_name, file_directory,
+        additions, deletions, is_test_file, is_dependency_file, file_extension
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        additions = VALUES(additions),
+        deletions = VALUES(deletions)
+"""
+
+DEPENDENCY_ANALYSIS_UPSERT_SQL = """
+    INSERT INTO commit_dependency_analysis (
+        commit_id, dependency_files, dependency_type,
+        has_new_dependencies, has_version_updates
+    ) VALUES (%s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        dependency_files = VALUES(dependency_files),
+        dependency_type = VALUES(dependency_type),
+        has_new_dependencies = VALUES(has_new_dependencies),
+        has_version_updates = VALUES(has_version_updates),
+        analysis_date = NOW()
+"""
+
+TEST_ANALYSIS_UPSERT_SQL = """
+    INSERT INTO commit_test_analysis (
+        commit_id, test_files_added, test_files_modified, test_files_removed,
+        test_coverage_estimate, test_quality_score,
+        has_integration_tests, has_unit_tests
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        test_files_added = VALUES(test_files_added),
+        test_files_modified = VALUES(test_files_modified),
+        test_files_removed = VALUES(test_files_removed),
+        test_coverage_estimate = VALUES(test_coverage_estimate),
+        test_quality_score = VALUES(test_quality_score),
+        has_integration_tests = VALUES(has_integration_tests),
+        has_unit_tests = VALUES(has_unit_tests),
+        analysis_date = NOW()
+"""
+
+FILE_STATS_CACHE_UPSERT_SQL = """
+    INSERT INTO commit_file_stats_cache (
+        commit_id, non_test_file_count, test_file_count, total_file_count,
+        min_non_test_additions, max_non_test_additions, avg_non_test_additions,
+        total_non_test_additions, single_file_200plus, single_file_500plus,
+        multi_file_300plus, all_files_200plus
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        non_test_file_count = VALUES(non_test_file_count),
+        test_file_count = VALUES(test_file_count),
+        total_file_count = VALUES(total_file_count),
+        min_non_test_additions = VALUES(min_non_test_additions),
+        max_non_test_additions = VALUES(max_non_test_additions),
+        avg_non_test_additions = VALUES(avg_non_test_additions),
+        total_non_test_additions = VALUES(total_non_test_additions),
+        single_file_200plus = VALUES(single_file_200plus),
+        single_file_500plus = VALUES(single_file_500plus),
+        multi_file_300plus = VALUES(multi_file_300plus),
+        all_files_200plus = VALUES(all_files_200plus)
+"""
+
+# Initial loads (BulkLoadWriter): rows are staged per table by LOAD DATA LOCAL
+# INFILE, then merged with one INSERT ... SELECT each. Child rows are staged
+# with their commit's base_commit, which is resolved to commits.id in the
+# merge. Updates are the same as the upserts above; columns are qualified
+# because the merge queries read tables with the same column names.
+COMMIT_STAGING_COLUMNS = (
+    'merged_commit', 'base_commit', 'source_sha', 'branch', 'message', 'author', 'commit_date',
+    'file_changes', 'additions', 'deletions', 'net_change', 'test_additions', 'non_test_additions',
+    'habitate_score', 'difficulty_score', 'suitability_score', 'pr_number', 'is_merge',
+    'files', 'habitat_signals', 'has_dependency_changes', 'test_coverage_score',
+    'complexity_indicators', 'is_unsuitable', 'unsuitable_reason', 'last_status_check',
+    'is_behavior_preserving_refactor', 'content_fingerprint'
+)
+FILE_STAGING_COLUMNS = ('base_commit', 'file_path', 'file_name', 'file_directory', 'additions',
+                        'deletions', 'is_test_file', 'is_dependency_file', 'file_extension')
+DEPENDENCY_STAGING_COLUMNS = ('base_commit', 'dependency_files', 'dependency_type',
+                              'has_new_dependencies', 'has_version_updates')
+TEST_STAGING_COLUMNS = ('base_commit', 'test_files_added', 'test_files_modified', 'test_files_removed',
+                        'test_coverage_estimate', 'test_quality_score',
+                        'has_integration_tests', 'has_unit_tests')
+STATS_CACHE_STAGING_COLUMNS = (
+    'base_commit', 'non_test_file_count', 'test_file_count', 'total_file_count',
+    'min_non_test_additions', 'max_non_test_additions', 'avg_non_test_additions',
+    'total_non_test_additions', 'single_file_200plus', 'single_file_500plus',
+    'multi_file_300plus', 'all_files_200plus'
+)
+
+
+def _child_staging(table: str, columns: Tuple[str, ...], updates: str) -> Tuple[str, Tuple[str, ...], str, str]:
+    """STAGING_TABLES entry for a child table of commits, whose staged rows carry base_commit."""
+    child_columns = ', '.join(columns[1:])
+    # Empty query that gives the staging columns the types they have in the live tables
+    select_sql = (f"SELECT c.base_commit, {', '.join(f't.{column}' for column in columns[1:])} "
+                  f"FROM {table} t JOIN commits c ON c.id = t.commit_id WHERE FALSE")
+    merge_sql = f"""
+    INSERT INTO {table} (commit_id, {child_columns})
+    SELECT c.id, {', '.join(f's.{column}' for column in columns[1:])}
+    FROM {table}_staging s
+    JOIN commits c ON c.repo_id = %s AND c.base_commit = s.base_commit
+    ORDER BY s.seq
+    ON DUPLICATE KEY UPDATE
+        {updates}
+"""
+    return f'{table}_staging', columns, select_sql, merge_sql
+
+
+COMMIT_MERGE_SQL = f"""
+    INSERT INTO commits (repo_id, {', '.join(COMMIT_STAGING_COLUMNS)})
+    SELECT %s, {', '.join(COMMIT_STAGING_COLUMNS)}
+    FROM commits_staging
+    ORDER BY seq
+    ON DUPLICATE KEY UPDATE
+        commits.file_changes = VALUES(file_changes),
+        commits.additions = VALUES(additions),
+        commits.deletions = VALUES(deletions),
+        commits.net_change = VALUES(net_change),
+        commits.test_additions = VALUES(test_additions),
+        commits.non_test_additions = VALUES(non_test_additions),
+        commits.habitate_score = VALUES(habitate_score),
+        commits.difficulty_score = VALUES(difficulty_score),
+        commits.suitability_score = VALUES(suitability_score),
+        commits.complexity_indicators = VALUES(complexity_indicators),
+        commits.content_fingerprint = VALUES(content_fingerprint),
+        commits.updated_at = NOW()
+"""
+
+STAGED_FILE_ROWS_DELETE_SQL = """
+    DELETE commit_files FROM commit_files
+    JOIN commits c ON c.id = commit_files.commit_id
+    JOIN commits_staging s ON s.base_commit = c.base_commit
+    WHERE c.repo_id = %s
+"""
+
+# (staging table, staged columns, query giving their types, merge statement), in merge order
+STAGING_TABLES = (
+    ('commits_staging', COMMIT_STAGING_COLUMNS,
+     f"SELECT {', '.join(COMMIT_STAGING_COLUMNS)} FROM commits WHERE FALSE", COMMIT_MERGE_SQL),
+    _child_staging(
+        'commit_files', FILE_STAGING_COLUMNS,
+        """commit_files.additions = VALUES(additions),
+        commit_files.deletions = VALUES(deletions)"""
+    ),
+    _child_staging(
+        'commit_dependency_analysis', DEPENDENCY_STAGING_COLUMNS,
+        """commit_dependency_analysis.dependency_files = VALUES(dependency_files),
+        commit_dependency_analysis.dependency_type = VALUES(dependency_type),
+        commit_dependency_analysis.has_new_dependencies = VALUES(has_new_dependencies),
+        commit_dependency_analysis.has_version_updates = VALUES(has_version_updates),
+        commit_dependency_analysis.analysis_date = NOW()"""
+    ),
+    _child_staging(
+        'commit_test_analysis', TEST_STAGING_COLUMNS,
+        """commit_test_analysis.test_files_added = VALUES(test_files_added),
+        commit_test_analysis.test_files_modified = VALUES(test_files_modified),
+        commit_test_analysis.test_files_removed = VALUES(test_files_removed),
+        commit_test_analysis.test_coverage_estimate = VALUES(test_coverage_estimate),
+        commit_test_analysis.test_quality_score = VALUES(test_quality_score),
+        commit_test_analysis.has_integration_tests = VALUES(has_integration_tests),
+        commit_test_analysis.has_unit_tests = VALUES(has_unit_tests),
+        commit_test_analysis.analysis_date = NOW()"""
+    ),
+    _child_staging(
+        'commit_file_stats_cache', STATS_CACHE_STAGING_COLUMNS,
+        """commit_file_stats_cache.non_test_file_count = VALUES(non_test_file_count),
+        commit_file_stats_cache.test_file_count = VALUES(test_file_count),
+        commit_file_stats_cache.total_file_count = VALUES(total_file_count),
+        commit_file_stats_cache.min_non_test_additions = VALUES(min_non_test_additions),
+        commit_file_stats_cache.max_non_test_additions = VALUES(max_non_test_additions),
+        commit_file_stats_cache.avg_non_test_additions = VALUES(avg_non_test_additions),
+        commit_file_stats_cache.total_non_test_additions = VALUES(total_non_test_additions),
+        commit_file_stats_cache.single_file_200plus = VALUES(single_file_200plus),
+        commit_file_stats_cache.single_file_500plus = VALUES(single_file_500plus),
+        commit_file_stats_cache.multi_file_300plus = VALUES(multi_file_300plus),
+        commit_file_stats_cache.all_files_200plus = VALUES(all_files_200plus)"""
+    ),
+)
+
+# --rebuild: batches are written to copies of the tables named <table>_rebuild
+# (backend/scripts/create_commit_rebuild_tables.sql) with the upserts above.
+# When the walk is complete, the staged rows replace the repo's live rows in one
+# transaction. Commit rows are updated in place and never deleted, as user data
+# (favorites, memos, reservations, ...) cascades from commits.id; only the
+# child rows of the rebuilt commits are replaced.
+REBUILD_CHILD_TABLES = (
+    ('commit_files', FILE_STAGING_COLUMNS[1:]),
+    ('commit_dependency_analysis', DEPENDENCY_STAGING_COLUMNS[1:]),
+    ('commit_test_analysis', TEST_STAGING_COLUMNS[1:]),
+    ('commit_file_stats_cache', STATS_CACHE_STAGING_COLUMNS[1:]),
+)
+
+# Everything the fetch computes; the key, manual unsuitable flags and status checks are kept
+REBUILD_COMMIT_COLUMNS = tuple(column for column in COMMIT_STAGING_COLUMNS if column not in (
+    'merged_commit', 'base_commit', 'is_unsuitable', 'unsuitable_reason', 'last_status_check'
+))
+
+_REBUILD_COMMIT_UPDATES = ',\n        '.join(
+    [f'commits.{column} = VALUES({column})' for column in REBUILD_COMMIT_COLUMNS] + ['commits.updated_at = NOW()']
+)
+
+REBUILD_COMMIT_MERGE_SQL = f"""
+    INSERT INTO commits (repo_id, {', '.join(COMMIT_STAGING_COLUMNS)})
+    SELECT repo_id, {', '.join(COMMIT_STAGING_COLUMNS)}
+    FROM commits_rebuild
+    WHERE repo_id = %s
+    ORDER BY id
+    ON DUPLICATE KEY UPDATE
+        {_REBUILD_COMMIT_UPDATES}
+"""
+
+# Child rows: every live one of the repo is deleted, including those of commits
+# the walk no longer reaches, then the staged ones are inserted
+REBUILD_CHILD_DELETE_SQL = """
+    DELETE t FROM {table} t
+    JOIN commits c ON c.id = t.commit_id
+    WHERE c.repo_id = %s
+"""
+
+REBUILD_CHILD_INSERT_SQL = """
+    INSERT INTO {table} (commit_id, {columns})
+    SELECT c.id, {staged_columns}
+    FROM {table}_rebuild r
+    JOIN commits_rebuild s ON s.id = r.commit_id
+    JOIN commits c ON c.repo_id = s.repo_id AND c.base_commit = s.base_commit
+    WHERE s.repo_id = %s
+"""
+
+# Live commits of the repo the rebuild didn't stage; their rows are kept, as user data cascades from them
+REBUILD_STALE_COUNT_SQL = """
+    SELECT COUNT(*) FROM commits c
+    WHERE c.repo_id = %s
+      AND NOT EXISTS (SELECT 1 FROM commits_rebuild s
+                      WHERE s.repo_id = c.repo_id AND s.base_commit = c.base_commit)
+"""
+
+REBUILD_CHILD_COUNT_SQL = """
+    SELECT COUNT(*) FROM {table}_rebuild r
+    JOIN commits_rebuild s ON s.id = r.commit_id
+    WHERE s.repo_id = %s
+"""
+
+REBUILD_CHILD_CLEAR_SQL = """
+    DELETE r FROM {table}_rebuild r
+    JOIN commits_rebuild s ON s.id = r.commit_id
+    WHERE s.repo_id = %s
+"""
+
+
+def _rebuild_sql(sql: str, table: str) -> str:
+    """One of the upserts above, writing to `table`'s rebuild copy instead."""
+    return sql.replace(f'INSERT INTO {table} (', f'INSERT INTO {table}_rebuild (', 1)
+
+
+CHECKPOINT_COLUMNS = ('run_id', 'tip_sha', 'rev', 'since_date', 'last_commit_sha',
+                      'commits_saved', 'commits_failed')
+
+CHECKPOINT_UPSERT_SQL = """
+    INSERT INTO fetch_checkpoints (
+        repo_id, run_id, tip_sha, rev, since_date,
+        last_commit_sha, commits_saved, commits_failed
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        run_id = VALUES(run_id),
+        tip_sha = VALUES(tip_sha),
+        rev = VALUES(rev),
+        since_date = VALUES(since_date),
+        last_commit_sha = VALUES(last_commit_sha),
+        commits_saved = VALUES(commits_saved),
+        commits_failed = VALUES(commits_failed),
+        updated_at = NOW()
+"""
+
+
+def get_content_fingerprint(commit_hash: str, branch: str, file_stats: List[FileStat]) -> str:
+    """
+    Stable hash of everything a commit row is computed from: the commit, its
+    numstat (with the path classification) and RULES_VERSION.
+    """
+    digest = hashlib.sha256(f'{RULES_VERSION}\0{commit_hash}\0{branch}'.encode('utf-8'))
+    for f in file_stats:
+        digest.update(f'\0{f.file_path}\t{f.additions}\t{f.deletions}\t'
+                      f'{f.is_test_file:d}{f.is_dependency_file:d}'.encode('utf-8'))
+    return digest.hexdigest()[:32]
+
+
+def build_habitat_signals(file_changes: int, total_additions: int, total_deletions: int,
+                          test_additions: int, non_test_additions: int, has_test_like: bool,
+                          is_behavior_refactor: bool, message_categories: List[str]) -> Dict:
+    """Build the habitat_signals dict stored with each commit."""
+    return {
+        'multi_file': 4 <= file_changes <= 50,
+        'non_trivial_size': (total_additions + total_deletions) >= 20,
+        'has_test_like': has_test_like,
+        'files_changed': file_changes,
+        'additions': non_test_additions,
+        'deletions': total_deletions,
+        'net_change': total_additions - total_deletions,
+        'test_additions': test_additions,
+        'non_test_additions': non_test_additions,
+        'is_behavior_preserving_refactor': is_behavior_refactor,
+        'message_categories': message_categories
+    }
+
+
+def analyze_commit(commit: Dict, file_stats: List[FileStat], repo_path: Path, branch: str,
+                   timer: Optional[StageTimer] = None) -> Dict:
+    """
+    Run the analyzers and scorers for one commit.
+    Returns the values CommitBatchWriter needs to save the commit and its child rows.
+    """
+    started = time.perf_counter()
+    commit_hash = commit['hexsha']
+    commit_message = commit['message']
+    commit_date = commit['committed_datetime']
+    author = commit['author']
+    
+    # Get parents
+    parents = commit['parents']
+    is_merge = len(parents) >= 2
+    # For initial commits (no parents), use empty string instead of None
+    base_commit = parents[0] if parents else ''
+    
+    # Calculate aggregate statistics
+    total_additions = sum(f.additions for f in file_stats)
+    total_deletions = sum(f.deletions for f in file_stats)
+    test_additions = sum(f.additions for f in file_stats if f.is_test_file)
+    non_test_additions = sum(f.additions for f in file_stats if not f.is_test_file)
+    net_change = total_additions - total_deletions
+    file_changes = len(file_stats)
+    
+    # Detect dependency changes
+    has_dependency_changes = any(f.is_dependency_file for f in file_stats)
+    
+    # Analyze dependencies in detail
+    dependency_analysis = analyze_dependencies(file_stats, repo_path, commit_hash,
+                                               parents[0] if parents else None)
+    
+    # Analyze tests in detail
+    test_analysis = analyze_tests(file_stats)
+    
+    # Classify the message (behavior-preserving refactor and any other rule categories)
+    message_categories = MESSAGE_CLASSIFIER.classify(commit_message)
+    is_behavior_refactor = BEHAVIOR_PRESERVING_REFACTOR in message_categories
+    classified = time.perf_counter()
+    
+    # Source SHA: For merge commits, this might be different, but for regular commits it's the same
+    source_sha = commit_hash  # Could be enhanced to detect actual source commit for merges
+    
+    # Calculate complexity indicators
+    complexity_indicators = calculate_complexity_indicators(file_stats)
+    complexity_indicators_json = json.dumps(complexity_indicators)
+    
+    # Unsuitable flags (default to FALSE/0)
+    is_unsuitable = False  # Only set to True if manually marked
+    unsuitable_reason = None  # Only set if manually marked
+    
+    # Last status check (NULL by default, only set when checking Habitat API)
+    last_status_check = None
+    
+    # Calculate scores
+    habitate_score = calculate_habitate_score(file_stats, is_behavior_refactor)
+    difficulty_score = calculate_difficulty_score(file_stats, is_behavior_refactor)
+    suitability_score = calculate_suitability_score(
+        {}, file_stats, habitate_score, difficulty_score, is_behavior_refactor
+    )
+    
+    # Test coverage
+    test_coverage_score = test_additions / total_additions if total_additions > 0 else 0.0
+    
+    # Extract PR number from message (if present)
+    pr_number = MESSAGE_CLASSIFIER.pr_number(commit_message)
+    
+    # Prepare files JSON (just paths)
+    files_json = json.dumps([f.file_path for f in file_stats])
+    
+    # Prepare habitat_signals JSON
+    habitat_signals = build_habitat_signals(
+        file_changes, total_additions, total_deletions, test_additions, non_test_additions,
+        any(f.is_test_file for f in file_stats), is_behavior_refactor, message_categories
+    )
+    habitat_signals_json = json.dumps(habitat_signals)
+    
+    content_fingerprint = get_content_fingerprint(commit_hash, branch, file_stats)
+    
+    # Aggregates behind the commit list's file pattern filters
+    file_stats_cache = calculate_file_stats_cache(file_stats)
+    
+    if timer is not None:
+        timer.add('classify', classified - started)
+        timer.add('scoring', time.perf_counter() - classified)
+    
+    return {
+        'commit_hash': commit_hash,
+        'base_commit': base_commit,
+        'fingerprint': content_fingerprint,
+        'commit_values': (
+            commit_hash, base_commit, source_sha, branch, commit_message[:1000],
+            author, commit_date,
+            file_changes, total_additions, total_deletions, net_change,
+            test_additions, non_test_additions,
+            habitate_score, difficulty_score, suitability_score, pr_number, is_merge,
+            files_json, habitat_signals_json, has_dependency_changes, test_coverage_score,
+            complexity_indicators_json, is_unsuitable, unsuitable_reason, last_status_check,
+            is_behavior_refactor, content_fingerprint
+        ),
+        'file_stats': file_stats,
+        'dependency_analysis': dependency_analysis if has_dependency_changes else None,
+        'test_analysis': test_analysis,
+        'file_stats_cache': file_stats_cache
+    }
+
+
+class CommitBatchWriter:
+    """
+    Buffer analysed commits and save them with multi-row upserts.
+    Each batch of `batch_size` commits is written in one transaction.
+    Commits whose row already has the same content fingerprint (`fingerprints`:
+    base_commit -> content_fingerprint) are not written at all.
+    With a `checkpoint` (see load_checkpoint), the repo's fetch_checkpoints row
+    is moved to the last commit of each batch in the batch's own transaction.
+    Statement and commit times go to `timer` when one is given.
+    """
+    
+    # Where batches are written; RebuildWriter points these at the staging tables
+    commits_table = 'commits'
+    files_table = 'commit_files'
+    commit_upsert_sql = COMMIT_UPSERT_SQL
+    file_upsert_sql = COMMIT_FILE_UPSERT_SQL
+    dependency_upsert_sql = DEPENDENCY_ANALYSIS_UPSERT_SQL
+    test_upsert_sql = TEST_ANALYSIS_UPSERT_SQL
+    stats_cache_upsert_sql = FILE_STATS_CACHE_UPSERT_SQL
+    
+    def __init__(self, conn, repo_id: int, batch_size: int = DEFAULT_BATCH_SIZE,
+                 fingerprints: Optional[Dict[str, str]] = None,
+                 checkpoint: Optional[Dict] = None,
+                 timer: Optional[StageTimer] = None):
+        self.conn = conn
+        self.repo_id = repo_id
+        self.batch_size = max(1, batch_size)
+        self.fingerprints = fingerprints or {}
+        self.checkpoint = checkpoint
+        self.timer = timer
+        self.pending: List[Dict] = []
+        self.saved_count = 0
+        self.skipped_count = 0
+        self.unchanged_count = 0
+        # Commits of this run whose analysis failed, kept up to date by the caller
+        # so the checkpoint's commits_failed covers them too
+        self.failed_analyses = 0
+    
+    def add(self, analysis: Dict):
+        """Queue one analyze_commit() result, flushing when the batch is full."""
+        if self.fingerprints.get(analysis['base_commit']) == analysis['fingerprint']:
+            self.unchanged_count += 1
+            return
+        self.pending.append(analysis)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+    
+    def flush(self):
+        """Write all pending commits and commit the transaction."""
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
         
         try:
-            repo = Repo.clone_from(clone_url, repo_path)
-            return repo_path
-        except GitCommandError as e:
-            print(f"    Error cloning repo: {e}")
-            return None
+            self._save(batch)
+        except Error as e:
+            if is_connection_error(e):
+                # Still unreachable after reconnecting; the checkpoint has everything before this batch
+                print(f"    Lost the MySQL connection saving {len(batch)} commits: {e}")
+                raise
+            self.conn.rollback()
+            if len(batch) == 1:
+                print(f"    Error saving commit {batch[0]['commit_hash'][:8]}: {e}")
+                self.skipped_count += 1
+                return
+            # Replay one commit at a time so a single bad row doesn't drop the batch
+            print(f"    Error saving batch of {len(batch)} commits, retrying individually: {e}")
+            for analysis in batch:
+                try:
+                    self._save([analysis])
+                except Error as e:
+                    if is_connection_error(e):
+                        raise
+                    print(f"    Error saving commit {analysis['commit_hash'][:8]}: {e}")
+                    self.conn.rollback()
+                    self.skipped_count += 1
+    
+    def close(self):
+        """Write what is still pending; called once at the end of the run."""
+        self.flush()
+    
+    def _save(self, batch: List[Dict]):
+        """Write one batch, running the transaction again if the connection drops."""
+        run_in_transaction(self.conn, lambda: self._write(batch))
+    
+    def _write(self, batch: List[Dict]):
+        started = time.perf_counter()
+        cursor = self.conn.cursor()
+        try:
+            cursor.executemany(self.commit_upsert_sql, [
+                (self.repo_id,) + analysis['commit_values'] for analysis in batch
+            ])
+            
+            commit_ids = self._fetch_commit_ids(cursor, {a['base_commit'] for a in batch})
+            
+            file_rows = []
+            dependency_rows = []
+            test_rows = []
+            stats_cache_rows = []
+            written = 0
+            missing = 0
+            for analysis in batch:
+                # Rows are keyed on the (repo_id, base_commit) unique key, so that
+                # is what links child rows back to the commit row
+                commit_db_id = commit_ids.get(analysis['base_commit'])
+                if not commit_db_id:
+                    print(f"    Warning: Could not get commit ID for {analysis['commit_hash'][:8]}")
+                    missing += 1
+                    continue
+                
+                files, dependency_row, test_row, stats_cache_row = self._child_rows(analysis, commit_db_id)
+                file_rows.extend(files)
+                if dependency_row:
+                    dependency_rows.append(dependency_row)
+                test_rows.append(test_row)
+                stats_cache_rows.append(stats_cache_row)
+                written += 1
+            
+            self._delete_file_rows(cursor, list(commit_ids.values()))
+            # Vendored-code commits can touch tens of thousands of files, so
+            # keep each multi-row statement well below max_allowed_packet
+            for start in range(0, len(file_rows), ROWS_PER_STATEMENT):
+                cursor.executemany(self.file_upsert_sql, file_rows[start:start + ROWS_PER_STATEMENT])
+            if dependency_rows:
+                cursor.executemany(self.dependency_upsert_sql, dependency_rows)
+            if test_rows:
+                cursor.executemany(self.test_upsert_sql, test_rows)
+            if stats_cache_rows:
+                cursor.executemany(self.stats_cache_upsert_sql, stats_cache_rows)
+            self._commit(cursor, batch, started, written, missing)
+        finally:
+            cursor.close()
+    
+    @staticmethod
+    def _child_rows(analysis: Dict, commit_key) -> Tuple[List[Tuple], Optional[Tuple], Tuple, Tuple]:
+        """
+        The commit_files, commit_dependency_analysis (None when there is no
+        dependency change), commit_test_analysis and commit_file_stats_cache
+        rows of one commit, each led by `commit_key`.
+        """
+        file_rows = [(
+            commit_key,
+            file_stat.file_path,
+            file_stat.file_name,
+            file_stat.file_directory,
+            file_stat.additions,
+            file_stat.deletions,
+            file_stat.is_test_file,
+            file_stat.is_dependency_file,
+            file_stat.file_extension
+        ) for file_stat in analysis['file_stats']]
+        
+        dependency_row = None
+        dependency_analysis = analysis['dependency_analysis']
+        if dependency_analysis:
+            dependency_row = (
+                commit_key,
+                json.dumps(dependency_analysis['dependency_files']),
+                dependency_analysis['dependency_type'],
+                dependency_analysis['has_new_dependencies'],
+                dependency_analysis['has_version_updates']
+            )
+        
+        test_analysis = analysis['test_analysis']
+        test_row = (
+            commit_key,
+            test_analysis['test_files_added'],
+            test_analysis['test_files_modified'],
+            test_analysis['test_files_removed'],
+            test_analysis['test_coverage_estimate'],
+            test_analysis['test_quality_score'],
+            test_analysis['has_integration_tests'],
+            test_analysis['has_unit_tests']
+        )
+        return file_rows, dependency_row, test_row, (commit_key,) + analysis['file_stats_cache']
+    
+    def _commit(self, cursor, batch: List[Dict], started: float, written: int, missing: int):
+        """Move the checkpoint to the end of `batch` and commit the batch's transaction."""
+        if self.checkpoint is not None:
+            checkpoint = self.checkpoint
+            cursor.execute(CHECKPOINT_UPSERT_SQL, (
+                self.repo_id, checkpoint['run_id'], checkpoint['tip_sha'], checkpoint['rev'],
+                checkpoint['since_date'], batch[-1]['commit_hash'],
+                checkpoint['commits_saved'] + self.saved_count + written,
+                checkpoint['commits_failed'] + self.skipped_count + self.failed_analyses + missing
+            ))
+        
+        commit_started = time.perf_counter()
+        self.conn.commit()
+        if self.timer is not None:
+            self.timer.add('db_write', commit_started - started)
+            self.timer.add('db_commit', time.perf_counter() - commit_started)
+        # Counted only once committed, as a failed attempt may be run again
+        self.saved_count += written
+        self.skipped_count += missing
+    
+    def _delete_file_rows(self, cursor, commit_ids: List[int]):
+        """
+        Remove the stored file rows of commits about to be written. Upserting
+        alone would keep rows whose path is no longer reported, e.g. renames
+        stored as `dir/{old => new}` before paths were read with `git log -z`.
+        """
+        for start in range(0, len(commit_ids), ROWS_PER_STATEMENT):
+            chunk = commit_ids[start:start + ROWS_PER_STATEMENT]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f"DELETE FROM {self.files_table} WHERE commit_id IN ({placeholders})", tuple(chunk))
+    
+    def _fetch_commit_ids(self, cursor, base_commits) -> Dict[str, int]:
+        """Map base_commit -> commits.id for the rows just upserted."""
+        base_commits = list(base_commits)
+        commit_ids = {}
+        for start in range(0, len(base_commits), ROWS_PER_STATEMENT):
+            chunk = base_commits[start:start + ROWS_PER_STATEMENT]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f"""
+                SELECT id, base_commit FROM {self.commits_table}
+                WHERE repo_id = %s AND base_commit IN ({placeholders})
+            """, (self.repo_id, *chunk))
+            for commit_db_id, base_commit in cursor.fetchall():
+                commit_ids[base_commit] = commit_db_id
+        return commit_ids
+
+
+class BulkLoadWriter(CommitBatchWriter):
+    """
+    CommitBatchWriter for the initial load of a repo. Each batch of
+    `batch_size` (BULK_LOAD_BATCH_SIZE) commits is written to TSV files,
+    loaded into temporary staging tables with LOAD DATA LOCAL INFILE and
+    merged into the real tables with one INSERT ... SELECT per table, all in
+    the batch's transaction (see bulk_load and STAGING_TABLES).
+    If a load fails (LOAD DATA LOCAL disabled on the server, a row MySQL
+    had to convert, ...), that batch and the rest of the run are written
+    with the usual upserts, `fallback_batch_size` commits at a time.
+    """
+    
+    def __init__(self, conn, repo_id: int, batch_size: int = BULK_LOAD_BATCH_SIZE,
+                 fingerprints: Optional[Dict[str, str]] = None,
+                 checkpoint: Optional[Dict] = None,
+                 timer: Optional[StageTimer] = None,
+                 fallback_batch_size: int = DEFAULT_BATCH_SIZE):
+        super().__init__(conn, repo_id, batch_size, fingerprints, checkpoint, timer)
+        self.fallback_batch_size = max(1, fallback_batch_size)
+        self.bulk = True
+    
+    def flush(self):
+        if self.bulk and self.pending:
+            batch, self.pending = self.pending, []
+            try:
+                self._bulk_save(batch)
+                return
+            except (Error, BulkLoadError) as e:
+                if isinstance(e, Error) and is_connection_error(e):
+                    print(f"    Lost the MySQL connection loading {len(batch)} commits: {e}")
+                    raise
+                self.conn.rollback()
+                print(f"    Bulk load failed, continuing with batched inserts: {e}")
+                self.bulk = False
+                self.batch_size = self.fallback_batch_size
+                self.pending = batch
+        
+        pending, self.pending = self.pending, []
+        for start in range(0, len(pending), self.batch_size):
+            self.pending = pending[start:start + self.batch_size]
+            super().flush()
+    
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._drop_staging_tables()
+    
+    def _bulk_save(self, batch: List[Dict]):
+        started = time.perf_counter()
+        files = {name: TsvFile(name) for name, _, _, _ in STAGING_TABLES}
+        try:
+            commit_file, file_file, dependency_file, test_file, stats_cache_file = files.values()
+            for analysis in batch:
+                commit_file.write(analysis['commit_values'])
+                file_rows, dependency_row, test_row, stats_cache_row = self._child_rows(
+                    analysis, analysis['base_commit']
+                )
+                for file_row in file_rows:
+                    file_file.write(file_row)
+                if dependency_row:
+                    dependency_file.write(dependency_row)
+                test_file.write(test_row)
+                stats_cache_file.write(stats_cache_row)
+            # Time spent writing the files counts as the batch's write time
+            run_in_transaction(self.conn, lambda: self._load(batch, files, started))
+        finally:
+            for tsv in files.values():
+                tsv.remove()
+    
+    def _load(self, batch: List[Dict], files: Dict[str, TsvFile], started: float):
+        cursor = self.conn.cursor()
+        try:
+            # Created again after a reconnect, as temporary tables go with the connection
+            for name, columns, select_sql, _ in STAGING_TABLES:
+                create_staging_table(cursor, name, select_sql)
+                if files[name].rows:
+                    load_tsv(cursor, files[name], name, columns)
+            # Commits stored before this run get their file rows replaced (see _delete_file_rows)
+            cursor.execute(STAGED_FILE_ROWS_DELETE_SQL, (self.repo_id,))
+            for name, _, _, merge_sql in STAGING_TABLES:
+                if files[name].rows:
+                    cursor.execute(merge_sql, (self.repo_id,))
+            # Child rows join to the commit rows merged just before, so none can be missing
+            self._commit(cursor, batch, started, len(batch), 0)
+        finally:
+            cursor.close()
+    
+    def _drop_staging_tables(self):
+        cursor = self.conn.cursor()
+        try:
+            for name, _, _, _ in STAGING_TABLES:
+                drop_staging_table(cursor, name)
+        except Error as e:
+            print(f"    Could not drop the staging tables: {e}")
+        finally:
+            cursor.close()
+
+
+class RebuildWriter(CommitBatchWriter):
+    """
+    CommitBatchWriter for --rebuild: batches go to the *_rebuild staging
+    tables instead of the live ones, checkpointed as usual, so the live rows
+    stay as they are for the whole walk. Every commit is staged, unchanged
+    ones included, so the staged rows are the repo's complete new set.
+    Unless `resume`, the repo's rows left in the staging tables by an earlier
+    rebuild are discarded first. `expected_commits` is the number of commits
+    the walk lists (what is left of it when resuming). Once the walk is
+    complete, merge() checks the staged rows and swaps them in atomically,
+    in one transaction.
+    """
+    
+    commits_table = 'commits_rebuild'
+    files_table = 'commit_files_rebuild'
+    commit_upsert_sql = _rebuild_sql(COMMIT_UPSERT_SQL, 'commits')
+    file_upsert_sql = _rebuild_sql(COMMIT_FILE_UPSERT_SQL, 'commit_files')
+    dependency_upsert_sql = _rebuild_sql(DEPENDENCY_ANALYSIS_UPSERT_SQL, 'commit_dependency_analysis')
+    test_upsert_sql = _rebuild_sql(TEST_ANALYSIS_UPSERT_SQL, 'commit_test_analysis')
+    stats_cache_upsert_sql = _rebuild_sql(FILE_STATS_CACHE_UPSERT_SQL, 'commit_file_stats_cache')
+    
+    def __init__(self, conn, repo_id: int, batch_size: int = DEFAULT_BATCH_SIZE,
+                 checkpoint: Optional[Dict] = None,
+                 timer: Optional[StageTimer] = None,
+                 resume: bool = False, expected_commits: Optional[int] = None):
+        # No fingerprints, so unchanged commits are staged too: a commit left
+        # out of the staging tables would lose its child rows in the merge
+        super().__init__(conn, repo_id, batch_size, None, checkpoint, timer)
+        self.expected_commits = expected_commits
+        # Analyses handed to add() by this run
+        self.received_count = 0
+        if not resume:
+            self.clear_staged()
+        # Commits staged so far, to check the staging tables against before merging
+        cursor = conn.cursor()
+        cursor.execute("SELECT base_commit FROM commits_rebuild WHERE repo_id = %s", (repo_id,))
+        self.staged = {base_commit for base_commit, in cursor.fetchall()}
+        cursor.close()
+    
+    def add(self, analysis: Dict):
+        self.received_count += 1
+        super().add(analysis)
+    
+    def _write(self, batch: List[Dict]):
+        super()._write(batch)
+        self.staged.update(analysis['base_commit'] for analysis in batch)
+    
+    def clear_staged(self):
+        """Remove the repo's rows from the staging tables."""
+        def clear():
+            cursor = self.conn.cursor()
+            try:
+                for table, _ in REBUILD_CHILD_TABLES:
+                    cursor.execute(REBUILD_CHILD_CLEAR_SQL.format(table=table), (self.repo_id,))
+                cursor.execute("DELETE FROM commits_rebuild WHERE repo_id = %s", (self.repo_id,))
+                self.conn.commit()
+            finally:
+                cursor.close()
+        run_in_transaction(self.conn, clear)
+    
+    def validate(self, empty_commits: int = 0) -> List[str]:
+        """
+        Problems that keep the staged rows from being merged; empty when they
+        are complete. `empty_commits` is how many commits of the walk had no
+        file changes (and so never reached add()).
+        """
+        problems = []
+        if self.expected_commits is not None:
+            walked = self.received_count + empty_commits
+            if walked != self.expected_commits:
+                problems.append(f"the walk yielded {walked} of {self.expected_commits} commits")
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute("SELECT COUNT(*) FROM commits_rebuild WHERE repo_id = %s", (self.repo_id,))
+            staged_count, = cursor.fetchone()
+            if staged_count != len(self.staged):
+                problems.append(f"{staged_count} commits staged, {len(self.staged)} written")
+            # Every saved commit has file changes, test analysis and file stats rows
+            for table in ('commit_test_analysis', 'commit_file_stats_cache'):
+                cursor.execute(REBUILD_CHILD_COUNT_SQL.format(table=table), (self.repo_id,))
+                row_count, = cursor.fetchone()
+                if row_count != staged_count:
+                    problems.append(f"{row_count} {table} rows for {staged_count} commits")
+            cursor.execute("""
+                SELECT COUNT(*) FROM commits_rebuild s
+                WHERE s.repo_id = %s
+                  AND NOT EXISTS (SELECT 1 FROM commit_files_rebuild f WHERE f.commit_id = s.id)
+            """, (self.repo_id,))
+            without_files, = cursor.fetchone()
+            if without_files:
+                problems.append(f"{without_files} commits without commit_files rows")
+            return problems
+        finally:
+            cursor.close()
+    
+    def merge(self, empty_commits: int = 0) -> bool:
+        """
+        Swap the staged rows in if they validate, atomically: one transaction
+        upserts the staged commit rows, deletes every live child row of the
+        repo and inserts the staged ones. Live commits the walk no longer
+        reaches keep their row, since user data cascades from commits.id,
+        but lose their child rows. True when merged.
+        """
+        problems = self.validate(empty_commits)
+        if problems:
+            print(f"    Staged rows are incomplete: {'; '.join(problems)}")
+            return False
+        if not self.staged:
+            return True
+        
+        def merge():
+            started = time.perf_counter()
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute(REBUILD_STALE_COUNT_SQL, (self.repo_id,))
+                stale_count, = cursor.fetchone()
+                cursor.execute(REBUILD_COMMIT_MERGE_SQL, (self.repo_id,))
+                for table, columns in REBUILD_CHILD_TABLES:
+                    cursor.execute(REBUILD_CHILD_DELETE_SQL.format(table=table), (self.repo_id,))
+                    cursor.execute(REBUILD_CHILD_INSERT_SQL.format(
+                        table=table, columns=', '.join(columns),
+                        staged_columns=', '.join(f'r.{column}' for column in columns)
+                    ), (self.repo_id,))
+                commit_started = time.perf_counter()
+                self.conn.commit()
+                if self.timer is not None:
+                    self.timer.add('db_write', commit_started - started)
+                    self.timer.add('db_commit', time.perf_counter() - commit_started)
+                return stale_count, time.perf_counter() - started
+            finally:
+                cursor.close()
+        
+        try:
+            stale_count, seconds = run_in_transaction(self.conn, merge)
+        except Error as e:
+            if is_connection_error(e):
+                raise
+            self.conn.rollback()
+            print(f"    Error merging the staged rows: {e}")
+            return False
+        print(f"    Swapped in the staged rows of {len(self.staged)} commits in {seconds:.1f}s"
+              + (f"; kept {stale_count} commits the walk no longer reaches, without their file, "
+                 f"test and stats rows" if stale_count else ""))
+        try:
+            self.clear_staged()
+        except Error as e:
+            print(f"    Could not clear the staging tables, the next --rebuild will: {e}")
+        return True
+
+
+# Set on SIGINT/SIGTERM: the current batch is written, then the run stops with
+# its checkpoints in place. --workers runs swap in a multiprocessing.Event
+# shared with the pool (see run_fetch_jobs).
+_stop_requested = threading.Event()
+
+
+def _request_stop(signum, frame):
+    """Signal handler: stop after the current batch; a second signal aborts right away."""
+    if _stop_requested.is_set():
+        raise KeyboardInterrupt
+    _stop_requested.set()
+
+
+def install_stop_handlers():
+    """Make SIGINT/SIGTERM stop the run gracefully instead of killing it mid-batch."""
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, _request_stop)
+
+
+def _ignore_stop_signals():
+    """Pool initializer for analysis processes, which are stopped by their parent."""
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, signal.SIG_IGN)
+
+
+def stop_requested() -> bool:
+    return _stop_requested.is_set()
+
+
+def iter_analyses(repo_path: Path, branch: str, rev: str, since: datetime,
+                  total_commits: int, counters: Dict,
+                  classifier: Optional[PathClassifier] = None,
+                  shas: Optional[List[str]] = None,
+                  timer: Optional[StageTimer] = None) -> Iterator[Dict]:
+    """Analyse the commits of `rev` (or exactly `shas`, when given) one by one in this process."""
+    if shas is not None:
+        records = iter_commit_records(repo_path, shas=shas, classifier=classifier)
+    else:
+        records = iter_commit_records(repo_path, rev, since=since, classifier=classifier)
+    if timer is not None:
+        records = timer.iterate('numstat', records)
+    try:
+        for i, (commit, file_stats) in enumerate(records, 1):
+            if i % 100 == 0:
+                print(f"    Processing commit {i}/{total_commits}...")
+            
+            # Skip commits without file changes (e.g. empty merges)
+            if not file_stats:
+                counters['skipped'] += 1
+                continue
+            
+            try:
+                analysis = analyze_commit(commit, file_stats, repo_path, branch, timer)
+            except Exception as e:
+                print(f"    Unexpected error processing commit {commit['hexsha'][:8]}: {e}")
+                counters['failed'] += 1
+                continue
+            
+            yield analysis
+    finally:
+        records.close()
+
+
+def _analyze_commit_chunk(repo_path: Path, branch: str, shas: List[str],
+                          repo_full_name: Optional[str] = None
+                          ) -> Tuple[List[Dict], int, int, Optional[str], StageTimer]:
+    """
+    Pool worker: parse and analyse one chunk of commits.
+    Returns (analyses, skipped count, failed count, git error message or None, stage times).
+    """
+    analyses = []
+    skipped = failed = 0
+    timer = StageTimer(repo_full_name or str(repo_path))
+    # Classifiers hold a per-process cache, so workers look theirs up by repo name
+    classifier = get_path_classifier(repo_full_name)
+    records = timer.iterate('numstat', iter_commit_records(repo_path, shas=shas, classifier=classifier))
+    try:
+        for commit, file_stats in records:
+            if not file_stats:
+                skipped += 1
+                continue
+            try:
+                analyses.append(analyze_commit(commit, file_stats, repo_path, branch, timer))
+            except Exception as e:
+                print(f"    Unexpected error processing commit {commit['hexsha'][:8]}: {e}")
+                failed += 1
+    except GitCommandError as e:
+        return analyses, skipped, failed, str(e), timer
+    finally:
+        close_cat_file(repo_path)
+    return analyses, skipped, failed, None, timer
+
+
+def iter_parallel_analyses(repo_path: Path, branch: str, shas: List[str], workers: int,
+                           counters: Dict, repo_full_name: Optional[str] = None,
+                           timer: Optional[StageTimer] = None) -> Iterator[Dict]:
+    """
+    Analyse `shas` in chunks across a process pool, yielding results in the
+    original commit order so the single writer sees the same sequence as a
+    sequential run. Only a few chunks are in flight at once to keep memory bounded.
+    The workers' stage times are added to `timer`.
+    """
+    chunks = (shas[start:start + ANALYSIS_CHUNK_SIZE]
+              for start in range(0, len(shas), ANALYSIS_CHUNK_SIZE))
+    processed = 0
+    
+    # Stopping is up to the parent (see _request_stop), which still writes what is done
+    with ProcessPoolExecutor(max_workers=workers, initializer=_ignore_stop_signals) as executor:
+        in_flight = deque(
+            executor.submit(_analyze_commit_chunk, repo_path, branch, chunk, repo_full_name)
+            for chunk in islice(chunks, workers * 2)
+        )
+        try:
+            while in_flight:
+                analyses, skipped, failed, error, chunk_timer = in_flight.popleft().result()
+                if timer is not None:
+                    timer.merge(chunk_timer)
+                next_chunk = next(chunks, None)
+                if next_chunk:
+                    in_flight.append(executor.submit(_analyze_commit_chunk, repo_path, branch,
+                                                     next_chunk, repo_full_name))
+                
+                if error:
+                    raise GitCommandError(['git', 'log'], 1, error)
+                
+                processed += len(analyses) + skipped + failed
+                counters['skipped'] += skipped
+                counters['failed'] += failed
+                print(f"    Processing commit {processed}/{len(shas)}...")
+                yield from analyses
+        finally:
+            # Also reached when the consumer stops early; don't start chunks nobody will read
+            for future in in_flight:
+                future.cancel()
+
+
+def _analysis_to_cache(analysis: Dict) -> Dict:
+    """Plain-value copy of an analysis for AnalysisCache (FileStat may live in __main__)."""
+    return dict(analysis, file_stats=[tuple(f) for f in analysis['file_stats']])
+
+
+def _analysis_from_cache(cached: Dict, branch: str) -> Dict:
+    """Rebuild a cached analysis for `branch`, which may differ from the one it was made on."""
+    analysis = dict(cached, file_stats=[FileStat(*f) for f in cached['file_stats']])
+    # commit_values is (commit_hash, base_commit, source_sha, branch, ..., content_fingerprint)
+    values = analysis['commit_values']
+    if values[3] != branch:
+        fingerprint = get_content_fingerprint(analysis['commit_hash'], branch, analysis['file_stats'])
+        analysis['commit_values'] = values[:3] + (branch,) + values[4:-1] + (fingerprint,)
+        analysis['fingerprint'] = fingerprint
+    return analysis
+
+
+def iter_cached_analyses(cache: AnalysisCache, version: str, branch: str, shas: List[str],
+                         analyze: Callable[[List[str]], Iterator[Dict]], counters: Dict,
+                         timer: Optional[StageTimer] = None) -> Iterator[Dict]:
+    """
+    Yield the analyses of `shas` in order, taking them from `cache` where it
+    has them. `analyze(missing_shas)` must yield the analyses of the others
+    in the order given (leaving out skipped commits); they are added to the cache.
+    """
+    if timer is None:
+        timer = StageTimer('')
+    with timer.stage('cache'):
+        cached = cache.contains(shas, version)
+    missing = [sha for sha in shas if sha not in cached]
+    if cached:
+        print(f"    {len(cached)} commits from the analysis cache, {len(missing)} to analyse")
+    
+    analyses = analyze(missing)
+    try:
+        next_analysis = next(analyses, None)
+        for start in range(0, len(shas), ANALYSIS_CHUNK_SIZE):
+            chunk = shas[start:start + ANALYSIS_CHUNK_SIZE]
+            with timer.stage('cache'):
+                hits = cache.get_many([sha for sha in chunk if sha in cached], version)
+            for sha in chunk:
+                if sha in hits:
+                    yield _analysis_from_cache(hits[sha], branch)
+                elif next_analysis is not None and next_analysis['commit_hash'] == sha:
+                    analysis = next_analysis
+                    with timer.stage('cache'):
+                        cache.put(sha, version, _analysis_to_cache(analysis))
+                    yield analysis
+                    next_analysis = next(analyses, None)
+                elif sha in cached:
+                    # Evicted by another process since the lookup
+                    print(f"    Analysis of {sha[:8]} left the cache, rerun to fetch it")
+                    counters['failed'] += 1
+    finally:
+        analyses.close()
+
+
+def get_commit_fingerprints(conn, repo_id: int) -> Dict[str, str]:
+    """base_commit -> content_fingerprint for every fingerprinted commit of the repo."""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT base_commit, content_fingerprint FROM commits
+        WHERE repo_id = %s AND content_fingerprint IS NOT NULL
+    """, (repo_id,))
+    fingerprints = dict(cursor.fetchall())
+    cursor.close()
+    return fingerprints
+
+
+def get_incremental_range(conn, repo, repo_id: int, tip_sha: str, last_sha: Optional[str],
+                          cutoff_date: datetime) -> Tuple[Optional[str], datetime]:
+    """
+    Work out which commits still need processing for an incremental fetch.
+    Returns (rev, since) for iter_commit_records; rev is None when the repo is up to date.
+    """
+    if last_sha:
+        if last_sha == tip_sha:
+            return None, cutoff_date
+        try:
+            if repo.is_ancestor(last_sha, tip_sha):
+                return f"{last_sha}..{tip_sha}", cutoff_date
+            print(f"    Last fetched commit {last_sha[:8]} is no longer on the branch, doing a full walk")
+        except GitCommandError:
+            print(f"    Last fetched commit {last_sha[:8]} not found, doing a full walk")
+        return tip_sha, cutoff_date
+    
+    # No stored high-water mark yet: derive one from what is already in the database
+    cursor = conn.cursor()
+    cursor.execute("SELECT MAX(commit_date) FROM commits WHERE repo_id = %s", (repo_id,))
+    result = cursor.fetchone()
+    cursor.close()
+    
+    max_commit_date = result[0] if result else None
+    if max_commit_date:
+        # commit_date is stored without its timezone, so leave a day of slack
+        since = max(cutoff_date, max_commit_date - timedelta(days=1))
+        return tip_sha, since
+    return tip_sha, cutoff_date
+
+
+def save_fetch_watermark(conn, repo_id: int, tip_sha: str):
+    """Record the branch tip that has been fully processed for a repo."""
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE git_repos
+        SET last_fetched_sha = %s, last_fetched_at = NOW()
+        WHERE id = %s
+    """, (tip_sha, repo_id))
+    conn.commit()
+    cursor.close()
+
+
+def load_checkpoint(conn, repo_id: int) -> Optional[Dict]:
+    """The repo's fetch_checkpoints row as a dict, or None when its last run finished."""
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT {', '.join(CHECKPOINT_COLUMNS)}
+        FROM fetch_checkpoints
+        WHERE repo_id = %s
+    """, (repo_id,))
+    row = cursor.fetchone()
+    cursor.close()
+    return dict(zip(CHECKPOINT_COLUMNS, row)) if row else None
+
+
+def clear_checkpoint(conn, repo_id: int):
+    """Drop the repo's checkpoint once its walk is complete (or is being started over)."""
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM fetch_checkpoints WHERE repo_id = %s", (repo_id,))
+    conn.commit()
+    cursor.close()
+
+
+def get_resume_shas(repo, checkpoint: Dict) -> Optional[List[str]]:
+    """
+    Commits of the checkpointed walk that come after its last saved batch,
+    in walk order. The walk is repeated from the stored tip rather than the
+    current one, so it lists the same commits in the same order.
+    None when it can't be repeated (e.g. the tip was garbage collected).
+    """
+    try:
+        shas = repo.git.rev_list(f"--since={checkpoint['since_date'].isoformat()}",
+                                 checkpoint['rev']).split()
+    except GitCommandError:
+        return None
+
+    last_commit_sha = checkpoint['last_commit_sha']
+    if last_commit_sha is None:
+        return shas
+    try:
+        return shas[shas.index(last_commit_sha) + 1:]
+    except ValueError:
+        return None
 
 
 def fetch_commits_for_repo(repo_id: int, repo_org: str, repo_name: str, 
-                           cutoff_date: datetime, default_branch: str):
+                           cutoff_date: datetime, default_branch: str,
+                           batch_size: int = DEFAULT_BATCH_SIZE,
+                           last_sha: Optional[str] = None, full: bool = False,
+                           conn=None, analysis_workers: int = 1,
+                           repo_path: Optional[Path] = None,
+                           clone_strategy: str = DEFAULT_CLONE_STRATEGY,
+                           run_id: Optional[str] = None, resume: bool = False,
+                           timer: Optional[StageTimer] = None, use_cache: bool = True,
+                           bulk_load: bool = True, rebuild: bool = False):
     """
     Step 2: Fetch all commits for a repository above cutoff date.
+    Only commits after `last_sha` (the previous run's branch tip) are walked unless `full` is set.
+    Uses `conn` when given (and leaves it open), otherwise opens its own connection.
+    With `analysis_workers` > 1, commits are analysed in chunks across a process pool
+    while this process stays the only writer.
+    Pass `repo_path` when the repo has already been cloned/updated (see prefetch_repos).
+    Progress is checkpointed per batch under `run_id`; with `resume`, a walk left
+    unfinished by an earlier run is continued after its last saved batch.
+    Stage times are added to `timer` (see fetch_metrics).
+    Unless `use_cache` is False, analyses are reused from and added to the
+    analysis cache (see analysis_cache), and only uncached commits are read from git.
+    Unless `bulk_load` is False, the first load of a repo with at least
+    BULK_LOAD_MIN_COMMITS commits is written through staging tables (see BulkLoadWriter).
+    With `rebuild`, every commit is walked into the rebuild staging tables and
+    the repo's live rows are only replaced once the walk is complete (see RebuildWriter).
     """
     print(f"\n📦 Processing repo: {repo_org}/{repo_name}")
+    full = full or rebuild
+    if timer is None:
+        timer = StageTimer(f"{repo_org}/{repo_name}")
     
     # Clone or update repo
-    repo_path = clone_or_update_repo(repo_org, repo_name, os.getenv('GITHUB_TOKEN'))
+    if not repo_path:
+        with timer.stage('clone'):
+            repo_path = clone_or_update_repo(repo_org, repo_name, os.getenv('GITHUB_TOKEN'),
+                                             strategy=clone_strategy, cutoff_date=cutoff_date)
     if not repo_path:
         print(f"  ❌ Failed to clone/update repo")
         return 0
@@ -669,313 +2298,370 @@ def fetch_commits_for_repo(repo_id: int, repo_org: str, repo_name: str,
                 except GitCommandError:
                     continue
             else:
-                # Get the default branch from remote
+                # Get the default branch from remote (mirrors only have their own HEAD)
+                head_ref = 'HEAD' if repo.bare else 'refs/remotes/origin/HEAD'
                 try:
-                    branch = repo.git.symbolic_ref('refs/remotes/origin/HEAD').split('/')[-1]
+                    branch = repo.git.symbolic_ref(head_ref).split('/')[-1]
                     print(f"    Using detected branch: {branch}")
                 except:
                     raise GitCommandError("Could not determine default branch")
         
-        commits = list(repo.iter_commits(
-            branch,
-            since=cutoff_date,
-            reverse=False  # Oldest first
-        ))
-        print(f"  Found {len(commits)} commits since {cutoff_date.date()}")
+        # Pin the walk to the tip as it is now, so it can be stored as the next run's starting point
+        tip_sha = repo.git.rev_parse(branch)
     except GitCommandError as e:
         print(f"  ❌ Error getting commits: {e}")
         return 0
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    saved_count = 0
-    skipped_count = 0
-    
-    for i, commit in enumerate(commits, 1):
-        if i % 100 == 0:
-            print(f"    Processing commit {i}/{len(commits)}...")
+    owns_conn = conn is None
+    if owns_conn:
+        conn = get_db_connection()
+    try:
+        enumerate_started = time.perf_counter()
+        checkpoint = load_checkpoint(conn, repo_id)
+        resume_shas = None
+        if checkpoint and resume:
+            resume_shas = get_resume_shas(repo, checkpoint)
+            if resume_shas is None:
+                print(f"    Can't repeat the walk of run {checkpoint['run_id'][:8]}, starting over")
+        elif checkpoint:
+            print(f"    Discarding unfinished run {checkpoint['run_id'][:8]} (use --resume to continue it)")
+        if checkpoint and resume_shas is None:
+            clear_checkpoint(conn, repo_id)
+            checkpoint = None
         
-        try:
-            commit_hash = commit.hexsha
-            commit_message = commit.message
-            commit_date = commit.committed_datetime
-            author = f"{commit.author.name} <{commit.author.email}>"
-            
-            # Get parents
-            parents = [p.hexsha for p in commit.parents]
-            is_merge = len(parents) >= 2
-            # For initial commits (no parents), use empty string instead of None
-            base_commit = parents[0] if parents else ''
-            
-            # Get file statistics
-            file_stats = get_file_statistics(repo_path, commit_hash)
-            if not file_stats:
-                skipped_count += 1
-                continue
-            
-            # Calculate aggregate statistics
-            total_additions = sum(f.get('additions', 0) for f in file_stats)
-            total_deletions = sum(f.get('deletions', 0) for f in file_stats)
-            test_additions = sum(f.get('additions', 0) for f in file_stats if f.get('is_test_file', False))
-            non_test_additions = sum(f.get('additions', 0) for f in file_stats if not f.get('is_test_file', False))
-            net_change = total_additions - total_deletions
-            file_changes = len(file_stats)
-            
-            # Detect dependency changes
-            has_dependency_changes = any(f.get('is_dependency_file', False) for f in file_stats)
-            
-            # Analyze dependencies in detail
-            dependency_analysis = analyze_dependencies(file_stats, repo_path, commit_hash)
-            
-            # Analyze tests in detail
-            test_analysis = analyze_tests(file_stats)
-            
-            # Detect behavior-preserving refactor
-            is_behavior_refactor = detect_behavior_preserving_refactor(commit_message)
-            
-            # Source SHA: For merge commits, this might be different, but for regular commits it's the same
-            source_sha = commit_hash  # Could be enhanced to detect actual source commit for merges
-            
-            # Calculate complexity indicators
-            non_test_files = [f for f in file_stats if not f.get('is_test_file', False)]
-            directories = set()
-            for f in non_test_files:
-                dir_path = f.get('file_directory', '')
-                if dir_path:
-                    top_dir = dir_path.split('/')[0]
-                    directories.add(top_dir)
-            
-            complexity_indicators = {
-                'multi_file': 4 <= file_changes <= 50,
-                'cross_directory': len(directories) >= 3,
-                'many_directories': len(directories) >= 5,
-                'directory_count': len(directories),
-                'has_core_files': any(
-                    any(pattern in f.get('file_path', '') for pattern in ['core/', 'domain/', 'engine/', 'kernel/', 'src/'])
-                    for f in non_test_files
-                ),
-                'large_single_file': non_test_files and len(non_test_files) == 1 and non_test_files[0].get('additions', 0) >= 200,
-                'multiple_high_additions': 3 <= len(non_test_files) <= 6 and all(f.get('additions', 0) >= 300 for f in non_test_files)
-            }
-            complexity_indicators_json = json.dumps(complexity_indicators)
-            
-            # Unsuitable flags (default to FALSE/0)
-            is_unsuitable = False  # Only set to True if manually marked
-            unsuitable_reason = None  # Only set if manually marked
-            
-            # Last status check (NULL by default, only set when checking Habitat API)
-            last_status_check = None
-            
-            # Calculate scores
-            habitate_score = calculate_habitate_score(file_stats, is_behavior_refactor)
-            difficulty_score = calculate_difficulty_score(file_stats, is_behavior_refactor)
-            suitability_score = calculate_suitability_score(
-                {}, file_stats, habitate_score, difficulty_score, is_behavior_refactor
-            )
-            
-            # Test coverage
-            test_coverage_score = test_additions / total_additions if total_additions > 0 else 0.0
-            
-            # Extract PR number from message (if present)
-            pr_match = re.search(r'#(\d+)', commit_message)
-            pr_number = int(pr_match.group(1)) if pr_match else None
-            
-            # Prepare files JSON (just paths)
-            files_json = json.dumps([f.get('file_path') for f in file_stats])
-            
-            # Prepare habitat_signals JSON
-            habitat_signals = {
-                'multi_file': 4 <= file_changes <= 50,
-                'non_trivial_size': (total_additions + total_deletions) >= 20,
-                'has_test_like': any(f.get('is_test_file', False) for f in file_stats),
-                'files_changed': file_changes,
-                'additions': non_test_additions,
-                'deletions': total_deletions,
-                'net_change': net_change,
-                'test_additions': test_additions,
-                'non_test_additions': non_test_additions,
-                'is_behavior_preserving_refactor': is_behavior_refactor
+        if checkpoint:
+            # Finish the interrupted walk as it was; newer commits are picked up by the next run
+            tip_sha, rev, since = checkpoint['tip_sha'], checkpoint['rev'], checkpoint['since_date']
+        else:
+            rev, since = tip_sha, cutoff_date
+            if not full:
+                rev, since = get_incremental_range(conn, repo, repo_id, tip_sha, last_sha, cutoff_date)
+                if rev is None:
+                    timer.add('enumerate', time.perf_counter() - enumerate_started)
+                    print(f"  ✅ Up to date at {tip_sha[:8]}")
+                    return 0
+            checkpoint = {
+                'run_id': run_id or uuid.uuid4().hex, 'tip_sha': tip_sha, 'rev': rev,
+                'since_date': since, 'last_commit_sha': None, 'commits_saved': 0, 'commits_failed': 0
             }
-            habitat_signals_json = json.dumps(habitat_signals)
-            
-            # Save commit
-            cursor.execute("""
-                INSERT INTO commits (
-                    repo_id, merged_commit, base_commit, source_sha, branch, message, author, commit_date,
-                    file_changes, additions, deletions, net_change, test_additions, non_test_additions,
-                    habitate_score, difficulty_score, suitability_score, pr_number, is_merge,
-                    files, habitat_signals, has_dependency_changes, test_coverage_score,
-                    complexity_indicators, is_unsuitable, unsuitable_reason, last_status_check,
-                    is_behavior_preserving_refactor
-                ) VALUES (
-                    %s, %s, %s, %s, %s, %s, %s, %s,
-                    %s, %s, %s, %s, %s, %s,
-                    %s, %s, %s, %s, %s,
-                    %s, %s, %s, %s,
-                    %s, %s, %s, %s,
-                    %s
-                )
-                ON DUPLICATE KEY UPDATE
-                    file_changes = VALUES(file_changes),
-                    additions = VALUES(additions),
-                    deletions = VALUES(deletions),
-                    net_change = VALUES(net_change),
-                    test_additions = VALUES(test_additions),
-                    non_test_additions = VALUES(non_test_additions),
-                    habitate_score = VALUES(habitate_score),
-                    difficulty_score = VALUES(difficulty_score),
-                    suitability_score = VALUES(suitability_score),
-                    complexity_indicators = VALUES(complexity_indicators),
-                    updated_at = NOW()
-            """, (
-                repo_id, commit_hash, base_commit, source_sha, branch, commit_message[:1000], 
-                author, commit_date,
-                file_changes, total_additions, total_deletions, net_change, 
-                test_additions, non_test_additions,
-                habitate_score, difficulty_score, suitability_score, pr_number, is_merge,
-                files_json, habitat_signals_json, has_dependency_changes, test_coverage_score,
-                complexity_indicators_json, is_unsuitable, unsuitable_reason, last_status_check,
-                is_behavior_refactor
-            ))
-            
-            # Get commit ID (works for both INSERT and UPDATE)
-            if cursor.lastrowid:
-                commit_db_id = cursor.lastrowid
+        
+        shas = resume_shas
+        try:
+            if shas is None and (analysis_workers > 1 or use_cache):
+                shas = repo.git.rev_list(f'--since={since.isoformat()}', rev).split()
+            if shas is not None:
+                total_commits = len(shas)
             else:
-                # If UPDATE happened, fetch the ID
-                cursor.execute("""
-                    SELECT id FROM commits 
-                    WHERE repo_id = %s AND base_commit = %s
-                """, (repo_id, base_commit))
-                result = cursor.fetchone()
-                commit_db_id = result[0] if result else None
-            
-            if not commit_db_id:
-                print(f"    Warning: Could not get commit ID for {commit_hash[:8]}")
-                skipped_count += 1
-                continue
-            
-            # Save file-level statistics
-            for file_stat in file_stats:
-                cursor.execute("""
-                    INSERT INTO commit_files (
-                        commit_id, file_path, file_name, file_directory,
-                        additions, deletions, is_test_file, is_dependency_file, file_extension
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ON DUPLICATE KEY UPDATE
-                        additions = VALUES(additions),
-                        deletions = VALUES(deletions)
-                """, (
-                    commit_db_id,
-                    file_stat.get('file_path'),
-                    file_stat.get('file_name'),
-                    file_stat.get('file_directory'),
-                    file_stat.get('additions', 0),
-                    file_stat.get('deletions', 0),
-                    file_stat.get('is_test_file', False),
-                    file_stat.get('is_dependency_file', False),
-                    file_stat.get('file_extension')
-                ))
-            
-            # Save dependency analysis
-            if has_dependency_changes:
-                dependency_files_json = json.dumps(dependency_analysis['dependency_files'])
-                cursor.execute("""
-                    INSERT INTO commit_dependency_analysis (
-                        commit_id, dependency_files, dependency_type,
-                        has_new_dependencies, has_version_updates
-                    ) VALUES (%s, %s, %s, %s, %s)
-                    ON DUPLICATE KEY UPDATE
-                        dependency_files = VALUES(dependency_files),
-                        dependency_type = VALUES(dependency_type),
-                        has_new_dependencies = VALUES(has_new_dependencies),
-                        has_version_updates = VALUES(has_version_updates),
-                        analysis_date = NOW()
-                """, (
-                    commit_db_id,
-                    dependency_files_json,
-                    dependency_analysis['dependency_type'],
-                    dependency_analysis['has_new_dependencies'],
-                    dependency_analysis['has_version_updates']
-                ))
-            
-            # Save test analysis (always save, even if no tests)
-            cursor.execute("""
-                INSERT INTO commit_test_analysis (
-                    commit_id, test_files_added, test_files_modified, test_files_removed,
-                    test_coverage_estimate, test_quality_score,
-                    has_integration_tests, has_unit_tests
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE
-                    test_files_added = VALUES(test_files_added),
-                    test_files_modified = VALUES(test_files_modified),
-                    test_files_removed = VALUES(test_files_removed),
-                    test_coverage_estimate = VALUES(test_coverage_estimate),
-                    test_quality_score = VALUES(test_quality_score),
-                    has_integration_tests = VALUES(has_integration_tests),
-                    has_unit_tests = VALUES(has_unit_tests),
-                    analysis_date = NOW()
-            """, (
-                commit_db_id,
-                test_analysis['test_files_added'],
-                test_analysis['test_files_modified'],
-                test_analysis['test_files_removed'],
-                test_analysis['test_coverage_estimate'],
-                test_analysis['test_quality_score'],
-                test_analysis['has_integration_tests'],
-                test_analysis['has_unit_tests']
-            ))
-            
-            conn.commit()
-            saved_count += 1
+                total_commits = int(repo.git.rev_list('--count', f'--since={since.isoformat()}', rev))
+        except GitCommandError as e:
+            print(f"  ❌ Error getting commits: {e}")
+            return 0
+        if resume_shas is not None:
+            print(f"  Resuming run {checkpoint['run_id'][:8]} at {tip_sha[:8]}: {total_commits} commits left, "
+                  f"{checkpoint['commits_saved']} already saved")
+        elif rev == tip_sha:
+            print(f"  Found {total_commits} commits since {since.date()}")
+        else:
+            print(f"  Found {total_commits} new commits since {last_sha[:8]}")
+        timer.add('enumerate', time.perf_counter() - enumerate_started)
         
-        except Error as e:
-            print(f"    Error saving commit {commit_hash[:8]}: {e}")
-            conn.rollback()
-            skipped_count += 1
-            continue
-        except Exception as e:
-            print(f"    Unexpected error processing commit: {e}")
-            conn.rollback()
-            skipped_count += 1
-            continue
+        fingerprints = get_commit_fingerprints(conn, repo_id)
+        if rebuild:
+            writer = RebuildWriter(conn, repo_id, batch_size, checkpoint, timer,
+                                   resume=resume_shas is not None, expected_commits=total_commits)
+        elif bulk_load and not fingerprints and total_commits >= BULK_LOAD_MIN_COMMITS:
+            # Nothing stored yet, so every commit will be inserted: stage them in bulk
+            print(f"    Initial load: LOAD DATA in batches of {BULK_LOAD_BATCH_SIZE} commits")
+            writer = BulkLoadWriter(conn, repo_id, BULK_LOAD_BATCH_SIZE, fingerprints, checkpoint, timer,
+                                    fallback_batch_size=batch_size)
+        else:
+            writer = CommitBatchWriter(conn, repo_id, batch_size, fingerprints, checkpoint, timer)
+        # skipped: commits without file changes; failed: commits whose analysis was lost
+        counters = {'skipped': 0, 'failed': 0}
+        completed = False
+        
+        repo_full_name = f"{repo_org}/{repo_name}"
+        classifier = get_path_classifier(repo_full_name)
+        
+        def analyze(commit_shas):
+            if analysis_workers > 1:
+                return iter_parallel_analyses(repo_path, branch, commit_shas, analysis_workers, counters,
+                                              repo_full_name, timer)
+            return iter_analyses(repo_path, branch, rev, since,
+                                 len(commit_shas) if commit_shas is not None else total_commits,
+                                 counters, classifier, commit_shas, timer)
+        
+        cache = open_analysis_cache() if use_cache else None
+        if cache is not None:
+            analyses = iter_cached_analyses(cache, f"{RULES_VERSION}:{classifier.version}", branch, shas,
+                                            analyze, counters, timer)
+        else:
+            analyses = analyze(shas)
+        try:
+            for analysis in analyses:
+                # Checked before the analysis is kept: a Ctrl-C also reaches our git
+                # processes, so whatever was analysed after it may be incomplete
+                if stop_requested():
+                    break
+                writer.failed_analyses = counters['failed']
+                writer.add(analysis)
+            completed = not stop_requested()
+        except GitCommandError as e:
+            if not stop_requested():
+                print(f"  ❌ Error reading commits: {e}")
+        finally:
+            # Save what is analysed before waiting for analysis processes to wind down
+            writer.close()
+            analyses.close()
+            close_cat_file(repo_path)
+            if cache is not None:
+                with timer.stage('cache'):
+                    cache.close()
+        
+        if completed:
+            # Only move the high-water mark when nothing was lost, otherwise the
+            # failed commits would never be retried by an incremental run
+            clean = writer.skipped_count + counters['failed'] + checkpoint['commits_failed'] == 0
+            if rebuild:
+                # A partial rebuild must not replace anything
+                if not (clean and writer.merge(counters['skipped'])):
+                    print(f"  ❌ Rebuild not merged, the live rows are unchanged; rerun with --rebuild")
+                    clean = False
+            if clean:
+                save_fetch_watermark(conn, repo_id, tip_sha)
+            clear_checkpoint(conn, repo_id)
+        
+        saved_count = writer.saved_count
+        skipped_count = counters['skipped']
+        failed_count = counters['failed'] + writer.skipped_count
+        print(f"  ✅ Saved {saved_count} commits, skipped {skipped_count}"
+              + (f", {failed_count} failed" if failed_count else "")
+              + (f", {writer.unchanged_count} unchanged" if writer.unchanged_count else ""))
+        print(f"  ⏱️  {timer.summary()}")
+        timer.commits = {'saved': saved_count, 'skipped': skipped_count, 'failed': failed_count,
+                         'unchanged': writer.unchanged_count}
+        if stop_requested():
+            print(f"  ⏸️  Stopped before the end of the walk; rerun with "
+                  f"{'--rebuild --resume' if rebuild else '--resume'} to continue")
+        return saved_count
+    finally:
+        if owns_conn:
+            conn.close()
+
+
+def _fetch_repo(job: Dict, profile_dir: Optional[Path] = None, **kwargs) -> int:
+    """
+    fetch_commits_for_repo() for `job`, reporting a lost database instead of ending the whole run.
+    With `profile_dir`, the fetch runs under cProfile/tracemalloc (see run_profiled).
+    """
+    timer = job.get('timer')
+    started = time.perf_counter()
+    
+    def fetch():
+        return fetch_commits_for_repo(**job, **kwargs)
     
+    try:
+        if profile_dir:
+            return run_profiled(fetch, f"{job['repo_org']}_{job['repo_name']}", profile_dir)
+        return fetch()
+    except Error as e:
+        print(f"  ❌ Database error for {job['repo_org']}/{job['repo_name']}: {e}")
+        return 0
+    finally:
+        if timer is not None:
+            timer.elapsed = time.perf_counter() - started
+
+
+def _init_fetch_worker(stop_event=None):
+    """
+    ProcessPoolExecutor initializer: stop on SIGINT/SIGTERM (or when
+    `stop_event` is set) like the parent. Each worker process takes its
+    connections from its own pool (see db_pool).
+    """
+    global _stop_requested
+    if stop_event is not None:
+        _stop_requested = stop_event
+        install_stop_handlers()
+
+
+def _fetch_repo_worker(job: Dict, profile_dir: Optional[Path] = None) -> Tuple[int, Optional[StageTimer]]:
+    """Run fetch_commits_for_repo in a pool worker; returns (saved commits, the job's stage times)."""
+    # Jobs already handed to the pool when the stop came can't be cancelled any more
+    if stop_requested():
+        return 0, None
+    return _fetch_repo(job, profile_dir), job.get('timer')
+
+
+def get_previous_commit_counts() -> Dict[int, int]:
+    """Commits already stored per repo, used to schedule the largest repos first."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT repo_id, COUNT(*) FROM commits GROUP BY repo_id")
+    counts = dict(cursor.fetchall())
     cursor.close()
     conn.close()
+    return counts
+
+
+def run_fetch_jobs(jobs: List[Dict], workers: int, prefetch: int = 0,
+                   profile_dir: Optional[Path] = None) -> int:
+    """
+    Fetch commits for every job, either in this process or across a pool of
+    `workers` processes. Returns the combined number of saved commits.
+    In-process runs clone/update up to `prefetch` repos ahead of the one being analysed;
+    pool workers clone their own repos, which already overlaps with the others' analysis.
+    No new repos are started once a stop has been requested.
+    A job's 'timer' ends up with its stage times, also when it ran in a worker.
+    """
+    global _stop_requested
+    
+    if workers <= 1:
+        total_saved = 0
+        if prefetch <= 0:
+            for job in jobs:
+                if stop_requested():
+                    break
+                total_saved += _fetch_repo(job, profile_dir)
+            return total_saved
+        
+        for job, repo_path in prefetch_repos(jobs, prefetch):
+            if stop_requested():
+                break
+            if not repo_path:
+                print(f"\n📦 Processing repo: {job['repo_org']}/{job['repo_name']}")
+                print(f"  ❌ Failed to clone/update repo")
+                continue
+            total_saved += _fetch_repo(job, profile_dir, repo_path=repo_path)
+        return total_saved
     
-    print(f"  ✅ Saved {saved_count} commits, skipped {skipped_count}")
-    return saved_count
+    # Largest repos first so one huge repo doesn't start last and hold up the pool
+    commit_counts = get_previous_commit_counts()
+    jobs = sorted(jobs, key=lambda job: commit_counts.get(job['repo_id'], 0), reverse=True)
+    
+    # Shared with the workers, so a signal to any of the processes stops them all
+    stop_event = multiprocessing.Event()
+    if stop_requested():
+        stop_event.set()
+    _stop_requested = stop_event
+    
+    total_saved = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_fetch_worker,
+                             initargs=(stop_event,)) as executor:
+        futures = {executor.submit(_fetch_repo_worker, job, profile_dir): job for job in jobs}
+        for future in as_completed(futures):
+            if stop_requested():
+                for pending in futures:
+                    pending.cancel()
+            if future.cancelled():
+                continue
+            job = futures[future]
+            try:
+                saved, timer = future.result()
+                total_saved += saved
+                if timer is not None:
+                    job['timer'] = timer
+            except Exception as e:
+                print(f"  ❌ Worker failed for {job['repo_org']}/{job['repo_name']}: {e}")
+    return total_saved
 
 
 def main():
     """Main function."""
-    if len(sys.argv) < 2:
-        print("Usage: python fetch_commits.py <repos.json> [--fetch-only]")
-        print("  --fetch-only: Skip repo import, only fetch commits")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        description="Import repos from JSON and fetch their commits with scores."
+    )
+    parser.add_argument('json_file', nargs='?', help="Path to repos.json (JSON array or JSON Lines)")
+    parser.add_argument('--fetch-only', action='store_true',
+                        help="Skip repo import, only fetch commits")
+    parser.add_argument('--full', action='store_true',
+                        help="Re-walk every commit since cutoff date instead of only new ones")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Analyse every commit from git, bypassing the analysis cache")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="Re-walk every commit into staging tables and swap each repo's rows "
+                             "in atomically, in one transaction at the end (implies --full)")
+    parser.add_argument('--no-bulk-load', action='store_true',
+                        help="Write initial loads with batched inserts instead of LOAD DATA LOCAL INFILE")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue repos whose last run was interrupted from their checkpoint")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of repos to process in parallel (default: 1)")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Commits per insert batch (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument('--analysis-workers', type=int, default=1,
+                        help="Processes used to analyse the commits of each repo (default: 1)")
+    parser.add_argument('--clone-strategy', choices=CLONE_STRATEGIES, default=DEFAULT_CLONE_STRATEGY,
+                        help=f"How new repos are cloned (default: {DEFAULT_CLONE_STRATEGY})")
+    parser.add_argument('--prefetch', type=int, default=DEFAULT_PREFETCH_DEPTH,
+                        help="Repos to clone/update ahead of the one being analysed, "
+                             f"0 to disable (default: {DEFAULT_PREFETCH_DEPTH})")
+    parser.add_argument('--rescore', action='store_true',
+                        help="Recompute scores from stored commit_files without touching git")
+    parser.add_argument('--backfill-stats-cache', action='store_true',
+                        help="Fill in missing commit_file_stats_cache rows from stored commit_files")
+    parser.add_argument('--from-id', type=int, default=0,
+                        help="With --rescore/--backfill-stats-cache: first commit id (default: 0)")
+    parser.add_argument('--to-id', type=int,
+                        help="With --rescore/--backfill-stats-cache: last commit id (default: no limit)")
+    parser.add_argument('--metrics-file', type=Path,
+                        help="Write per-repo stage timings here at the end: JSON lines (appended), "
+                             "or a Prometheus textfile if the name ends in .prom")
+    parser.add_argument('--profile', type=Path, nargs='?', const=Path('profiles'), metavar='DIR',
+                        help="Profile each repo with cProfile/tracemalloc into DIR (default: profiles)")
+    args = parser.parse_args()
+    
+    if args.rescore:
+        # Imported lazily: rescore_commits imports this module
+        from rescore_commits import rescore_commits
+        
+        print("=" * 60)
+        print(f"Rescoring commits from id {args.from_id}"
+              + (f" to {args.to_id}" if args.to_id is not None else ""))
+        print("=" * 60)
+        total_rescored = rescore_commits(args.from_id, args.to_id, args.batch_size)
+        print(f"\n{'=' * 60}")
+        print(f"✅ Total commits rescored: {total_rescored}")
+        print(f"{'=' * 60}")
+        return
+    
+    if args.backfill_stats_cache:
+        # Imported lazily: backfill_stats_cache imports this module
+        from backfill_stats_cache import backfill_stats_cache
+        
+        print("=" * 60)
+        print(f"Backfilling commit_file_stats_cache from commit id {args.from_id}"
+              + (f" to {args.to_id}" if args.to_id is not None else ""))
+        print("=" * 60)
+        total_filled = backfill_stats_cache(args.from_id, args.to_id)
+        print(f"\n{'=' * 60}")
+        print(f"✅ Total cache rows added: {total_filled}")
+        print(f"{'=' * 60}")
+        return
     
-    json_file = sys.argv[1]
-    fetch_only = '--fetch-only' in sys.argv
+    if not args.json_file and not args.fetch_only:
+        parser.error("json_file is required unless --fetch-only, --rescore or --backfill-stats-cache is given")
     
-    if not fetch_only:
+    if not args.fetch_only:
         # Step 1: Save repos from JSON
         print("=" * 60)
         print("STEP 1: Importing repos from JSON")
         print("=" * 60)
-        save_repos_from_json(json_file)
+        save_repos_from_json(args.json_file)
     
     # Step 2: Fetch commits for each repo
     print("\n" + "=" * 60)
     print("STEP 2: Fetching commits for all repos")
     print("=" * 60)
     
+    install_stop_handlers()
+    run_id = uuid.uuid4().hex
+    
     conn = get_db_connection()
     cursor = conn.cursor()
     
     # Get all active repos
     cursor.execute("""
-        SELECT id, repo_name, full_name, cutoff_date, default_branch
+        SELECT id, repo_name, full_name, cutoff_date, default_branch, last_fetched_sha
         FROM git_repos
         WHERE is_active = TRUE
         ORDER BY repo_name
@@ -985,10 +2671,10 @@ def main():
     cursor.close()
     conn.close()
     
-    print(f"Found {len(repos)} active repos to process\n")
+    print(f"Found {len(repos)} active repos to process (run {run_id[:8]})\n")
     
-    total_saved = 0
-    for repo_id, repo_name, full_name, cutoff_date, default_branch in repos:
+    jobs = []
+    for repo_id, repo_name, full_name, cutoff_date, default_branch, last_fetched_sha in repos:
         # Parse full_name to get org
         if '/' in full_name:
             repo_org, repo_name_only = full_name.split('/', 1)
@@ -1004,13 +2690,37 @@ def main():
         
         branch = default_branch or DEFAULT_BRANCH
         
-        saved = fetch_commits_for_repo(
-            repo_id, repo_org, repo_name_only, cutoff_datetime, branch
-        )
-        total_saved += saved
+        jobs.append({
+            'repo_id': repo_id,
+            'repo_org': repo_org,
+            'repo_name': repo_name_only,
+            'cutoff_date': cutoff_datetime,
+            'default_branch': branch,
+            'batch_size': args.batch_size,
+            'last_sha': last_fetched_sha,
+            'full': args.full,
+            'analysis_workers': args.analysis_workers,
+            'clone_strategy': args.clone_strategy,
+            'run_id': run_id,
+            'resume': args.resume,
+            'timer': StageTimer(full_name),
+            'use_cache': not args.no_cache,
+            'bulk_load': not args.no_bulk_load,
+            'rebuild': args.rebuild
+        })
+    
+    total_saved = run_fetch_jobs(jobs, args.workers, args.prefetch, args.profile)
+    
+    if args.metrics_file:
+        # Repos a stopped run never started have nothing to report
+        timers = [job['timer'] for job in jobs if job['timer'].elapsed is not None]
+        write_metrics(timers, args.metrics_file, run_id)
+        print(f"\n📊 Stage timings for {len(timers)} repos written to {args.metrics_file}")
     
     print(f"\n{'=' * 60}")
     print(f"✅ Total commits saved: {total_saved}")
+    if stop_requested():
+        print(f"⏸️  Run {run_id[:8]} was stopped early; rerun with --resume to continue")
     print(f"{'=' * 60}")
 
 
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Per-stage timing and profiling for fetch_commits.py.
+
+A StageTimer collects the seconds spent in each stage of the pipeline for
+one repo. Stages are timed per commit or per batch, never per file, so
+timing is always on. With --analysis-workers, analysis stages are summed
+over the worker processes and can add up to more than the wall time.
+
+    clone       clone_or_update_repo (also when run ahead by --prefetch)
+    enumerate   working out the commit range and listing/counting its commits
+    cache       reading and writing the analysis cache (see analysis_cache)
+    numstat     reading and parsing `git log --numstat`, incl. path classification
+    classify    dependency/test analysis and commit message rules
+    scoring     scores, complexity indicators and fingerprints
+    db_write    executing the batch statements
+    db_commit   committing the batch transactions
+
+write_metrics() writes the timers of a run as JSON lines (appended, one
+object per repo) or, for a `.prom` path, as a Prometheus textfile for the
+node_exporter textfile collector (replaced atomically).
+"""
+
+import cProfile
+import json
+import os
+import re
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TypeVar
+
+STAGES = ('clone', 'enumerate', 'cache', 'numstat', 'classify', 'scoring', 'db_write', 'db_commit')
+
+# Frames kept per traced allocation with --profile
+PROFILE_TRACE_FRAMES = 10
+PROFILE_TOP_ALLOCATIONS = 30
+
+T = TypeVar('T')
+
+
+class StageTimer:
+    """Seconds and call counts per pipeline stage for one repo."""
+
+    def __init__(self, repo: str):
+        self.repo = repo
+        self.seconds: Dict[str, float] = dict.fromkeys(STAGES, 0.0)
+        self.calls: Dict[str, int] = dict.fromkeys(STAGES, 0)
+        self.commits: Dict[str, int] = {}
+        self.elapsed: Optional[float] = None
+
+    def add(self, stage: str, seconds: float, calls: int = 1):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+        self.calls[stage] = self.calls.get(stage, 0) + calls
+
+    @contextmanager
+    def stage(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - started)
+
+    def iterate(self, stage: str, iterable: Iterable[T]) -> Iterator[T]:
+        """Yield from `iterable`, adding the time spent producing each item to `stage`."""
+        iterator = iter(iterable)
+        perf_counter = time.perf_counter
+        try:
+            while True:
+                started = perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    self.add(stage, perf_counter() - started, 0)
+                    return
+                self.add(stage, perf_counter() - started)
+                yield item
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+
+    def merge(self, other: 'StageTimer'):
+        """Add the stage times of `other` (e.g. from an analysis worker)."""
+        for stage, seconds in other.seconds.items():
+            self.add(stage, seconds, other.calls.get(stage, 0))
+
+    def summary(self) -> str:
+        """Non-empty stages as "numstat 3.4s, db_write 1.2s"."""
+        return ', '.join(f"{stage} {seconds:.1f}s" for stage, seconds in self.seconds.items()
+                         if self.calls.get(stage))
+
+    def as_dict(self) -> Dict:
+        return {
+            'repo': self.repo,
+            'elapsed_seconds': round(self.elapsed, 3) if self.elapsed is not None else None,
+            'stages': {stage: {'seconds': round(seconds, 3), 'calls': self.calls.get(stage, 0)}
+                       for stage, seconds in self.seconds.items()},
+            'commits': self.commits
+        }
+
+
+def _prometheus_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_prometheus(timers: List[StageTimer]) -> str:
+    """Prometheus text exposition of the timers."""
+    lines = [
+        '# HELP repofind_stage_seconds Seconds spent per fetch stage in the last run.',
+        '# TYPE repofind_stage_seconds gauge'
+    ]
+    for timer in timers:
+        repo = _prometheus_label(timer.repo)
+        for stage, seconds in timer.seconds.items():
+            lines.append(f'repofind_stage_seconds{{repo="{repo}",stage="{stage}"}} {seconds:.6f}')
+    lines += [
+        '# HELP repofind_repo_seconds Wall time of the last fetch per repo.',
+        '# TYPE repofind_repo_seconds gauge'
+    ]
+    for timer in timers:
+        if timer.elapsed is not None:
+            lines.append(f'repofind_repo_seconds{{repo="{_prometheus_label(timer.repo)}"}} {timer.elapsed:.6f}')
+    lines += [
+        '# HELP repofind_commits Commits handled per repo in the last run, by result.',
+        '# TYPE repofind_commits gauge'
+    ]
+    for timer in timers:
+        repo = _prometheus_label(timer.repo)
+        for result, count in timer.commits.items():
+            lines.append(f'repofind_commits{{repo="{repo}",result="{result}"}} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def write_metrics(timers: List[StageTimer], path: Path, run_id: Optional[str] = None):
+    """Append the timers to `path` as JSON lines, or replace it with a Prometheus textfile (`.prom`)."""
+    path = Path(path)
+    if path.suffix == '.prom':
+        # The collector may read at any time, so never leave a half-written file behind
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(format_prometheus(timers))
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+        return
+
+    finished_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    with open(path, 'a', encoding='utf-8') as f:
+        for timer in timers:
+            f.write(json.dumps({'run_id': run_id, 'finished_at': finished_at, **timer.as_dict()}) + '\n')
+
+
+def run_profiled(fn: Callable[[], T], name: str, profile_dir: Path) -> T:
+    """
+    Run `fn` under cProfile and tracemalloc and write `<name>.prof` (load it
+    with pstats or snakeviz) and `<name>.mem.txt` (peak and top allocation
+    sites) to `profile_dir`. Analysis worker processes are not profiled.
+    """
+    profile_dir = Path(profile_dir)
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    base = profile_dir / re.sub(r'[^\w.-]+', '_', name)
+
+    profiler = cProfile.Profile()
+    tracemalloc.start(PROFILE_TRACE_FRAMES)
+    try:
+        return profiler.runcall(fn)
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        profiler.dump_stats(f'{base}.prof')
+        with open(f'{base}.mem.txt', 'w', encoding='utf-8') as f:
+            f.write(f"Peak traced memory: {peak / 2 ** 20:.1f} MB\n\n")
+            for statistic in snapshot.statistics('lineno')[:PROFILE_TOP_ALLOCATIONS]:
+                f.write(f"{statistic}\n")
+        print(f"  📊 Profile written to {base}.prof (peak traced memory {peak / 2 ** 20:.1f} MB)")
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Read git objects through long-lived `git cat-file --batch` /
+`--batch-check` processes, one pair per repo, instead of forking git for
+every object.
+
+Requests are pipelined: a list of object names is written in one go and the
+responses are read back in order. Object contents are returned as
+memoryviews over the bytes read from git, without any text decoding.
+Sessions are safe to share between threads; every request/response
+exchange holds the process's lock.
+"""
+
+import atexit
+import subprocess
+import threading
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Union
+
+from git import GitCommandError
+
+# Requests written before the first response is read; larger batches are
+# written from a helper thread so neither side can block on a full pipe
+PIPELINE_INLINE_LIMIT = 64
+
+
+class ObjectInfo(NamedTuple):
+    sha: str
+    type: str
+    size: int
+
+
+class GitObject(NamedTuple):
+    sha: str
+    type: str
+    data: memoryview
+
+
+class _BatchProcess:
+    """One `git cat-file <option>` process and the lock that serialises its exchanges."""
+
+    def __init__(self, repo_path: Path, option: str):
+        self.cmd = ['git', 'cat-file', option]
+        self.with_data = option == '--batch'
+        self.proc = subprocess.Popen(self.cmd, cwd=repo_path, stdin=subprocess.PIPE,
+                                     stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self.lock = threading.Lock()
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def request(self, names: Sequence[str]) -> List[Optional[Union[ObjectInfo, GitObject]]]:
+        # Requests are newline-delimited, so such names can't be asked for
+        wanted = [name for name in names if '\n' not in name]
+        payload = b''.join(name.encode('utf-8') + b'\n' for name in wanted)
+
+        with self.lock:
+            writer = None
+            if len(wanted) <= PIPELINE_INLINE_LIMIT:
+                self._write(payload)
+            else:
+                writer = threading.Thread(target=self._write, args=(payload,), daemon=True)
+                writer.start()
+            try:
+                responses = iter([self._read_response() for _ in wanted])
+            except Exception:
+                # The stream is out of step with the requests now; a fresh
+                # process is started on the next request
+                self.proc.kill()
+                raise
+            finally:
+                if writer is not None:
+                    writer.join()
+
+        return [next(responses) if '\n' not in name else None for name in names]
+
+    def _write(self, payload: bytes):
+        try:
+            self.proc.stdin.write(payload)
+            self.proc.stdin.flush()
+        except BrokenPipeError:
+            # git exited; the reader reports it
+            pass
+
+    def _read_response(self) -> Optional[Union[ObjectInfo, GitObject]]:
+        stdout = self.proc.stdout
+        header = stdout.readline()
+        if not header:
+            raise GitCommandError(self.cmd, self.proc.poll(), 'git cat-file exited')
+        header = header.rstrip(b'\n')
+        # `<name> missing` / `<name> ambiguous`; the name may contain spaces
+        if header.endswith((b' missing', b' ambiguous')):
+            return None
+
+        sha, obj_type, size = header.split(b' ')
+        sha, obj_type, size = sha.decode('ascii'), obj_type.decode('ascii'), int(size)
+        if not self.with_data:
+            return ObjectInfo(sha, obj_type, size)
+
+        data = memoryview(bytearray(size))
+        filled = 0
+        while filled < size:
+            count = stdout.readinto(data[filled:])
+            if not count:
+                raise GitCommandError(self.cmd, self.proc.poll(), 'git cat-file exited')
+            filled += count
+        stdout.read(1)  # trailing LF
+        return GitObject(sha, obj_type, data)
+
+    def close(self):
+        if self.alive():
+            try:
+                self.proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            try:
+                self.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+        self.proc.stdout.close()
+
+
+class CatFile:
+    """
+    Object access for one repo. The `--batch` and `--batch-check` processes
+    are started on first use and restarted if they die.
+    """
+
+    def __init__(self, repo_path: Path):
+        self.repo_path = repo_path
+        self._processes: Dict[str, _BatchProcess] = {}
+        self._lock = threading.Lock()
+
+    def _process(self, option: str) -> _BatchProcess:
+        with self._lock:
+            process = self._processes.get(option)
+            if process is None or not process.alive():
+                process = self._processes[option] = _BatchProcess(self.repo_path, option)
+            return process
+
+    def info_many(self, names: Sequence[str]) -> List[Optional[ObjectInfo]]:
+        """SHA, type and size of every object in `names` (None where missing), without contents."""
+        return self._process('--batch-check').request(names)
+
+    def info(self, name: str) -> Optional[ObjectInfo]:
+        return self.info_many([name])[0]
+
+    def read_many(self, names: Sequence[str]) -> List[Optional[GitObject]]:
+        """Every object in `names` with its contents (None where missing)."""
+        return self._process('--batch').request(names)
+
+    def read(self, name: str) -> Optional[GitObject]:
+        """
+        Read the object `name` (a SHA or any revision such as `<commit>:<path>`).
+        Returns None when it doesn't exist.
+        """
+        return self.read_many([name])[0]
+
+    def close(self):
+        with self._lock:
+            for process in self._processes.values():
+                process.close()
+            self._processes.clear()
+
+
+# Open sessions of this process, by repo path
+_cat_files: Dict[str, CatFile] = {}
+_cat_files_lock = threading.Lock()
+
+
+def get_cat_file(repo_path: Path) -> CatFile:
+    """The session for `repo_path`, created on first use."""
+    key = str(repo_path)
+    with _cat_files_lock:
+        cat_file = _cat_files.get(key)
+        if cat_file is None:
+            cat_file = _cat_files[key] = CatFile(repo_path)
+        return cat_file
+
+
+def close_cat_file(repo_path: Path):
+    """Stop the session for `repo_path`, if one is open."""
+    with _cat_files_lock:
+        cat_file = _cat_files.pop(str(repo_path), None)
+    if cat_file is not None:
+        cat_file.close()
+
+
+@atexit.register
+def close_all_cat_files():
+    """Stop every session of this process (also run at interpreter exit)."""
+    with _cat_files_lock:
+        cat_files = list(_cat_files.values())
+        _cat_files.clear()
+    for cat_file in cat_files:
+        cat_file.close()
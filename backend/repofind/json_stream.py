@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Read the records of a large JSON file one at a time.
+
+Accepts either a top-level JSON array (`[{...}, {...}]`) or JSON Lines
+(one value per line, or any whitespace-separated sequence of values). The
+file is read in chunks into a sliding buffer and each record is decoded with
+json.JSONDecoder.raw_decode as soon as it is complete, so memory depends on
+the size of the largest record, not on the size of the file.
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Iterator, Union
+
+JSON_READ_SIZE = 1 << 16
+
+_WHITESPACE = ' \t\n\r'
+
+
+class _Reader:
+    """Text buffer over a file that grows on demand and drops what has been consumed."""
+
+    def __init__(self, f):
+        self.f = f
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.read_size = JSON_READ_SIZE
+
+    def fill(self) -> bool:
+        """Read another chunk; False at end of file."""
+        if self.eof:
+            return False
+        chunk = self.f.read(self.read_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character without consuming it, '' at end of file."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ''
+
+    def decode(self, decoder: json.JSONDecoder) -> Any:
+        """Decode the value starting at the current position, reading more until it is complete."""
+        try:
+            while True:
+                try:
+                    value, end = decoder.raw_decode(self.buffer, self.pos)
+                except json.JSONDecodeError:
+                    if self.eof:
+                        raise
+                    end = None
+                # A value that runs to the end of the buffer may be cut short (e.g. a number)
+                if end is not None and (end < len(self.buffer) or self.eof):
+                    self.pos = end
+                    return value
+                if not self.fill():
+                    if end is not None:
+                        self.pos = end
+                        return value
+                    continue
+                # Each retry parses the record from its start, so grow the reads for large records
+                self.read_size = min(self.read_size * 2, 1 << 24)
+        finally:
+            self.read_size = JSON_READ_SIZE
+
+    def error(self, message: str) -> json.JSONDecodeError:
+        return json.JSONDecodeError(message, self.buffer, self.pos)
+
+
+def iter_json_records(path: Union[str, Path]) -> Iterator[Any]:
+    """Yield the elements of a JSON array file, or the values of a JSON Lines file, in order."""
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        reader = _Reader(f)
+        if reader.peek() != '[':
+            # JSON Lines
+            while reader.peek():
+                yield reader.decode(decoder)
+            return
+
+        reader.pos += 1
+        if reader.peek() == ']':
+            reader.pos += 1
+        else:
+            while True:
+                if not reader.peek():
+                    raise reader.error("Unterminated JSON array")
+                yield reader.decode(decoder)
+                delimiter = reader.peek()
+                reader.pos += 1
+                if delimiter == ']':
+                    break
+                if delimiter != ',':
+                    raise reader.error("Expected ',' or ']' in JSON array")
+
+        if reader.peek():
+            raise reader.error("Extra data after JSON array")
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Commit-message classification driven by a rules file.
+
+Rules are loaded from MESSAGE_RULES_FILE (default message_rules.json next to
+this script) and compiled once at import. Each category is a list of rules;
+a message belongs to a category when any of its rules matches. A rule is a
+set of clauses over the message's title (first line), body (the rest) or the
+whole message, all of which must hold:
+
+    "title" / "body" / "message"               pattern, or list of patterns that must all match
+    "title_not" / "body_not" / "message_not"   pattern that must not match
+
+Patterns are case-insensitive regexes, usually alternations such as
+"refactor|optimize". Adding a category only needs a rules file change;
+matched categories are stored in habitat_signals.
+"""
+
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MESSAGE_RULES_FILE = Path(os.getenv('MESSAGE_RULES_FILE', Path(__file__).parent / 'message_rules.json'))
+
+BEHAVIOR_PRESERVING_REFACTOR = 'behavior_preserving_refactor'
+
+_PARTS = ('title', 'body', 'message')
+_MATCH_ANYTHING = re.compile('')
+
+
+def _compile(patterns) -> List[re.Pattern]:
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    return [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+
+
+class MessageRule:
+    """One conjunction of title/body/message clauses."""
+
+    def __init__(self, rule: Dict):
+        unknown = set(rule) - set(_PARTS) - {f'{part}_not' for part in _PARTS}
+        if unknown or not rule:
+            raise ValueError(f"Invalid message rule {rule!r}")
+        # (part index, pattern, must match)
+        self.clauses: List[Tuple[int, re.Pattern, bool]] = []
+        for index, part in enumerate(_PARTS):
+            for pattern in _compile(rule.get(part, [])):
+                self.clauses.append((index, pattern, True))
+            for pattern in _compile(rule.get(f'{part}_not', [])):
+                self.clauses.append((index, pattern, False))
+
+    def required_patterns(self, index: int) -> List[re.Pattern]:
+        """Patterns that must match part `index` for this rule to match."""
+        return [pattern for part, pattern, wanted in self.clauses if part == index and wanted]
+
+    def matches(self, parts: Tuple[str, str, str]) -> bool:
+        return all(bool(pattern.search(parts[index])) is wanted
+                   for index, pattern, wanted in self.clauses)
+
+
+class MessageClassifier:
+    """Compiled message rules: category matching and PR number extraction."""
+
+    def __init__(self, rules: Dict):
+        self.categories: Dict[str, List[MessageRule]] = {
+            name: [MessageRule(rule) for rule in category_rules]
+            for name, category_rules in rules.get('categories', {}).items()
+        }
+        # (name, gate part index, gate pattern, rules) per category; a message
+        # has to match the gate before the category's rules are tried
+        self._checks = []
+        for name, category_rules in self.categories.items():
+            gate = self._build_gate(category_rules)
+            if gate is None:
+                gate = (2, _MATCH_ANYTHING)
+            self._checks.append((name, gate[0], gate[1], category_rules))
+        self.pr_number_pattern = re.compile(rules.get('pr_number', r'#(\d+)'))
+        # Changes whenever the rules do, so stored results can be tied to the rules that made them
+        self.version = hashlib.sha256(
+            json.dumps(rules, sort_keys=True).encode('utf-8')
+        ).hexdigest()[:12]
+
+    @staticmethod
+    def _build_gate(category_rules: List[MessageRule]) -> Optional[Tuple[int, re.Pattern]]:
+        """
+        One alternation of a pattern every rule of the category requires on the
+        same part. A message that doesn't match it can't be in the category,
+        which rejects most messages with a single search.
+        """
+        for index in range(len(_PARTS)):
+            required = [rule.required_patterns(index) for rule in category_rules]
+            if required and all(required):
+                alternatives = list(dict.fromkeys(patterns[0].pattern for patterns in required))
+                if len(alternatives) == 1:
+                    return index, required[0][0]
+                return index, re.compile('|'.join(f'(?:{pattern})' for pattern in alternatives),
+                                         re.IGNORECASE)
+        return None
+
+    def classify(self, message: str) -> List[str]:
+        """Names of the categories `message` belongs to, in rules-file order."""
+        if not message:
+            return []
+        lines = message.split('\n', 1)
+        parts = (lines[0].strip(), lines[1] if len(lines) > 1 else '', message)
+        matched = []
+        for name, gate_index, gate, category_rules in self._checks:
+            if not gate.search(parts[gate_index]):
+                continue
+            for rule in category_rules:
+                if rule.matches(parts):
+                    matched.append(name)
+                    break
+        return matched
+
+    def classify_batch(self, messages: Iterable[str]) -> List[List[str]]:
+        """classify() for many messages in one call."""
+        classify = self.classify
+        return [classify(message) for message in messages]
+
+    def pr_number(self, message: str) -> Optional[int]:
+        """First PR number referenced in `message`, if any."""
+        match = self.pr_number_pattern.search(message or '')
+        return int(match.group(1)) if match else None
+
+
+def load_message_classifier(rules_file: Path = MESSAGE_RULES_FILE) -> MessageClassifier:
+    with open(rules_file, 'r', encoding='utf-8') as f:
+        return MessageClassifier(json.load(f))
+
+
+MESSAGE_CLASSIFIER = load_message_classifier()
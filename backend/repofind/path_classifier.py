@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Test / dependency classification of changed file paths.
+
+The same paths recur thousands of times across a repo's history, so each
+PathClassifier memoises its results in a bounded LRU cache keyed by path.
+With the built-in rules the results are exactly those of is_test_file() and
+is_dependency_file() in fetch_commits.py, which stay as the reference (see
+find_classification_mismatches).
+
+Rules can be overridden per repo in a JSON file (PATH_RULES_FILE, default
+path_rules.json next to this script), keyed by the repo's full name:
+
+    {
+        "org/repo": {
+            "test_dirs": ["qa"],
+            "dependency_dirs": ["third_party", "external/libs"],
+            "dependency_file_names": ["package.json", "deps.edn"]
+        }
+    }
+
+`test_markers`, `dependency_file_names` and `dependency_path_markers`
+replace the defaults when given. `test_dirs` and `dependency_dirs` are
+directory prefixes (matched component by component through a trie) that
+mark every file below them.
+"""
+
+import hashlib
+import json
+import os
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+PATH_RULES_FILE = Path(os.getenv('PATH_RULES_FILE', Path(__file__).parent / 'path_rules.json'))
+PATH_CACHE_SIZE = int(os.getenv('PATH_CACHE_SIZE', 65536))
+
+# Substrings of the lowercased path that mark a test file
+TEST_MARKERS = ('test', 'spec')
+
+DEPENDENCY_FILE_NAMES = frozenset({
+    'package.json', 'package-lock.json', 'yarn.lock',
+    'go.mod', 'go.sum',
+    'requirements.txt', 'Pipfile', 'poetry.lock',
+    'pom.xml', 'build.gradle',
+    'Cargo.toml', 'Cargo.lock',
+    'Gemfile', 'Gemfile.lock',
+    'composer.json', 'composer.lock'
+})
+
+# Case-sensitive substrings of the path that mark vendored dependency code
+DEPENDENCY_PATH_MARKERS = ('node_modules/', 'vendor/')
+
+_TEST = 1
+_DEPENDENCY = 2
+
+
+class DirectoryTrie:
+    """Directory prefixes stored component by component, each marked with flag bits."""
+
+    def __init__(self):
+        self.root: Dict = {}
+
+    def add(self, prefix: str, flags: int):
+        node = self.root
+        for part in prefix.strip('/').split('/'):
+            node = node.setdefault(part, {})
+        node[None] = node.get(None, 0) | flags
+
+    def match(self, file_path: str) -> int:
+        """OR of the flags of every stored prefix that contains `file_path`."""
+        flags = 0
+        node = self.root
+        # The last component is the file name, not a directory
+        for part in file_path.split('/')[:-1]:
+            node = node.get(part)
+            if node is None:
+                break
+            flags |= node.get(None, 0)
+        return flags
+
+    def __bool__(self):
+        return bool(self.root)
+
+
+class PathClassifier:
+    """Classifies paths as test and/or dependency files, memoising results by path."""
+
+    def __init__(self, test_markers: Iterable[str] = TEST_MARKERS,
+                 dependency_file_names: Iterable[str] = DEPENDENCY_FILE_NAMES,
+                 dependency_path_markers: Iterable[str] = DEPENDENCY_PATH_MARKERS,
+                 test_dirs: Iterable[str] = (), dependency_dirs: Iterable[str] = (),
+                 cache_size: int = PATH_CACHE_SIZE):
+        test_markers = [marker.lower() for marker in test_markers]
+        dependency_file_names = sorted(dependency_file_names)
+        dependency_path_markers = list(dependency_path_markers)
+        test_dirs = sorted(test_dirs)
+        dependency_dirs = sorted(dependency_dirs)
+        # Changes whenever the rules do, so cached analyses can be tied to the rules that made them
+        self.version = hashlib.sha256(json.dumps(
+            [test_markers, dependency_file_names, dependency_path_markers, test_dirs, dependency_dirs]
+        ).encode('utf-8')).hexdigest()[:12]
+        self._test_pattern = re.compile('|'.join(map(re.escape, test_markers))) if test_markers else None
+        self._dependency_file_names = frozenset(dependency_file_names)
+        self._dependency_path_markers = tuple(dependency_path_markers)
+        self._trie = DirectoryTrie()
+        for prefix in test_dirs:
+            self._trie.add(prefix, _TEST)
+        for prefix in dependency_dirs:
+            self._trie.add(prefix, _DEPENDENCY)
+        self.classify = lru_cache(maxsize=cache_size)(self._classify)
+
+    @classmethod
+    def from_rules(cls, rules: Dict) -> 'PathClassifier':
+        return cls(
+            test_markers=rules.get('test_markers', TEST_MARKERS),
+            dependency_file_names=rules.get('dependency_file_names', DEPENDENCY_FILE_NAMES),
+            dependency_path_markers=rules.get('dependency_path_markers', DEPENDENCY_PATH_MARKERS),
+            test_dirs=rules.get('test_dirs', ()),
+            dependency_dirs=rules.get('dependency_dirs', ())
+        )
+
+    def _classify(self, file_path: str) -> Tuple[bool, bool]:
+        """(is_test_file, is_dependency_file) for `file_path`."""
+        if not file_path:
+            return False, False
+
+        # A marker without '/' occurs in the path exactly when it occurs in
+        # one of its components, so one search covers name and directories
+        is_test = bool(self._test_pattern and self._test_pattern.search(file_path.lower()))
+        is_dependency = (file_path.rsplit('/', 1)[-1] in self._dependency_file_names
+                         or any(marker in file_path for marker in self._dependency_path_markers))
+
+        if self._trie and not (is_test and is_dependency):
+            flags = self._trie.match(file_path)
+            is_test = is_test or bool(flags & _TEST)
+            is_dependency = is_dependency or bool(flags & _DEPENDENCY)
+        return is_test, is_dependency
+
+    def is_test_file(self, file_path: str) -> bool:
+        return self.classify(file_path)[0]
+
+    def is_dependency_file(self, file_path: str) -> bool:
+        return self.classify(file_path)[1]
+
+
+DEFAULT_PATH_CLASSIFIER = PathClassifier()
+
+_repo_rules: Optional[Dict[str, Dict]] = None
+_repo_classifiers: Dict[str, PathClassifier] = {}
+
+
+def load_path_rules(rules_file: Path = PATH_RULES_FILE) -> Dict[str, Dict]:
+    """Per-repo rule overrides from `rules_file`, or {} when there is none."""
+    if not rules_file.exists():
+        return {}
+    with open(rules_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def get_path_classifier(repo_full_name: Optional[str] = None) -> PathClassifier:
+    """
+    Classifier for `repo_full_name` ("org/repo"). Repos without rules share
+    DEFAULT_PATH_CLASSIFIER (and its cache); each process builds a repo's
+    classifier once.
+    """
+    global _repo_rules
+    if _repo_rules is None:
+        _repo_rules = load_path_rules()
+
+    rules = _repo_rules.get(repo_full_name) if repo_full_name else None
+    if not rules:
+        return DEFAULT_PATH_CLASSIFIER
+    if repo_full_name not in _repo_classifiers:
+        _repo_classifiers[repo_full_name] = PathClassifier.from_rules(rules)
+    return _repo_classifiers[repo_full_name]
+
+
+def find_classification_mismatches(paths: Iterable[str]) -> List[str]:
+    """Paths where DEFAULT_PATH_CLASSIFIER disagrees with the reference functions."""
+    # Imported lazily: fetch_commits imports this module
+    from fetch_commits import is_dependency_file, is_test_file
+
+    return [
+        path for path in paths
+        if DEFAULT_PATH_CLASSIFIER.classify(path) != (is_test_file(path), is_dependency_file(path))
+    ]
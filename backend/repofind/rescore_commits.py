@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Recompute commit scores from the file statistics already stored in MySQL.
+
+Used by `fetch_commits.py --rescore` after the scoring rules change: instead
+of cloning and walking every repo again, `commit_files` is streamed back in
+commit id order, scored with batch_scoring and written to `commits` and
+`commit_test_analysis` in batches. Work is bounded by a commit id range so
+an interrupted run can be resumed from the last id it reported.
+"""
+
+import json
+from typing import Iterator, List, Optional, Tuple
+
+from mysql.connector import Error
+
+from batch_scoring import ColumnBuilder, score_commit_batch
+from db_pool import is_connection_error, run_in_transaction
+from fetch_commits import (
+    DEFAULT_BATCH_SIZE, ROWS_PER_STATEMENT, TEST_ANALYSIS_UPSERT_SQL,
+    build_habitat_signals, get_db_connection
+)
+from message_rules import BEHAVIOR_PRESERVING_REFACTOR, MESSAGE_CLASSIFIER
+
+STREAM_FETCH_SIZE = 5000
+
+# Columns of `commits` recomputed by a rescore, in the order build_rescore_rows() emits them
+RESCORED_COLUMNS = (
+    'file_changes', 'additions', 'deletions', 'net_change', 'test_additions',
+    'non_test_additions', 'habitate_score', 'difficulty_score', 'suitability_score',
+    'habitat_signals', 'has_dependency_changes', 'test_coverage_score',
+    'complexity_indicators', 'is_behavior_preserving_refactor'
+)
+
+StoredFile = Tuple[str, Optional[str], int, int, bool, bool]
+
+
+def _iter_rows(cursor, size: int = STREAM_FETCH_SIZE) -> Iterator[tuple]:
+    """Read an unbuffered cursor in fetchmany() chunks."""
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield from rows
+
+
+def _id_range_clause(column: str, from_id: int, to_id: Optional[int]) -> Tuple[str, tuple]:
+    if to_id is None:
+        return f"{column} >= %s", (from_id,)
+    return f"{column} BETWEEN %s AND %s", (from_id, to_id)
+
+
+def iter_stored_commits(commit_conn, file_conn, from_id: int = 0,
+                        to_id: Optional[int] = None) -> Iterator[Tuple[int, str, List[StoredFile]]]:
+    """
+    Yield (commit id, message, files) for every commit in the id range, in id order.
+    `files` holds (file_path, file_directory, additions, deletions, is_test_file,
+    is_dependency_file) rows from commit_files.
+
+    Commits and their files are read as two unbuffered, id-ordered streams on
+    separate connections and merged here, so neither side is held in memory
+    and commit messages aren't repeated for every file row.
+    """
+    commit_where, commit_params = _id_range_clause('id', from_id, to_id)
+    file_where, file_params = _id_range_clause('commit_id', from_id, to_id)
+
+    commit_cursor = commit_conn.cursor()
+    file_cursor = file_conn.cursor()
+    try:
+        commit_cursor.execute(f"""
+            SELECT id, message FROM commits
+            WHERE {commit_where}
+            ORDER BY id
+        """, commit_params)
+        file_cursor.execute(f"""
+            SELECT commit_id, file_path, file_directory, additions, deletions,
+                   is_test_file, is_dependency_file
+            FROM commit_files
+            WHERE {file_where}
+            ORDER BY commit_id, id
+        """, file_params)
+
+        file_rows = _iter_rows(file_cursor)
+        file_row = next(file_rows, None)
+        for commit_id, message in _iter_rows(commit_cursor):
+            # Skip rows whose commit is gone; both streams are ordered by commit id
+            while file_row is not None and file_row[0] < commit_id:
+                file_row = next(file_rows, None)
+            files = []
+            while file_row is not None and file_row[0] == commit_id:
+                files.append(file_row[1:])
+                file_row = next(file_rows, None)
+            yield commit_id, message or '', files
+
+        # Drain the rest so the unbuffered result doesn't block the connection
+        for _ in file_rows:
+            pass
+    finally:
+        commit_cursor.close()
+        file_cursor.close()
+
+
+def build_rescore_rows(batch: List[Tuple[int, str, List[StoredFile]]]) -> Tuple[List[tuple], List[tuple]]:
+    """
+    Score a batch of stored commits.
+    Returns (commit rows matching RESCORED_COLUMNS with the id first,
+    commit_test_analysis rows for TEST_ANALYSIS_UPSERT_SQL).
+    """
+    builder = ColumnBuilder()
+    message_categories = MESSAGE_CLASSIFIER.classify_batch(message for _, message, _ in batch)
+    refactor_flags = [BEHAVIOR_PRESERVING_REFACTOR in categories for categories in message_categories]
+    for (_, _, files), is_behavior_refactor in zip(batch, refactor_flags):
+        builder.add_commit(files, is_behavior_refactor)
+
+    commit_rows = []
+    test_rows = []
+    for (commit_id, _, _), categories, is_behavior_refactor, scores in zip(
+            batch, message_categories, refactor_flags, score_commit_batch(builder.build())):
+        habitat_signals = build_habitat_signals(
+            scores['file_changes'], scores['total_additions'], scores['total_deletions'],
+            scores['test_additions'], scores['non_test_additions'], scores['has_test_files'],
+            is_behavior_refactor, categories
+        )
+        commit_rows.append((
+            commit_id,
+            scores['file_changes'], scores['total_additions'], scores['total_deletions'],
+            scores['total_additions'] - scores['total_deletions'],
+            scores['test_additions'], scores['non_test_additions'],
+            scores['habitate_score'], scores['difficulty_score'], scores['suitability_score'],
+            json.dumps(habitat_signals), scores['has_dependency_changes'],
+            scores['test_coverage_score'], json.dumps(scores['complexity_indicators']),
+            is_behavior_refactor
+        ))
+        test_analysis = scores['test_analysis']
+        test_rows.append((
+            commit_id,
+            test_analysis['test_files_added'],
+            test_analysis['test_files_modified'],
+            test_analysis['test_files_removed'],
+            test_analysis['test_coverage_estimate'],
+            test_analysis['test_quality_score'],
+            test_analysis['has_integration_tests'],
+            test_analysis['has_unit_tests']
+        ))
+    return commit_rows, test_rows
+
+
+def _commit_update_sql(row_count: int) -> str:
+    """
+    Multi-row UPDATE of `commits` joined against a derived table of new values.
+    (INSERT ... ON DUPLICATE KEY UPDATE can't be used: the rows would need every
+    NOT NULL column of commits.)
+    """
+    first_row = 'SELECT %s AS id, ' + ', '.join(f'%s AS {column}' for column in RESCORED_COLUMNS)
+    other_row = 'SELECT ' + ', '.join(['%s'] * (len(RESCORED_COLUMNS) + 1))
+    values = ' UNION ALL '.join([first_row] + [other_row] * (row_count - 1))
+    assignments = ', '.join(f'c.{column} = v.{column}' for column in RESCORED_COLUMNS)
+    return f"""
+        UPDATE commits c
+        JOIN ({values}) AS v ON c.id = v.id
+        SET {assignments}, c.updated_at = NOW()
+    """
+
+
+def write_rescore_batch(conn, commit_rows: List[tuple], test_rows: List[tuple]):
+    """Write one rescored batch in a single transaction."""
+    cursor = conn.cursor()
+    try:
+        for start in range(0, len(commit_rows), ROWS_PER_STATEMENT):
+            chunk = commit_rows[start:start + ROWS_PER_STATEMENT]
+            cursor.execute(_commit_update_sql(len(chunk)), [value for row in chunk for value in row])
+        for start in range(0, len(test_rows), ROWS_PER_STATEMENT):
+            cursor.executemany(TEST_ANALYSIS_UPSERT_SQL, test_rows[start:start + ROWS_PER_STATEMENT])
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+def rescore_commits(from_id: int = 0, to_id: Optional[int] = None,
+                    batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Rescore every commit with from_id <= id <= to_id from its stored commit_files rows.
+    Returns the number of commits updated.
+    """
+    batch_size = max(1, batch_size)
+    commit_conn = get_db_connection()
+    file_conn = get_db_connection()
+    write_conn = get_db_connection()
+
+    rescored_count = 0
+    failed_count = 0
+
+    def flush(batch):
+        nonlocal rescored_count, failed_count
+        commit_rows, test_rows = build_rescore_rows(batch)
+        first_id, last_id = batch[0][0], batch[-1][0]
+        try:
+            run_in_transaction(write_conn, lambda: write_rescore_batch(write_conn, commit_rows, test_rows))
+            rescored_count += len(batch)
+            print(f"  Rescored {rescored_count} commits (last id {last_id})")
+        except Error as e:
+            if is_connection_error(e):
+                print(f"  ❌ Lost the MySQL connection; rerun with --from-id {first_id}")
+                raise
+            write_conn.rollback()
+            failed_count += len(batch)
+            print(f"  ❌ Error rescoring commits {first_id}-{last_id}: {e}")
+
+    try:
+        batch = []
+        for stored_commit in iter_stored_commits(commit_conn, file_conn, from_id, to_id):
+            batch.append(stored_commit)
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+    finally:
+        commit_conn.close()
+        file_conn.close()
+        write_conn.close()
+
+    if failed_count:
+        print(f"  ❌ {failed_count} commits could not be rescored; rerun their id ranges")
+    return rescored_count
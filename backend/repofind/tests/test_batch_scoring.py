@@ -0,0 +1,113 @@
+"""
+Parity of batch_scoring with the per-commit scorers in fetch_commits.py.
+
+    python -m pytest tests/test_batch_scoring.py
+"""
+
+import random
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fetch_commits  # noqa: E402
+from batch_scoring import CommitColumns, find_parity_mismatches, score_commit_batch  # noqa: E402
+from fetch_commits import build_file_stat  # noqa: E402
+
+# Paths covering source, core, test, integration test and dependency files,
+# at the root and at several depths
+PATHS = [
+    'README.md', 'setup.py', 'src/app.py', 'src/core/engine.py', 'lib/utils.js',
+    'kernel/sched.c', 'pkg/server/handler.go', 'a/b/c/d/deep.py',
+    'tests/test_app.py', 'src/app_test.go', 'spec/models/user_spec.rb',
+    'tests/integration/test_api.py', 'e2e/login.spec.ts', 'src/test/java/AppTest.java',
+    'package.json', 'requirements.txt', 'go.mod', 'Cargo.toml', 'frontend/package.json',
+]
+# Around the thresholds the scorers branch on
+LINE_COUNTS = [0, 1, 5, 20, 49, 50, 199, 200, 299, 300, 301, 499, 500, 1000, 3000]
+
+
+def random_commit(rng: random.Random):
+    file_count = rng.choice([1, 1, 2, 3, 4, 5, 6, 7, 10, 20, 51, 120])
+    return [build_file_stat(rng.choice(PATHS), rng.choice(LINE_COUNTS), rng.choice(LINE_COUNTS))
+            for _ in range(file_count)]
+
+
+def expected_scores(file_stats, is_refactor):
+    habitate = fetch_commits.calculate_habitate_score(file_stats, is_refactor)
+    difficulty = fetch_commits.calculate_difficulty_score(file_stats, is_refactor)
+    return {
+        'habitate_score': habitate,
+        'difficulty_score': difficulty,
+        'suitability_score': fetch_commits.calculate_suitability_score(
+            {}, file_stats, habitate, difficulty, is_refactor
+        ),
+        'test_analysis': fetch_commits.analyze_tests(file_stats),
+        'complexity_indicators': fetch_commits.calculate_complexity_indicators(file_stats),
+    }
+
+
+class BatchScoringParityTest(unittest.TestCase):
+
+    def assert_parity(self, file_stats_lists, refactor_flags):
+        columns = CommitColumns.from_file_stats(file_stats_lists, refactor_flags)
+        results = score_commit_batch(columns)
+        self.assertEqual(len(results), len(file_stats_lists))
+        for i, (result, file_stats, is_refactor) in enumerate(
+                zip(results, file_stats_lists, refactor_flags)):
+            for field, value in expected_scores(file_stats, is_refactor).items():
+                with self.subTest(commit=i, field=field, paths=[f.file_path for f in file_stats]):
+                    self.assertEqual(result[field], value)
+                    self.assertIs(type(result[field]), type(value))
+
+    def assert_parity_both_ways(self, file_stats_lists):
+        """Parity with and without the behaviour-preserving refactor flag."""
+        for is_refactor in (False, True):
+            with self.subTest(is_refactor=is_refactor):
+                self.assert_parity(file_stats_lists, [is_refactor] * len(file_stats_lists))
+
+    def test_generated_commits(self):
+        rng = random.Random(8)
+        file_stats_lists = [random_commit(rng) for _ in range(2000)]
+        refactor_flags = [rng.random() < 0.3 for _ in file_stats_lists]
+        self.assert_parity(file_stats_lists, refactor_flags)
+        self.assertEqual(find_parity_mismatches(file_stats_lists, refactor_flags), [])
+
+    def test_no_non_test_files(self):
+        self.assert_parity_both_ways([
+            [build_file_stat('tests/test_app.py', 40, 2)],
+            [build_file_stat('tests/test_app.py', 300, 0), build_file_stat('spec/user_spec.rb', 10, 10)],
+            [build_file_stat('tests/integration/test_api.py', 0, 12)],
+        ])
+
+    def test_zero_additions(self):
+        self.assert_parity_both_ways([
+            [build_file_stat('src/app.py', 0, 0)],
+            [build_file_stat('src/app.py', 0, 120), build_file_stat('tests/test_app.py', 0, 30)],
+            [build_file_stat(f'src/module_{i}/code.py', 0, 5) for i in range(6)],
+        ])
+
+    def test_dependency_only_commits(self):
+        self.assert_parity_both_ways([
+            [build_file_stat('package.json', 3, 1)],
+            [build_file_stat('requirements.txt', 1, 1), build_file_stat('go.mod', 0, 0)],
+            [build_file_stat('frontend/package.json', 600, 20), build_file_stat('Cargo.toml', 2, 0)],
+        ])
+
+    def test_refactor_flag(self):
+        rng = random.Random(17)
+        file_stats_lists = [random_commit(rng) for _ in range(300)]
+        self.assert_parity(file_stats_lists, [True] * len(file_stats_lists))
+        self.assert_parity(file_stats_lists, [False] * len(file_stats_lists))
+        self.assert_parity(file_stats_lists, [i % 2 == 0 for i in range(len(file_stats_lists))])
+
+    def test_generated_commits_exercise_the_edge_cases(self):
+        file_stats = [build_file_stat(path, 0, 0) for path in PATHS]
+        self.assertTrue(any(f.is_test_file for f in file_stats))
+        self.assertTrue(any(f.is_dependency_file for f in file_stats))
+        self.assertTrue(any(not f.is_test_file and not f.is_dependency_file for f in file_stats))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+"""
+Retries of db_pool.run_in_transaction, against a fake connection.
+
+    python -m pytest tests/test_db_pool.py
+"""
+
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from mysql.connector import errorcode, errors
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import db_pool  # noqa: E402
+from db_pool import is_connection_error, run_in_transaction  # noqa: E402
+
+
+class FakeConnection:
+    """Records what run_in_transaction does to the connection between attempts."""
+
+    def __init__(self):
+        self.reconnects = 0
+        self.rollbacks = 0
+
+    def reconnect(self, attempts=1, delay=0):
+        self.reconnects += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class FlakyWork:
+    """A transaction that raises `failures` one after the other, then returns 'done'."""
+
+    def __init__(self, *failures):
+        self.failures = list(failures)
+        self.attempts = 0
+
+    def __call__(self):
+        self.attempts += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        return 'done'
+
+
+def lost_connection():
+    return errors.OperationalError(msg='Lost connection to MySQL server during query',
+                                   errno=errorcode.CR_SERVER_LOST)
+
+
+def deadlock():
+    return errors.DatabaseError(msg='Deadlock found when trying to get lock',
+                                errno=errorcode.ER_LOCK_DEADLOCK)
+
+
+@mock.patch.object(db_pool, 'DB_RETRY_DELAY', 0)
+@mock.patch('builtins.print')
+class RunInTransactionTest(unittest.TestCase):
+
+    def test_lost_connection_is_reconnected_and_retried(self, _print):
+        conn, work = FakeConnection(), FlakyWork(lost_connection(), lost_connection())
+        self.assertEqual(run_in_transaction(conn, work, retries=3), 'done')
+        self.assertEqual(work.attempts, 3)
+        self.assertEqual(conn.reconnects, 2)
+        self.assertEqual(conn.rollbacks, 0)
+
+    def test_connector_error_without_errno_is_retried(self, _print):
+        conn = FakeConnection()
+        work = FlakyWork(errors.OperationalError(msg='MySQL Connection not available'))
+        self.assertEqual(run_in_transaction(conn, work, retries=3), 'done')
+        self.assertEqual(conn.reconnects, 1)
+
+    def test_deadlock_is_rolled_back_and_retried(self, _print):
+        conn, work = FakeConnection(), FlakyWork(deadlock())
+        self.assertEqual(run_in_transaction(conn, work, retries=3), 'done')
+        self.assertEqual(work.attempts, 2)
+        self.assertEqual(conn.rollbacks, 1)
+        self.assertEqual(conn.reconnects, 0)
+
+    def test_non_retryable_error_is_raised_without_retry(self, _print):
+        error = errors.IntegrityError(msg="Duplicate entry 'x' for key 'PRIMARY'",
+                                      errno=errorcode.ER_DUP_ENTRY)
+        conn, work = FakeConnection(), FlakyWork(error)
+        with self.assertRaises(errors.IntegrityError) as raised:
+            run_in_transaction(conn, work, retries=3)
+        self.assertIs(raised.exception, error)
+        self.assertEqual(work.attempts, 1)
+        self.assertEqual((conn.reconnects, conn.rollbacks), (0, 0))
+
+    def test_last_error_is_raised_once_retries_run_out(self, _print):
+        conn, work = FakeConnection(), FlakyWork(*(lost_connection() for _ in range(4)))
+        with self.assertRaises(errors.OperationalError):
+            run_in_transaction(conn, work, retries=2)
+        self.assertEqual(work.attempts, 3)
+        self.assertEqual(conn.reconnects, 2)
+
+
+class IsConnectionErrorTest(unittest.TestCase):
+
+    def test_classification(self):
+        self.assertTrue(is_connection_error(lost_connection()))
+        self.assertTrue(is_connection_error(errors.InterfaceError(msg='MySQL Connection not available')))
+        self.assertFalse(is_connection_error(deadlock()))
+        self.assertFalse(is_connection_error(errors.ProgrammingError(msg='syntax', errno=errorcode.ER_PARSE_ERROR)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,16 @@
+-- Add content_fingerprint to commits (hash of the commit's numstat + scoring rules version,
+-- lets fetch_commits.py skip rewriting commits that haven't changed)
+-- Run: mysql -u user -p database < add_commit_content_fingerprint.sql
+
+SET @dbname = DATABASE();
+SET @tablename = 'commits';
+SET @columnname = 'content_fingerprint';
+SET @preparedStatement = (SELECT IF(
+  (SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+   WHERE table_schema = @dbname AND table_name = @tablename AND column_name = @columnname) > 0,
+  'SELECT 1',
+  'ALTER TABLE commits ADD COLUMN content_fingerprint CHAR(32) NULL AFTER is_behavior_preserving_refactor'
+));
+PREPARE stmt FROM @preparedStatement;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
@@ -0,0 +1,15 @@
+-- Add last_fetched_sha to git_repos (high-water mark for incremental commit fetches)
+-- Run: mysql -u user -p database < add_repo_fetch_watermark.sql
+
+SET @dbname = DATABASE();
+SET @tablename = 'git_repos';
+SET @columnname = 'last_fetched_sha';
+SET @preparedStatement = (SELECT IF(
+  (SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+   WHERE table_schema = @dbname AND table_name = @tablename AND column_name = @columnname) > 0,
+  'SELECT 1',
+  'ALTER TABLE git_repos ADD COLUMN last_fetched_sha VARCHAR(40) NULL AFTER last_fetched_at'
+));
+PREPARE stmt FROM @preparedStatement;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
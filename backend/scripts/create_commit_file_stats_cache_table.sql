@@ -0,0 +1,43 @@
+-- Create commit_file_stats_cache table: per-commit aggregates of commit_files
+-- used by the commit list filters (single_file_200plus, multi_file_300plus, ...)
+-- Written by fetch_commits.py with each batch of commits; existing commits are
+-- filled in with: python fetch_commits.py --backfill-stats-cache
+-- Run: mysql -u user -p database < create_commit_file_stats_cache_table.sql
+
+CREATE TABLE IF NOT EXISTS commit_file_stats_cache (
+  id INT AUTO_INCREMENT PRIMARY KEY,
+  commit_id INT NOT NULL,
+  non_test_file_count INT DEFAULT 0,
+  test_file_count INT DEFAULT 0,
+  total_file_count INT DEFAULT 0,
+  min_non_test_additions INT DEFAULT 0,
+  max_non_test_additions INT DEFAULT 0,
+  avg_non_test_additions DECIMAL(10,2) DEFAULT 0,
+  total_non_test_additions INT DEFAULT 0,
+  single_file_200plus BOOLEAN DEFAULT FALSE,
+  single_file_500plus BOOLEAN DEFAULT FALSE,
+  multi_file_300plus BOOLEAN DEFAULT FALSE,
+  all_files_200plus BOOLEAN DEFAULT FALSE,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  UNIQUE KEY commit_file_stats_cache_commit_id (commit_id),
+  INDEX commit_file_stats_cache_single_file_200plus (single_file_200plus),
+  INDEX commit_file_stats_cache_multi_file_300plus (multi_file_300plus),
+  INDEX commit_file_stats_cache_all_files_200plus (all_files_200plus),
+  FOREIGN KEY (commit_id) REFERENCES commits(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Tables created by Sequelize sync have no timestamp defaults, which the fetcher relies on
+SET @dbname = DATABASE();
+SET @preparedStatement = (SELECT IF(
+  (SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+   WHERE table_schema = @dbname AND table_name = 'commit_file_stats_cache'
+     AND column_name = 'created_at' AND column_default IS NULL) > 0,
+  'ALTER TABLE commit_file_stats_cache
+     MODIFY created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+     MODIFY updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP',
+  'SELECT 1'
+));
+PREPARE stmt FROM @preparedStatement;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
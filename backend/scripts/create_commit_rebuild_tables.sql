@@ -0,0 +1,14 @@
+-- Create the staging tables used by fetch_commits.py --rebuild
+-- A rebuild writes a repo's commits and their child rows here, then merges them
+-- into the live tables in one transaction. Rows of several repos can be
+-- staged at once; each repo's rows are removed after its merge.
+-- LIKE copies columns and indexes but no foreign keys, so nothing here cascades
+-- to the live tables. After changing the schema of a live table, drop its
+-- staging table and run this file again.
+-- Run: mysql -u user -p database < create_commit_rebuild_tables.sql
+
+CREATE TABLE IF NOT EXISTS commits_rebuild LIKE commits;
+CREATE TABLE IF NOT EXISTS commit_files_rebuild LIKE commit_files;
+CREATE TABLE IF NOT EXISTS commit_dependency_analysis_rebuild LIKE commit_dependency_analysis;
+CREATE TABLE IF NOT EXISTS commit_test_analysis_rebuild LIKE commit_test_analysis;
+CREATE TABLE IF NOT EXISTS commit_file_stats_cache_rebuild LIKE commit_file_stats_cache;
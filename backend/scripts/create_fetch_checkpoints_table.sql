@@ -0,0 +1,18 @@
+-- Create fetch_checkpoints table: progress of unfinished fetch_commits.py runs
+-- One row per repo, updated in the same transaction as each batch of commits
+-- and removed when the repo's walk completes
+
+CREATE TABLE IF NOT EXISTS fetch_checkpoints (
+  repo_id INT NOT NULL PRIMARY KEY,
+  run_id CHAR(32) NOT NULL,
+  tip_sha VARCHAR(40) NOT NULL,
+  rev VARCHAR(100) NOT NULL,
+  since_date DATETIME NOT NULL,
+  last_commit_sha VARCHAR(40) NULL,
+  commits_saved INT NOT NULL DEFAULT 0,
+  commits_failed INT NOT NULL DEFAULT 0,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  FOREIGN KEY (repo_id) REFERENCES git_repos(id) ON DELETE CASCADE,
+  INDEX idx_run_id (run_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,45 @@
+-- Make git_repos unique on full_name (org/repo) instead of repo_name, so repos
+-- with the same name in different orgs can both be imported
+-- Run: mysql -u user -p database < git_repos_unique_full_name.sql
+
+SET @dbname = DATABASE();
+SET @tablename = 'git_repos';
+
+-- Replace the unique index on repo_name (its name depends on how the table was created)
+SET @indexname = (SELECT index_name FROM INFORMATION_SCHEMA.STATISTICS
+  WHERE table_schema = @dbname AND table_name = @tablename AND column_name = 'repo_name'
+    AND non_unique = 0 AND seq_in_index = 1
+  LIMIT 1);
+SET @preparedStatement = (SELECT IF(
+  @indexname IS NULL,
+  'SELECT 1',
+  CONCAT('ALTER TABLE git_repos DROP INDEX `', @indexname, '`, ADD INDEX git_repos_repo_name (repo_name)')
+));
+PREPARE stmt FROM @preparedStatement;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- The plain full_name index is covered by the unique one added below
+SET @indexname = (SELECT index_name FROM INFORMATION_SCHEMA.STATISTICS
+  WHERE table_schema = @dbname AND table_name = @tablename AND column_name = 'full_name'
+    AND non_unique = 1 AND seq_in_index = 1
+  LIMIT 1);
+SET @preparedStatement = (SELECT IF(
+  @indexname IS NULL,
+  'SELECT 1',
+  CONCAT('ALTER TABLE git_repos DROP INDEX `', @indexname, '`')
+));
+PREPARE stmt FROM @preparedStatement;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @preparedStatement = (SELECT IF(
+  (SELECT COUNT(*) FROM INFORMATION_SCHEMA.STATISTICS
+   WHERE table_schema = @dbname AND table_name = @tablename AND column_name = 'full_name'
+     AND non_unique = 0) > 0,
+  'SELECT 1',
+  'ALTER TABLE git_repos ADD UNIQUE INDEX git_repos_full_name (full_name)'
+));
+PREPARE stmt FROM @preparedStatement;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;